@@ -1,11 +1,12 @@
 import os
 import sys
 import subprocess
-import msvcrt
 import random
 import time
 import webbrowser
 
+import console_keys
+
 # ANSI Colors
 CYAN = "\033[96m"
 GREEN = "\033[92m"
@@ -79,31 +80,30 @@ def main():
         # Redraw menu frequently to animate the title
         # We need to check for input without blocking
         
-        while not msvcrt.kbhit():
-            print_menu()
-            time.sleep(0.1) # Flashing speed
-            
-        # Input detected
-        key = msvcrt.getch()
-        try:
-            key = key.decode('utf-8').lower()
-        except:
+        with console_keys.key_mode():
+            while not console_keys.kbhit():
+                print_menu()
+                time.sleep(0.1) # Flashing speed
+
+            # Input detected
+            key = console_keys.getch().lower()
+        if not key:
             continue
             
         if key == '1':
-            os.system('cls')
+            os.system('cls' if os.name == 'nt' else 'clear')
             subprocess.run([sys.executable, "what.py"])
         elif key == '2':
-            os.system('cls')
+            os.system('cls' if os.name == 'nt' else 'clear')
             subprocess.run([sys.executable, "enterieos.py"])
         elif key == '3':
-            os.system('cls')
+            os.system('cls' if os.name == 'nt' else 'clear')
             subprocess.run([sys.executable, "SELfile.py"])
         elif key == '4':
-            os.system('cls')
+            os.system('cls' if os.name == 'nt' else 'clear')
             subprocess.run([sys.executable, "programlist.py"])
         elif key == '5':
-            os.system('cls')
+            os.system('cls' if os.name == 'nt' else 'clear')
             subprocess.run([sys.executable, "image_converter.py"])
         elif key == 'h':
             readme_path = os.path.abspath(os.path.join("HTMLREAD", "index.html"))
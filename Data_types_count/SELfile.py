@@ -6,8 +6,12 @@ import shutil
 import random
 import string
 import threading
-import concurrent.futures
-import msvcrt # Added for kbhit/getch on Windows
+import argparse
+
+import scan_engine
+import scan_mounts
+import scan_report
+import console_keys
 
 # ANSI Colors
 CYAN = "\033[96m"
@@ -29,6 +33,12 @@ stats = {
 }
 stats_lock = threading.Lock()
 
+# Columns shown in the final report (and the byte-based progress bar)
+REPORT_COLUMNS = ("folders", "files", "bytes", "allocated", "extensions", "extension_bytes", "top_files", "top_dirs")
+
+# Live per-worker counters filled by the scan engine while it runs
+progress = scan_engine.ScanProgress()
+
 stop_animation = False
 
 def get_terminal_width():
@@ -38,15 +48,9 @@ def get_terminal_width():
     except:
         return 80
 
-def get_drives():
-    """Returns a list of available drive letters (e.g., ['C:\\', 'D:\\'])."""
-    drives = []
-    # Windows drives A-Z
-    for x in string.ascii_uppercase:
-        drive_path = f"{x}:\\"
-        if os.path.exists(drive_path):
-            drives.append(drive_path)
-    return drives
+def get_drives(include_overlay=False, notes=None):
+    """Returns the roots to scan: drive letters on Windows (e.g. ['C:\\', 'D:\\']), mount points elsewhere."""
+    return scan_mounts.mount_points(include_overlay, notes)
 
 def get_total_used_space(drives):
     """Calculates total used space across all drives to estimate progress."""
@@ -78,11 +82,11 @@ def animation_thread():
         term_width = get_terminal_width()
         
         # Calculate percentage
-        with stats_lock:
-            s_bytes = stats["scanned_bytes"]
-            t_bytes = stats["total_bytes"]
-            n_files = stats["files"]
-            n_folders = stats["folders"]
+        n_files, n_folders, s_bytes = progress.totals()
+        t_bytes = stats["total_bytes"]
+        # Disk usage counts allocated blocks, so compare like with like
+        s_bytes = progress.allocated_bytes()
+        rate = int(progress.files_per_second())
 
         if t_bytes > 0:
             pct = (s_bytes / t_bytes) * 100
@@ -99,55 +103,19 @@ def animation_thread():
         # Format numbers
         files_str = format_number(n_files)
         folders_str = format_number(n_folders)
+        rate_str = format_number(rate)
         
-        status_line = f"[{bar}] {pct:6.2f}% | {CYAN}{deco}{RESET} | Files: {YELLOW}{files_str}{RESET} | Folders: {PURPLE}{folders_str}{RESET}"
+        status_line = f"[{bar}] {pct:6.2f}% | {CYAN}{deco}{RESET} | Files: {YELLOW}{files_str}{RESET} | Folders: {PURPLE}{folders_str}{RESET} | {GREEN}{rate_str}/s{RESET}"
         
         # Center the line
-        clean_line = f"[{'█' * filled}{' ' * (bar_len - filled)}] {pct:6.2f}% | {deco} | Files: {files_str} | Folders: {folders_str}"
+        clean_line = f"[{'█' * filled}{' ' * (bar_len - filled)}] {pct:6.2f}% | {deco} | Files: {files_str} | Folders: {folders_str} | {rate_str}/s"
         padding = max(0, (term_width - len(clean_line)) // 2)
         
         sys.stdout.write(f"\r{' ' * padding}{status_line}   ")
         sys.stdout.flush()
         time.sleep(0.08)
 
-def scan_tree(path):
-    """
-    Worker function: Recursively scans a directory tree using os.walk.
-    Updates global stats safely.
-    """
-    local_folders = 0
-    local_files = 0
-    local_exts = {}
-    local_bytes = 0
-    
-    try:
-        for root, dirs, files in os.walk(path):
-            local_folders += len(dirs)
-            local_files += len(files)
-            
-            for f in files:
-                _, ext = os.path.splitext(f)
-                ext = ext.lower()
-                local_exts[ext] = local_exts.get(ext, 0) + 1
-                
-                try:
-                    full_path = os.path.join(root, f)
-                    local_bytes += os.path.getsize(full_path)
-                except (OSError, PermissionError):
-                    pass
-                    
-    except (OSError, PermissionError):
-        return
-
-    # Batch update global stats to reduce lock contention
-    with stats_lock:
-        stats["folders"] += local_folders
-        stats["files"] += local_files
-        stats["scanned_bytes"] += local_bytes
-        for ext, count in local_exts.items():
-            stats["extensions"][ext] = stats["extensions"].get(ext, 0) + count
-
-def main():
+def main(options):
     global stop_animation
     
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -161,7 +129,8 @@ def main():
         
     width = 60
     # Height depends on number of drives, let's approximate or calc dynamically
-    drives = get_drives()
+    notes = []
+    drives = get_drives(options.include_overlay, notes)
     height = 6 + len(drives) + 2 
     
     margin = " " * ((term_width - width) // 2)
@@ -169,6 +138,8 @@ def main():
     
     print("\n" * top_margin)
     print(f"{margin}{CYAN}Initializing Drive Selector...{RESET}")
+    for note in notes:
+        print(f"{margin}{YELLOW}Note: {note}{RESET}")
     
     # drives = get_drives() # Already called above
     
@@ -218,41 +189,69 @@ def main():
     print(f"{margin}Starting Parallel Scan...")
     time.sleep(1.5)
     
+    # Stay on the selected filesystem: other mounts below it are not walked
+    schedule = scan_mounts.plan_scan([selected_drive], workers=options.workers)
+    stop_at = scan_mounts.stop_points()
+    exclude = scan_engine.open_rules(options)
+    index = scan_engine.open_index(options, exclude)
+    exporter = scan_engine.open_exporter(options)
+    snapshot = scan_engine.open_snapshot(options)
+    dupes = scan_engine.open_duplicates(options)
+    sniffer = scan_engine.open_sniffer(options)
+    columnar = scan_engine.open_columnar(options)
+    mode = scan_engine.mode_for_columns(REPORT_COLUMNS + scan_engine.export_columns(options))
+    # Long scans save their progress, so Ctrl+C or a crash can be resumed
+    checkpoint = scan_engine.open_checkpoint(options, default=True)
+    throttle = scan_engine.open_throttle(options)
+    priority = scan_engine.apply_priority(options)
+
     t = threading.Thread(target=animation_thread)
     t.daemon = True
     t.start()
     
     start_time = time.time()
     
-    futures = []
-    max_workers = min(64, (os.cpu_count() or 4) * 8)
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        try:
-            # Scan root of the selected drive
-            with os.scandir(selected_drive) as it:
-                for entry in it:
-                    if entry.is_dir(follow_symlinks=False):
-                        futures.append(executor.submit(scan_tree, entry.path))
-                    elif entry.is_file(follow_symlinks=False):
-                        with stats_lock:
-                            stats["files"] += 1
-                            _, ext = os.path.splitext(entry.name)
-                            ext = ext.lower()
-                            stats["extensions"][ext] = stats["extensions"].get(ext, 0) + 1
-                            try:
-                                stats["scanned_bytes"] += entry.stat().st_size
-                            except:
-                                pass
-        except PermissionError:
-            pass
-        
-        concurrent.futures.wait(futures)
-        
+    try:
+        scan_engine.scan_paths([selected_drive], stats, stats_lock, index=index, progress=progress, mode=mode,
+                               backend=options.backend, max_workers=options.workers,
+                               file_sink=scan_engine.combine_sinks(
+                                   exporter.write_files if exporter is not None else None,
+                                   dupes.add_files if dupes is not None else None,
+                                   sniffer.add_files if sniffer is not None else None,
+                                   columnar.add_files if columnar is not None else None),
+                               top_k=options.top, schedule=schedule, stop_at=stop_at,
+                               exclude=exclude, checkpoint=checkpoint,
+                               throttle=throttle, dir_sink=snapshot.add if snapshot is not None else None,
+                               extension_cap=options.extension_cap, hotspots=options.hotspots,
+                               ages=options.ages)
+    except (KeyboardInterrupt, ValueError) as e:
+        stop_animation = True
+        t.join()
+        scan_engine.close_writers(exporter, snapshot, sniffer, columnar, index)
+        if isinstance(e, KeyboardInterrupt):
+            if checkpoint is not None and checkpoint.saves:
+                print(f"\n\n{margin}{YELLOW}Scan interrupted. Progress saved - run again with --resume to continue.{RESET}")
+            raise
+        print(f"\n\n{margin}{RED}Error: {e}{RESET}")
+        return
+    if index is not None:
+        index.close()
+
     stop_animation = True
     t.join()
     
     duration = time.time() - start_time
+    if exporter is not None:
+        exporter.finish(stats, [selected_drive], duration, has_bytes=mode == scan_engine.MODE_SIZE)
+    if snapshot is not None:
+        snapshot.finish(stats, [selected_drive])
+    if columnar is not None:
+        columnar.finish(stats, [selected_drive])
+    if sniffer is not None:
+        sniffer.finish()
+    if dupes is not None:
+        print(f"\n\n{margin}Looking for duplicates...", flush=True)
+        dupes.find()
     
     os.system('cls' if os.name == 'nt' else 'clear')
     
@@ -278,6 +277,26 @@ def main():
     print_row("Total Folders", format_number(stats['folders']), PURPLE)
     print_row("Total Files", format_number(stats['files']), PURPLE)
     print_row("Total Data Scanned", f"{stats['scanned_bytes'] / (1024**3):.2f} GB", BLUE)
+    approx = "~" if stats.get("allocated_approximate") else ""
+    print_row("Unique Allocated", f"{approx}{stats.get('allocated_bytes', 0) / (1024**3):.2f} GB", BLUE)
+    if index is not None:
+        print_row("Index Reused", f"{index.hits} of {index.hits + index.misses} folders", GREEN)
+    if checkpoint is not None and checkpoint.resumed_folders:
+        print_row("Resumed", f"{format_number(checkpoint.resumed_folders)} folders done before", GREEN)
+    if throttle is not None:
+        print_row("Throttle", f"{throttle.target:.0f} ops/s, {throttle.backoffs} backoffs", GREEN)
+    if priority is not None:
+        print_row("Priority", priority, GREEN)
+    if exclude is not None:
+        print_row("Excluded", scan_report.shorten_text(exclude.describe(), width - 28), GREEN)
+    if exporter is not None:
+        print_row("Exported To", os.path.basename(options.export), GREEN)
+    if snapshot is not None:
+        print_row("Snapshot", scan_report.shorten_path(os.path.basename(snapshot.path), width - 28), GREEN)
+    if columnar is not None:
+        print_row("Columnar Snapshot", scan_report.shorten_path(os.path.basename(columnar.path), width - 28), GREEN)
+    if sniffer is not None:
+        print_row("Content Sniffed", f"{sniffer.sniffed:,} files, {sniffer.cached:,} cached", GREEN)
 
     print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
     print(f"{margin}{CYAN}║{RESET}{' ' * ((width - 2 - 23)//2)}{YELLOW}File Formats Breakdown{RESET}{' ' * ((width - 2 - 23 + 1)//2)}{CYAN}║{RESET}")
@@ -286,20 +305,50 @@ def main():
     if not stats["extensions"]:
         print(f"{margin}{CYAN}║{RESET}{' ' * ((width - 2 - 16)//2)}{RED}(No files found){RESET}{' ' * ((width - 2 - 16)//2)}{CYAN}║{RESET}")
     else:
-        sorted_exts = sorted(stats["extensions"].items(), key=lambda x: x[1], reverse=True)
-        for ext, count in sorted_exts:
+        sorted_exts = scan_report.sorted_extensions(stats, options.sort)
+        for ext, count, nbytes in sorted_exts:
             display_ext = ext if ext else "[No Extension]"
-            print_row(display_ext, format_number(count), BLUE)
+            share = scan_report.format_share(nbytes, stats["scanned_bytes"])
+            print_row(display_ext, f"{format_number(count)} | {scan_report.format_bytes(nbytes)} ({share})", BLUE)
+        scan_report.print_size_histograms(margin, width, stats, [row[0] for row in sorted_exts[:5]])
+
+    if sniffer is not None:
+        scan_report.print_content_types(margin, width, sniffer, options.top or 10)
+
+    if options.top:
+        scan_report.print_largest(margin, width, f"Top {options.top} Largest Files", stats.get("largest_files", []))
+        scan_report.print_largest(margin, width, f"Top {options.top} Largest Folders", stats.get("largest_dirs", []))
+    if dupes is not None:
+        scan_report.print_duplicates(margin, width, dupes, options.top or 10)
+    if options.hotspots:
+        scan_report.print_hotspots(margin, width, stats)
+    if options.ages:
+        by_bytes = scan_report.sorted_extensions(stats, "bytes")
+        scan_report.print_age_histograms(margin, width, stats, [row[0] for row in by_bytes[:10]], options.top or 10)
             
     print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}")
     print(f"\n{margin}Press X to return to menu...", end='', flush=True)
     
-    while True:
-        if msvcrt.kbhit():
-            ch = msvcrt.getch().decode('utf-8').lower()
-            if ch == 'x':
-                break
-        time.sleep(0.05)
+    with console_keys.key_mode():
+        while True:
+            if console_keys.kbhit():
+                ch = console_keys.getch().lower()
+                if ch == 'x':
+                    break
+            time.sleep(0.05)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scan a selected drive")
+    scan_engine.add_scan_arguments(parser)
+    parser.add_argument("--top", type=int, default=10, metavar="K",
+                        help="show the K largest files and folders (0 to turn off)")
+    parser.add_argument("--sort", choices=("count", "bytes"), default="count",
+                        help="order of the file formats breakdown (default: count)")
+    parser.add_argument("--include-overlay", action="store_true",
+                        help="also list overlay mounts (container layers) as drives")
+    options = scan_engine.parse_scan_arguments(parser)
+    try:
+        main(options)
+    except KeyboardInterrupt:
+        stop_animation = True
+        print()
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+
+import scan_engine
+import scan_report
+import scan_roots
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Many folders scanned in one go with one shared worker pool, e.g.
+#   python batch.py ~/src/* /srv/data
+#   python batch.py --from projects.txt --json > sizes.json
+# Roots inside other roots are walked once, as part of the outer one.
+
+REPORT_COLUMNS = ("folders", "files", "bytes", "extensions", "extension_bytes")
+
+
+def read_roots(options):
+    roots = list(options.roots)
+    if options.roots_from:
+        f = sys.stdin if options.roots_from == "-" else open(options.roots_from, encoding="utf-8")
+        with f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    roots.append(line)
+    return roots
+
+
+def root_rows(given, totals, nested):
+    """(label, resolved, nested in, folders, files, bytes) per given root, biggest first; duplicates once."""
+    rows = []
+    seen = set()
+    for path in given:
+        real = os.path.realpath(path)
+        if real in seen or real not in totals.totals:
+            continue
+        seen.add(real)
+        rows.append((path, real, nested.get(real)) + totals.get(real))
+    rows.sort(key=lambda row: (row[5], row[4]), reverse=True)
+    return rows
+
+
+def print_batch(stats, rows, missing, top_count, duration, options, extras, sniffer=None, dupes=None):
+    width = 72
+    try:
+        term_width = shutil.get_terminal_size().columns
+    except Exception:
+        term_width = 80
+    margin = " " * max(0, (term_width - width) // 2)
+
+    title = "BATCH SCAN REPORT"
+    pad = width - 2 - len(title)
+    print("")
+    print(f"{margin}{CYAN}╔{'═' * (width - 2)}╗{RESET}")
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{GREEN}{title}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+
+    row = scan_report.print_row
+    nested = sum(1 for r in rows if r[2] is not None)
+    row(margin, width, "Roots", f"{len(rows):,} ({top_count:,} walked, {nested:,} nested, {len(missing):,} missing)",
+        WHITE)
+    row(margin, width, "Time Elapsed", f"{duration:.2f} seconds", YELLOW)
+    row(margin, width, "Total Folders", f"{stats['folders']:,}", PURPLE)
+    row(margin, width, "Total Files", f"{stats['files']:,}", PURPLE)
+    row(margin, width, "Total Data", scan_report.format_bytes(stats["scanned_bytes"]), BLUE)
+    approx = "~" if stats.get("allocated_approximate") else ""
+    row(margin, width, "Unique Allocated", f"{approx}{scan_report.format_bytes(stats.get('allocated_bytes', 0))}",
+        BLUE)
+    for label, value in extras:
+        row(margin, width, label, scan_report.shorten_text(value, width - 28), GREEN)
+
+    scan_report.print_section_title(margin, width, "Per Root")
+    if not rows:
+        scan_report.print_empty(margin, width, "(No roots scanned)")
+    label_width = 34
+    shown = rows[:options.top] if options.top else rows
+    for path, _, inside, _, files, nbytes in shown:
+        label = scan_report.shorten_path(("* " if inside else "") + path, label_width)
+        share = scan_report.format_share(nbytes, stats["scanned_bytes"])
+        row(margin, width, label, f"{files:,} | {scan_report.format_bytes(nbytes)} ({share})",
+            WHITE if inside else BLUE, label_width)
+    if len(shown) < len(rows):
+        scan_report.print_empty(margin, width, f"... {len(rows) - len(shown):,} more")
+    if nested:
+        scan_report.print_empty(margin, width, "* inside another root, counted there too")
+
+    if missing:
+        scan_report.print_section_title(margin, width, "Missing Roots", RED)
+        for path in missing[:options.top or None]:
+            scan_report.print_empty(margin, width, scan_report.shorten_path(path, width - 6))
+
+    scan_report.print_section_title(margin, width, "File Formats Breakdown")
+    sorted_exts = scan_report.sorted_extensions(stats, "bytes")
+    if not sorted_exts:
+        scan_report.print_empty(margin, width)
+    for ext, count, nbytes in sorted_exts[:options.top or 10]:
+        share = scan_report.format_share(nbytes, stats["scanned_bytes"])
+        row(margin, width, ext or "[No Extension]", f"{count:,} | {scan_report.format_bytes(nbytes)} ({share})",
+            BLUE)
+    if sniffer is not None:
+        scan_report.print_content_types(margin, width, sniffer, options.top or 10)
+    if dupes is not None:
+        scan_report.print_duplicates(margin, width, dupes, options.top or 10)
+    if options.hotspots:
+        scan_report.print_hotspots(margin, width, stats)
+    if options.ages:
+        by_bytes = scan_report.sorted_extensions(stats, "bytes")
+        scan_report.print_age_histograms(margin, width, stats, [row[0] for row in by_bytes[:10]], options.top or 10)
+    print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}\n")
+
+
+def batch_json(stats, rows, missing, duration):
+    return {
+        "roots": [{"path": path, "resolved": real, "nested_in": inside, "folders": folders, "files": files,
+                   "bytes": nbytes} for path, real, inside, folders, files, nbytes in rows],
+        "missing": missing,
+        "combined": {
+            "folders": stats["folders"],
+            "files": stats["files"],
+            "bytes": stats["scanned_bytes"],
+            "allocated_bytes": stats.get("allocated_bytes", 0),
+            "extensions": [{"extension": ext, "files": count, "bytes": nbytes}
+                           for ext, count, nbytes in scan_report.sorted_extensions(stats, "bytes")],
+        },
+        "duration_seconds": round(duration, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan many folders at once with one shared worker pool")
+    parser.add_argument("roots", nargs="*", metavar="PATH", help="folders to scan")
+    parser.add_argument("--from", dest="roots_from", metavar="FILE",
+                        help="also scan the folders listed in FILE, one per line (- for stdin)")
+    parser.add_argument("--json", action="store_true", help="print the result as json")
+    parser.add_argument("--top", type=int, default=0, metavar="N",
+                        help="rows per report section (default: 0 = every root, 10 extensions)")
+    scan_engine.add_scan_arguments(parser)
+    options = scan_engine.parse_scan_arguments(parser)
+    if options.checkpoint or options.resume:
+        parser.error("--checkpoint / --resume do not work with batches (per-root totals cannot be resumed)")
+    try:
+        given = read_roots(options)
+    except OSError as e:
+        parser.error(str(e))
+    if not given:
+        parser.error("give at least one folder (or --from FILE)")
+
+    os.system("")  # Enable ANSI
+    top, nested, missing = scan_roots.plan_roots(given)
+    totals = scan_roots.RootTotals(list(top) + list(nested), top)
+
+    exclude = scan_engine.open_rules(options)
+    index = scan_engine.open_index(options, exclude)
+    throttle = scan_engine.open_throttle(options)
+    priority = scan_engine.apply_priority(options)
+    exporter = scan_engine.open_exporter(options)
+    snapshot = scan_engine.open_snapshot(options)
+    dupes = scan_engine.open_duplicates(options)
+    sniffer = scan_engine.open_sniffer(options)
+    columnar = scan_engine.open_columnar(options)
+    mode = scan_engine.mode_for_columns(REPORT_COLUMNS + scan_engine.export_columns(options))
+
+    def dir_sink(path, files, nbytes):
+        totals.add(path, files, nbytes)
+        if snapshot is not None:
+            snapshot.add(path, files, nbytes)
+
+    stats = {"folders": 0, "files": 0, "extensions": {}, "scanned_bytes": 0}
+    if not options.json:
+        print(f"{CYAN}Scanning {len(top):,} folders ({len(nested):,} nested roots inside them)...{RESET}",
+              flush=True)
+    start_time = time.time()
+    try:
+        scan_engine.scan_paths(top, stats, threading.Lock(), index=index, mode=mode,
+                               backend=options.backend, max_workers=options.workers,
+                               file_sink=scan_engine.combine_sinks(
+                                   exporter.write_files if exporter is not None else None,
+                                   dupes.add_files if dupes is not None else None,
+                                   sniffer.add_files if sniffer is not None else None,
+                                   columnar.add_files if columnar is not None else None),
+                               exclude=exclude, throttle=throttle, dir_sink=dir_sink,
+                               extension_cap=options.extension_cap, hotspots=options.hotspots,
+                               ages=options.ages)
+    except (KeyboardInterrupt, ValueError) as e:
+        scan_engine.close_writers(exporter, snapshot, sniffer, columnar)
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        print(f"{RED}Error: {e}{RESET}")
+        sys.exit(1)
+    finally:
+        if index is not None:
+            index.close()
+    duration = time.time() - start_time
+
+    if exporter is not None:
+        exporter.finish(stats, top, duration, has_bytes=mode == scan_engine.MODE_SIZE)
+    if snapshot is not None:
+        snapshot.finish(stats, top)
+    if columnar is not None:
+        columnar.finish(stats, top)
+    if sniffer is not None:
+        sniffer.finish()
+    if dupes is not None:
+        dupes.find()
+
+    rows = root_rows(given, totals, nested)
+    if options.json:
+        print(json.dumps(batch_json(stats, rows, missing, duration), indent=2))
+        return
+
+    extras = []
+    if index is not None:
+        extras.append(("Index Reused", f"{index.hits} of {index.hits + index.misses} folders"))
+    if throttle is not None:
+        extras.append(("Throttle", f"{throttle.target:.0f} ops/s, {throttle.backoffs} backoffs"))
+    if priority is not None:
+        extras.append(("Priority", priority))
+    if exclude is not None:
+        extras.append(("Excluded", exclude.describe()))
+    if exporter is not None:
+        extras.append(("Exported To", os.path.basename(options.export)))
+    if snapshot is not None:
+        extras.append(("Snapshot", os.path.basename(snapshot.path)))
+    if columnar is not None:
+        extras.append(("Columnar Snapshot", os.path.basename(columnar.path)))
+    if sniffer is not None:
+        extras.append(("Content Sniffed", f"{sniffer.sniffed:,} files, {sniffer.cached:,} cached"))
+    print_batch(stats, rows, missing, len(top), duration, options, extras, sniffer, dupes)
+
+
+if __name__ == "__main__":
+    main()
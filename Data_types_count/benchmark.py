@@ -0,0 +1,385 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+
+import scan_engine
+import scan_report
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Two benchmarks:
+#   python benchmark.py [PATH]          thread vs process backend over worker counts
+#   python benchmark.py --synthetic     every walker on generated trees of known shape
+#
+# The synthetic trees are built from a seed, so the same --seed and --scale
+# always give the same tree; --keep DIR keeps them between runs. Every timed
+# run happens in a fresh child process, so peak RSS is that walker's alone.
+# Syscalls are counted with strace -f -c when strace is installed (in a
+# separate, untimed run); cold-cache runs drop the page cache first, which
+# needs root on Linux.
+
+# Marker next to a generated tree: shape, seed and scale it was built with
+TREE_MARKER = ".bench-tree"
+
+
+def worker_counts(limit):
+    """1, 2, 4, ... up to limit (limit itself always included)."""
+    counts = []
+    n = 1
+    while n < limit:
+        counts.append(n)
+        n *= 2
+    counts.append(limit)
+    return counts
+
+
+def time_scan(path, backend, workers, mode, repeat):
+    """Best-of-repeat wall time for one configuration, plus the file count."""
+    best = None
+    files = 0
+    for _ in range(repeat):
+        stats = {"folders": 0, "files": 0, "extensions": {}, "scanned_bytes": 0}
+        start = time.perf_counter()
+        scan_engine.scan_paths([path], stats, threading.Lock(), max_workers=workers,
+                               mode=mode, backend=backend)
+        elapsed = time.perf_counter() - start
+        files = stats["files"]
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, files
+
+
+def backend_scaling(path, mode, repeat, max_processes):
+    """Times both backends over a growing number of workers."""
+    print(f"{CYAN}Backend scaling on {path} ({mode} mode, best of {repeat}){RESET}")
+    print(f"{WHITE}{'backend':<10}{'workers':>8}{'seconds':>10}{'files/s':>14}{'speedup':>9}{RESET}")
+
+    for backend in (scan_engine.BACKEND_THREAD, scan_engine.BACKEND_PROCESS):
+        baseline = None
+        for workers in worker_counts(max_processes):
+            seconds, files = time_scan(path, backend, workers, mode, repeat)
+            if baseline is None:
+                baseline = seconds
+            rate = files / seconds if seconds > 0 else 0
+            speedup = baseline / seconds if seconds > 0 else 0
+            color = GREEN if speedup >= 1 else RED
+            print(f"{backend:<10}{workers:>8}{seconds:>10.3f}{rate:>14,.0f}{color}{speedup:>8.2f}x{RESET}")
+
+
+def _write_files(folder, count, rng, max_size):
+    # Sparse files: sizes are what the walkers see, nothing is actually written
+    for i in range(count):
+        with open(os.path.join(folder, f"f{i:05d}{rng.choice(SYNTHETIC_EXTENSIONS)}"), "wb") as f:
+            f.truncate(rng.randint(0, max_size))
+
+
+def build_wide_flat(root, rng, scale):
+    """Many sibling folders right under the root, a few files each."""
+    for d in range(max(1, int(2000 * scale))):
+        folder = os.path.join(root, f"d{d:05d}")
+        os.mkdir(folder)
+        _write_files(folder, 10, rng, 64 * 1024)
+
+
+def build_deep_narrow(root, rng, scale):
+    """One long chain of folders with a small side folder at every level."""
+    folder = root
+    # Capped so the recursive walkers stay within Python's recursion limit
+    for level in range(max(1, min(800, int(300 * scale)))):
+        os.mkdir(os.path.join(folder, "side"))
+        _write_files(os.path.join(folder, "side"), 2, rng, 16 * 1024)
+        _write_files(folder, 3, rng, 16 * 1024)
+        folder = os.path.join(folder, "d")
+        os.mkdir(folder)
+
+
+def build_tiny_files(root, rng, scale):
+    """Lots of files of at most 100 bytes."""
+    for d in range(max(1, int(100 * scale))):
+        folder = os.path.join(root, f"d{d:03d}")
+        os.mkdir(folder)
+        _write_files(folder, 500, rng, 100)
+
+
+def build_skewed(root, rng, scale):
+    """One folder holding almost everything, next to many near-empty ones."""
+    huge = os.path.join(root, "huge")
+    os.mkdir(huge)
+    _write_files(huge, max(1, int(50_000 * scale)), rng, 8 * 1024)
+    for d in range(max(1, int(500 * scale))):
+        folder = os.path.join(root, f"small{d:03d}")
+        os.mkdir(folder)
+        _write_files(folder, 2, rng, 8 * 1024)
+
+
+SYNTHETIC_EXTENSIONS = (".txt", ".log", ".jpg", ".dat", ".py", "")
+
+# name -> builder(root, rng, scale)
+TREE_SHAPES = {
+    "wide-flat": build_wide_flat,
+    "deep-narrow": build_deep_narrow,
+    "tiny-files": build_tiny_files,
+    "skewed": build_skewed,
+}
+
+
+def synthetic_tree(base, shape, seed, scale):
+    """Path of the shape's tree under base, built unless an identical one is there."""
+    root = os.path.join(base, shape)
+    marker_path = root + TREE_MARKER
+    marker = f"{shape} {seed} {scale}"
+    try:
+        with open(marker_path) as f:
+            if f.read() == marker:
+                return root, 0.0
+    except OSError:
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    start = time.perf_counter()
+    TREE_SHAPES[shape](root, random.Random(f"{seed}:{shape}"), scale)
+    with open(marker_path, "w") as f:
+        f.write(marker)
+    return root, time.perf_counter() - start
+
+
+def walk_os_walk(path, mode):
+    files = 0
+    for folder, _, names in os.walk(path):
+        files += len(names)
+        if mode == scan_engine.MODE_SIZE:
+            for name in names:
+                try:
+                    os.stat(os.path.join(folder, name))
+                except OSError:
+                    pass
+    return files
+
+
+def walk_scan_paths(backend):
+    def run(path, mode):
+        stats = {"folders": 0, "files": 0, "extensions": {}, "scanned_bytes": 0}
+        scan_engine.scan_paths([path], stats, threading.Lock(), mode=mode, backend=backend)
+        return stats["files"]
+    return run
+
+
+def walk_folder_size_parallel(path, mode):
+    import programlist
+    programlist.get_folder_size_parallel(path)
+    return programlist.scan_progress["scanned_files"]
+
+
+# name -> (walker(path, mode) returning the file count, why it cannot run or None)
+WALKERS = {
+    "os.walk": (walk_os_walk, None),
+    "scan_paths/thread": (walk_scan_paths(scan_engine.BACKEND_THREAD), None),
+    "scan_paths/process": (walk_scan_paths(scan_engine.BACKEND_PROCESS), None),
+    # programlist.py is a Windows tool (winreg)
+    "get_folder_size_parallel": (walk_folder_size_parallel,
+                                 None if importlib.util.find_spec("winreg") else "needs Windows"),
+}
+
+
+def peak_rss():
+    """Peak resident memory of this process (and its finished children) in bytes, or None."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        unit = 1 if sys.platform == "darwin" else 1024
+        return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * unit
+    if sys.platform == "win32":
+        # Windows has no getrusage(); the process's peak working set is the same figure
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.WinDLL("kernel32")
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        psapi = ctypes.WinDLL("psapi")
+        psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters),
+                                               wintypes.DWORD]
+        if psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def run_one(walker, path, mode):
+    """Child side: times one walk and prints the result as json."""
+    start = time.perf_counter()
+    files = WALKERS[walker][0](path, mode)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "files": files, "peak_rss": peak_rss()}))
+
+
+class WalkerFailed(Exception):
+    """A benchmark child exited with an error; the message is the last line it printed."""
+
+
+def _child(walker, path, mode, prefix=()):
+    command = list(prefix) + [sys.executable, os.path.abspath(__file__), path, "--run-one", walker, "--mode", mode]
+    done = subprocess.run(command, capture_output=True, text=True)
+    lines = done.stdout.strip().splitlines()
+    if done.returncode != 0 or not lines:
+        errors = done.stderr.strip().splitlines()
+        raise WalkerFailed(errors[-1] if errors else f"exit status {done.returncode}")
+    return json.loads(lines[-1])
+
+
+def count_syscalls(walker, path, mode):
+    """System calls of one walk (all processes), or None without strace."""
+    strace = shutil.which("strace")
+    if strace is None:
+        return None
+    with tempfile.NamedTemporaryFile("r", suffix=".strace") as out:
+        try:
+            _child(walker, path, mode, (strace, "-f", "-c", "-o", out.name))
+        except (WalkerFailed, OSError):
+            return None
+        for line in out.read().splitlines():
+            fields = line.split()
+            if fields and fields[-1] == "total":
+                return int(fields[3])
+    return None
+
+
+def drop_caches():
+    """Empties the page, dentry and inode caches; False if not allowed."""
+    if not sys.platform.startswith("linux"):
+        return False
+    os.sync()
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3")
+        return True
+    except OSError:
+        return False
+
+
+def time_walker(walker, path, mode, repeat, cold):
+    """Best of repeat runs in child processes (warm: after one untimed run)."""
+    if not cold:
+        _child(walker, path, mode)
+    best = None
+    for _ in range(repeat):
+        if cold:
+            drop_caches()
+        result = _child(walker, path, mode)
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def synthetic_suite(options):
+    base = options.keep or tempfile.mkdtemp(prefix="scan-bench-")
+    cold = options.cold and drop_caches()
+    if options.cold and not cold:
+        print(f"{YELLOW}Cold-cache runs skipped: dropping the page cache needs root on Linux.{RESET}")
+    if options.syscalls and shutil.which("strace") is None:
+        print(f"{YELLOW}Syscalls not counted: strace is not installed.{RESET}")
+    caches = ("warm", "cold") if cold else ("warm",)
+
+    try:
+        for shape in options.shapes:
+            root, built = synthetic_tree(base, shape, options.seed, options.scale)
+            about = TREE_SHAPES[shape].__doc__.strip().rstrip(".")
+            note = f"built in {built:.1f}s" if built else "reused"
+            print(f"\n{CYAN}{shape}{RESET} ({about}; {note})")
+            print(f"{WHITE}{'walker':<26}{'cache':<7}{'seconds':>9}{'files':>10}{'files/s':>12}"
+                  f"{'syscalls':>11}{'peak RSS':>12}{RESET}")
+            for walker in options.walkers:
+                why_not = WALKERS[walker][1]
+                if why_not:
+                    print(f"{walker:<26}{RED}skipped: {why_not}{RESET}")
+                    continue
+                syscalls = count_syscalls(walker, root, options.mode) if options.syscalls else None
+                for cache in caches:
+                    try:
+                        result = time_walker(walker, root, options.mode, options.repeat, cache == "cold")
+                    except WalkerFailed as e:
+                        print(f"{walker:<26}{cache:<7}{RED}failed: {scan_report.shorten_text(str(e), 60)}{RESET}")
+                        continue
+                    seconds = result["seconds"]
+                    rate = result["files"] / seconds if seconds > 0 else 0
+                    calls = f"{syscalls:,}" if syscalls is not None else "n/a"
+                    peak = result["peak_rss"]
+                    peak = scan_report.format_bytes(peak) if peak is not None else "n/a"
+                    print(f"{walker:<26}{cache:<7}{seconds:>9.3f}{result['files']:>10,}{GREEN}{rate:>12,.0f}{RESET}"
+                          f"{calls:>11}{peak:>12}")
+    finally:
+        if not options.keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the scan engine")
+    parser.add_argument("path", nargs="?", default=os.getcwd(), help="tree to scan (default: current directory)")
+    parser.add_argument("--mode", choices=(scan_engine.MODE_COUNT, scan_engine.MODE_SIZE),
+                        default=scan_engine.MODE_SIZE)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration (best is kept)")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 4,
+                        help="largest worker count to try (default: number of cores)")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="benchmark every walker on generated trees instead of PATH")
+    parser.add_argument("--shapes", nargs="+", choices=tuple(TREE_SHAPES), default=list(TREE_SHAPES),
+                        help="synthetic tree shapes to run (default: all)")
+    parser.add_argument("--walkers", nargs="+", choices=tuple(WALKERS), default=list(WALKERS),
+                        help="walkers to time (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="size of the synthetic trees relative to the default (~120k files)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the synthetic trees (default: 1)")
+    parser.add_argument("--keep", metavar="DIR", default=None,
+                        help="build the synthetic trees in DIR and keep them for later runs")
+    parser.add_argument("--cold", action="store_true",
+                        help="also time with the page cache dropped before each run (Linux, root)")
+    parser.add_argument("--syscalls", action="store_true",
+                        help="count system calls with strace (one extra run per walker)")
+    parser.add_argument("--run-one", metavar="WALKER", default=None, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_one:
+        run_one(options.run_one, options.path, options.mode)
+        return
+
+    os.system("")  # Enable ANSI
+    if options.synthetic:
+        synthetic_suite(options)
+        return
+    if not os.path.isdir(options.path):
+        print(f"{RED}Error: '{options.path}' is not a directory.{RESET}")
+        sys.exit(1)
+
+    backend_scaling(options.path, options.mode, options.repeat, options.max_workers)
+
+
+if __name__ == "__main__":
+    main()
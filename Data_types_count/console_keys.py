@@ -0,0 +1,52 @@
+import os
+import sys
+import contextlib
+
+# Single key presses without Enter, on Windows (msvcrt) and elsewhere
+# (termios). Use kbhit()/getch() inside a `with key_mode():` block; on Windows
+# the block does nothing, on other systems it puts the terminal into cbreak
+# mode for its duration and restores it afterwards.
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import tty
+    import select
+    import termios
+
+
+@contextlib.contextmanager
+def key_mode():
+    if msvcrt is not None or not sys.stdin.isatty():
+        yield
+        return
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    try:
+        tty.setcbreak(fd)
+        yield
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+
+def kbhit():
+    """True if a key press is waiting."""
+    if msvcrt is not None:
+        return msvcrt.kbhit()
+    ready, _, _ = select.select([sys.stdin], [], [], 0)
+    return bool(ready)
+
+
+def getch():
+    """Reads one key press as a (lowercase-able) string; "" if it can't be decoded."""
+    if msvcrt is not None:
+        try:
+            return msvcrt.getch().decode("utf-8")
+        except UnicodeDecodeError:
+            return ""
+    ch = os.read(sys.stdin.fileno(), 1)
+    try:
+        return ch.decode("utf-8")
+    except UnicodeDecodeError:
+        return ""
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+
+import scan_engine
+import scan_estimate
+import scan_exclude
+import scan_mounts
+import scan_report
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Quick estimate of what is under a path, refined until it is precise enough,
+# the time is up or Ctrl+C, e.g.
+#   python estimate.py /srv --seconds 10
+
+# Seconds between updates of the live line
+REFRESH = 0.5
+
+
+def plus_minus(value, half, fmt):
+    if half == 0:
+        return fmt(value)
+    if half == float("inf"):
+        return f"~{fmt(value)}"
+    return f"~{fmt(value)} ± {fmt(half)}"
+
+
+def count_text(n):
+    return f"{round(n):,}"
+
+
+def bytes_text(n):
+    return scan_report.format_bytes(round(n))
+
+
+def status_line(estimator):
+    totals = estimator.totals()
+    precision = estimator.precision()
+    quality = "exact" if estimator.exact else ("..." if precision == float("inf") else f"±{precision:.1%}")
+    return (f"{estimator.probes:,} probes, {estimator.listed:,} folders read | "
+            f"files {plus_minus(*totals['files'], count_text)} | "
+            f"data {plus_minus(*totals['bytes'], bytes_text)} | {quality}")
+
+
+def print_estimate(estimator, elapsed, top):
+    width = 72
+    try:
+        term_width = shutil.get_terminal_size().columns
+    except Exception:
+        term_width = 80
+    margin = " " * max(0, (term_width - width) // 2)
+    totals = estimator.totals()
+
+    title = "EXACT TOTALS" if estimator.exact else "ESTIMATE (95% CONFIDENCE)"
+    pad = width - 2 - len(title)
+    print("")
+    print(f"{margin}{CYAN}╔{'═' * (width - 2)}╗{RESET}")
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{GREEN}{title}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+
+    row = scan_report.print_row
+    row(margin, width, "Path", scan_report.shorten_path(estimator.root, width - 28), WHITE)
+    row(margin, width, "Time Elapsed", f"{elapsed:.2f} seconds", YELLOW)
+    row(margin, width, "Probes", f"{estimator.probes:,} ({estimator.listed:,} folders read)", YELLOW)
+    row(margin, width, "Files", plus_minus(*totals["files"], count_text), PURPLE)
+    row(margin, width, "Folders", plus_minus(*totals["folders"], count_text), PURPLE)
+    row(margin, width, "Data", plus_minus(*totals["bytes"], bytes_text), BLUE)
+    if not estimator.exact:
+        precision = estimator.precision()
+        row(margin, width, "Precision", "too few probes" if precision == float("inf") else f"±{precision:.1%}",
+            GREEN if precision <= 0.1 else RED)
+
+    scan_report.print_section_title(margin, width, f"Top {top} Extensions by Data")
+    shares = estimator.extension_shares(top)
+    if not shares:
+        scan_report.print_empty(margin, width)
+    for ext, files, share, half in shares:
+        share_text = f"{share:.1%}" if half == 0 else (f"{share:.1%} ± ?" if half == float("inf")
+                                                       else f"{share:.1%} ± {half:.1%}")
+        row(margin, width, ext or "[No Extension]", f"{share_text} | {'' if estimator.exact else '~'}"
+            f"{count_text(files)} files", BLUE)
+    print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate files, folders and bytes under a path by random sampling")
+    parser.add_argument("path", nargs="?", default=".", help="folder to estimate (default: current directory)")
+    parser.add_argument("--seconds", type=float, default=0, metavar="S",
+                        help="stop after S seconds (default: 0 = only on --precision or Ctrl+C)")
+    parser.add_argument("--precision", type=float, default=0.05, metavar="SHARE",
+                        help="stop once files and bytes are known within this relative 95%% interval "
+                             "(default: 0.05, 0 = never)")
+    parser.add_argument("--top", type=int, default=10, metavar="N",
+                        help="extension rows in the report (default: 10)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable runs")
+    scan_engine.add_exclude_arguments(parser)
+    options = parser.parse_args()
+
+    os.system("")  # Enable ANSI
+    if not os.path.isdir(options.path):
+        print(f"{RED}Error: '{options.path}' is not a directory.{RESET}")
+        sys.exit(1)
+
+    exclude = scan_exclude.rules_from_options(options) or None
+    stop_at = scan_mounts.stop_points() if options.one_file_system else None
+    estimator = scan_estimate.TreeEstimator(options.path, exclude, stop_at, options.seed)
+
+    start = time.monotonic()
+    last_refresh = 0.0
+    interactive = sys.stdout.isatty()
+    try:
+        while not estimator.exact:
+            estimator.probe()
+            now = time.monotonic()
+            if options.seconds and now - start >= options.seconds:
+                break
+            if options.precision and estimator.precision() <= options.precision:
+                break
+            if interactive and now - last_refresh >= REFRESH:
+                last_refresh = now
+                line = status_line(estimator)
+                print(f"\r{CYAN}{line}{RESET}\033[K", end="", flush=True)
+    except KeyboardInterrupt:
+        pass
+    if interactive:
+        print("\r\033[K", end="")
+    print_estimate(estimator, time.monotonic() - start, options.top)
+
+
+if __name__ == "__main__":
+    main()
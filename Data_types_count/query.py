@@ -0,0 +1,217 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+
+import scan_columns
+import scan_report
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Questions about a scan saved with --columnar, answered without scanning, e.g.
+#   python query.py scans/2024-05-01.cols ext=.log size>100MB mtime<90d
+#   python query.py scans/2024-05-01.cols ext=.jpg,.png under=/data/photos --json
+#
+# Filters (all must match):
+#   ext=.jpg,.png     extensions, "ext=" for files without one
+#   size>10MB         also >=, <, <=, =; units B, KB, MB, GB, TB (powers of 1024)
+#   mtime<2024-01-01  also >=, >, <=, =; a date (local time, optionally with
+#                     THH:MM) or that many days ago like 90d (mtime<90d: not
+#                     modified in the last 90 days)
+#   under=/data       a folder and everything below it
+
+FILTER = re.compile(r"^(ext|size|mtime|under)(>=|<=|=|>|<)(.*)$")
+SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)b?\s*$", re.IGNORECASE)
+AGE = re.compile(r"^(\d+)d$")
+UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+DAY = 86400
+
+
+def parse_size(text):
+    match = SIZE.match(text)
+    if not match:
+        raise ValueError(f"not a size: {text!r} (e.g. 512KB, 10MB, 1.5GB)")
+    return int(float(match.group(1)) * UNITS[match.group(2).lower()])
+
+
+def parse_time(text):
+    """(epoch seconds, length of the span the text names, in seconds)."""
+    match = AGE.match(text)
+    if match:
+        return int(time.time()) - int(match.group(1)) * DAY, 1
+    for fmt, span in (("%Y-%m-%d", DAY), ("%Y-%m-%dT%H:%M", 60)):
+        try:
+            return int(time.mktime(time.strptime(text, fmt))), span
+        except ValueError:
+            continue
+    raise ValueError(f"not a date: {text!r} (e.g. 2024-01-01, 2024-01-01T12:00 or 90d)")
+
+
+def parse_filters(terms):
+    """The select() keyword arguments for the filter terms; ValueError if one is malformed."""
+    filters = {}
+    for term in terms:
+        match = FILTER.match(term)
+        if not match:
+            raise ValueError(f"not a filter: {term!r} (e.g. ext=.jpg size>10MB mtime<2024-01-01 under=/data)")
+        key, op, value = match.groups()
+        if key in ("ext", "under"):
+            if op != "=":
+                raise ValueError(f"{key} only takes '=': {term!r}")
+            if key == "ext":
+                exts = [e.strip().lower() for e in value.split(",")]
+                filters["ext"] = [e if not e or e.startswith(".") else "." + e for e in exts]
+            else:
+                filters["under"] = value
+        elif key == "size":
+            size = parse_size(value)
+            if op in (">", ">="):
+                filters["min_size"] = size + (op == ">")
+            elif op in ("<", "<="):
+                filters["max_size"] = size - (op == "<")
+            else:
+                filters["min_size"] = filters["max_size"] = size
+        else:
+            moment, span = parse_time(value)
+            if op == "<":
+                filters["modified_before"] = moment
+            elif op == "<=":
+                filters["modified_before"] = moment + span
+            elif op == ">":
+                filters["modified_after"] = moment + span
+            elif op == ">=":
+                filters["modified_after"] = moment
+            else:
+                filters["modified_after"], filters["modified_before"] = moment, moment + span
+    return filters
+
+
+def summarize(snapshot, rows, top):
+    """Per-extension files/bytes of the matches and the top largest of them."""
+    sizes = snapshot.size[rows]
+    known = sizes != scan_columns.MISSING
+    exts = snapshot.ext[rows]
+    count = len(snapshot.extensions)
+    files = scan_columns.numpy.bincount(exts, minlength=count)
+    nbytes = scan_columns.numpy.bincount(exts[known], weights=sizes[known], minlength=count)
+    extensions = sorted(((snapshot.extensions[i], int(files[i]), int(nbytes[i])) for i in files.nonzero()[0]),
+                        key=lambda row: (row[2], row[1]), reverse=True)
+
+    largest = []
+    if top and len(rows):
+        ranked = scan_columns.numpy.where(known, sizes, -1)
+        pick = ranked.argsort()[::-1][:top]
+        largest = [(int(sizes[i]), snapshot.file_path(int(rows[i])), int(snapshot.mtime[rows[i]])) for i in pick
+                   if known[i]]
+    return extensions, largest
+
+
+def print_result(snapshot, query, rows, plan, elapsed, extensions, largest, top):
+    width = 72
+    try:
+        term_width = shutil.get_terminal_size().columns
+    except Exception:
+        term_width = 80
+    margin = " " * max(0, (term_width - width) // 2)
+    total = snapshot.total_bytes(rows)
+
+    title = "QUERY RESULTS"
+    pad = width - 2 - len(title)
+    print("")
+    print(f"{margin}{CYAN}╔{'═' * (width - 2)}╗{RESET}")
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{GREEN}{title}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+
+    row = scan_report.print_row
+    row(margin, width, "Snapshot", scan_report.shorten_path(snapshot.path, width - 28), WHITE)
+    row(margin, width, "Scanned", snapshot.header["finished_at"].replace("T", " "), YELLOW)
+    row(margin, width, "Query", scan_report.shorten_text(query or "(everything)", width - 28), WHITE)
+    row(margin, width, "Index Used", f"{plan[0]} ({plan[1]:,} candidates)" if plan else "none (all rows)", GREEN)
+    row(margin, width, "Query Time", f"{elapsed * 1000:.1f} ms", YELLOW)
+    row(margin, width, "Matching Files", f"{len(rows):,} of {snapshot.rows:,}", PURPLE)
+    row(margin, width, "Matching Data", f"{scan_report.format_bytes(total)} "
+        f"({scan_report.format_share(total, snapshot.header['bytes'])})", BLUE)
+
+    scan_report.print_section_title(margin, width, "Matches by Extension")
+    if not extensions:
+        scan_report.print_empty(margin, width)
+    for ext, files, nbytes in extensions[:top]:
+        row(margin, width, ext or "[No Extension]", f"{files:,} | {scan_report.format_bytes(nbytes)}", BLUE)
+    if len(extensions) > top:
+        scan_report.print_empty(margin, width, f"... {len(extensions) - top:,} more")
+
+    scan_report.print_section_title(margin, width, f"Top {top} Largest Matches")
+    if not largest:
+        scan_report.print_empty(margin, width)
+    label_width = 11
+    path_room = width - 2 - (3 + label_width + 3)
+    for size, path, _ in largest:
+        row(margin, width, scan_report.format_bytes(size), scan_report.shorten_path(path, path_room), WHITE,
+            label_width)
+    print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a columnar scan snapshot (see --columnar)")
+    parser.add_argument("snapshot", help="snapshot written with --columnar")
+    parser.add_argument("filters", nargs="*", metavar="FILTER",
+                        help="ext=.jpg,.png  size>10MB  mtime<2024-01-01 (or mtime<90d)  under=/data")
+    parser.add_argument("--json", action="store_true", help="print the result as json")
+    parser.add_argument("--paths", action="store_true", help="print only the matching paths, one per line")
+    parser.add_argument("--top", type=int, default=10, metavar="N",
+                        help="rows per report section (default: 10)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="filter whole columns instead of using (and building) the snapshot's indexes")
+    options = parser.parse_args()
+
+    os.system("")  # Enable ANSI
+    try:
+        filters = parse_filters(options.filters)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        snapshot = scan_columns.ColumnarSnapshot(options.snapshot)
+        index = None if options.no_index else scan_columns.open_index(snapshot)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"{RED}Error: {e}{RESET}")
+        sys.exit(1)
+
+    start = time.monotonic()
+    rows = snapshot.select(index=index, **filters)
+    elapsed = time.monotonic() - start
+    plan = index.plan if index is not None else None
+
+    if options.paths:
+        for row in rows:
+            print(snapshot.file_path(int(row)))
+        return
+    extensions, largest = summarize(snapshot, rows, options.top)
+    if options.json:
+        print(json.dumps({
+            "snapshot": snapshot.path,
+            "finished_at": snapshot.header["finished_at"],
+            "query": options.filters,
+            "index": {"filter": plan[0], "candidates": plan[1]} if plan else None,
+            "seconds": round(elapsed, 6),
+            "files": len(rows),
+            "bytes": snapshot.total_bytes(rows),
+            "extensions": [{"extension": ext, "files": files, "bytes": nbytes} for ext, files, nbytes in extensions],
+            "largest": [{"path": path, "bytes": size, "mtime": mtime} for size, path, mtime in largest],
+        }, indent=2))
+        return
+    print_result(snapshot, " ".join(options.filters), rows, plan, elapsed, extensions, largest, options.top)
+
+
+if __name__ == "__main__":
+    main()
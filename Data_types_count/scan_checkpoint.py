@@ -0,0 +1,70 @@
+import os
+import time
+import pickle
+
+# Resumable scans: --checkpoint / --resume.
+#
+# Every CHECKPOINT_EVERY seconds (and once more on Ctrl+C) the scan briefly
+# pauses its workers between two folders and writes the folders still queued
+# (the frontier) together with everything counted so far: the live totals,
+# the merged per-extension / largest-file tally and the set of hard-linked
+# inodes already seen. While paused no folder is half done, so the frontier
+# and the totals always agree. --resume loads that state and walks only the
+# frontier. The file is removed once a scan finishes.
+#
+# The file is a pickle written next to its final name and renamed into place,
+# so a crash while saving leaves the previous checkpoint intact. Like the
+# scan index it is a private cache of this user; do not load files from
+# elsewhere.
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.expanduser("~"), ".scan_checkpoint")
+
+# Seconds between periodic checkpoints
+CHECKPOINT_EVERY = 60
+
+# Bumped whenever the saved state changes shape; older files are ignored
+FORMAT_VERSION = 3
+
+
+class ScanCheckpoint:
+    """Where and how often a scan saves its state, and whether to resume."""
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH, interval=CHECKPOINT_EVERY, resume=False):
+        self.path = path
+        self.interval = interval
+        self.resume = resume
+        self.last_save = time.monotonic()
+        self.saves = 0
+        # Folders already counted by the run that was resumed (0 if none)
+        self.resumed_folders = 0
+
+    def due(self):
+        return self.interval > 0 and time.monotonic() - self.last_save >= self.interval
+
+    def save(self, state):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((FORMAT_VERSION, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.last_save = time.monotonic()
+        self.saves += 1
+
+    def load(self):
+        """The saved state, or None if there is no (usable) checkpoint."""
+        try:
+            with open(self.path, "rb") as f:
+                version, state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if version != FORMAT_VERSION:
+            return None
+        return state
+
+    def discard(self):
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,500 @@
+import os
+import sys
+import json
+import mmap
+import time
+import array
+import bisect
+import shutil
+import struct
+import tempfile
+import threading
+
+import scan_snapshot
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Columnar per-file snapshots (--columnar), for questions like "how many .log
+# files older than 90 days over 100 MB?" without scanning again.
+#
+# The file is one header followed by flat little-endian arrays, one per
+# column, each starting on an 8-byte boundary:
+#   SCANCOL1 <u64 header length> <json header, padded>
+#   size     int64  per file, MISSING if unknown
+#   mtime    int64  per file, whole seconds, MISSING if unknown
+#   ext      int32  per file, index into header["extensions"]
+#   dir      int32  per file, index into the folder string table
+#   name_end uint64 per file, end of its name in names
+#   names    bytes  file names (not paths), utf-8 with surrogateescape
+#   dir_end  uint64 per folder, end of its path in dirs
+#   dirs     bytes  folder paths
+# The header maps every column to [offset, dtype, count].
+#
+# Reading maps the file and wraps the columns as numpy arrays without
+# copying, so a filter is a handful of whole-column comparisons: tens of
+# millions of files take well under a second, and only the pages the
+# question touches are ever read. numpy is needed for reading only;
+# writing runs on the standard library.
+#
+# Writing is memory-bounded except for the folder table: rows are
+# buffered per column and appended to temporary files every COLUMN_CHUNK
+# files, then copied into place behind the header at the end.
+
+MAGIC = b"SCANCOL1"
+FORMAT_VERSION = 1
+
+# Stands for an unknown size or mtime
+MISSING = -(1 << 63)
+
+# Files buffered in memory per column before they go to the temporary files
+COLUMN_CHUNK = 1 << 16
+
+ALIGN = 8
+
+# (column, array typecode, numpy dtype), in file order
+COLUMNS = (
+    ("size", "q", "<i8"),
+    ("mtime", "q", "<i8"),
+    ("ext", "i", "<i4"),
+    ("dir", "i", "<i4"),
+    ("name_end", "Q", "<u8"),
+    ("names", "B", "u1"),
+    ("dir_end", "Q", "<u8"),
+    ("dirs", "B", "u1"),
+)
+
+
+def _encode(text):
+    return text.encode("utf-8", "surrogateescape")
+
+
+def _decode(data):
+    return bytes(data).decode("utf-8", "surrogateescape")
+
+
+def _write_container(path, magic, header, columns):
+    """
+    Writes magic, header and columns to path (atomically). columns are
+    (name, dtype, count, data) in file order, data bytes-like or the path of
+    a file holding them; header["columns"] is filled in on the way.
+    """
+    # The offsets depend on the header's own length; repeat until it settles
+    offset = 0
+    while True:
+        layout = {}
+        position = offset
+        for name, dtype, count, _ in columns:
+            layout[name] = [position, dtype, count]
+            position += -(-count * int(dtype[-1]) // ALIGN) * ALIGN
+        header["columns"] = layout
+        encoded = json.dumps(header).encode("utf-8")
+        needed = -(-(len(magic) + 8 + len(encoded)) // ALIGN) * ALIGN
+        if needed == offset:
+            break
+        offset = needed
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as out:
+        out.write(magic + struct.pack("<Q", len(encoded)) + encoded)
+        for name, _, _, data in columns:
+            out.write(b"\0" * (layout[name][0] - out.tell()))
+            if isinstance(data, str):
+                with open(data, "rb") as part:
+                    shutil.copyfileobj(part, out, 1 << 20)
+            else:
+                out.write(data)
+        out.write(b"\0" * (position - out.tell()))
+    os.replace(tmp, path)
+
+
+def _map_container(path, magic, version, what):
+    """(header, mmap, {column: numpy array}) of a file written by _write_container."""
+    with open(path, "rb") as f:
+        start = f.read(len(magic) + 8)
+        if len(start) < len(magic) + 8 or start[:len(magic)] != magic:
+            raise ValueError(f"{path} is not a {what}")
+        (length,) = struct.unpack("<Q", start[len(magic):])
+        header = json.loads(f.read(length))
+        if header.get("version") != version:
+            raise ValueError(f"{path} has format {header.get('version')}, expected {version}")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    columns = {name: numpy.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+               for name, (offset, dtype, count) in header["columns"].items()}
+    return header, mapped, columns
+
+
+class ColumnarWriter:
+    """file_sink collecting (path, extension, size, mtime) records into a columnar snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.extension_ids = {}
+        self.dir_ids = {}
+        self.name_bytes = 0
+        self.dir_bytes = 0
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.tmpdir = tempfile.mkdtemp(prefix="columns-", dir=folder)
+        self.files = {name: open(os.path.join(self.tmpdir, name), "wb") for name, _, _ in COLUMNS}
+        self._new_chunk()
+
+    def _new_chunk(self):
+        # The two string blobs are bytearrays, the other columns arrays
+        self.chunk = {name: array.array(code) for name, code, _ in COLUMNS if code != "B"}
+        self.chunk_names = bytearray()
+        self.chunk_dirs = bytearray()
+
+    def _spill(self):
+        for name, column in self.chunk.items():
+            if sys.byteorder != "little":
+                column.byteswap()
+            column.tofile(self.files[name])
+        self.files["names"].write(self.chunk_names)
+        self.files["dirs"].write(self.chunk_dirs)
+        self._new_chunk()
+
+    def add_files(self, records):
+        """file_sink: records are (path, extension, size, mtime) tuples."""
+        with self.lock:
+            chunk = self.chunk
+            sizes, mtimes, exts, dirs, name_ends = (chunk["size"], chunk["mtime"], chunk["ext"], chunk["dir"],
+                                                    chunk["name_end"])
+            extension_ids = self.extension_ids
+            dir_ids = self.dir_ids
+            names = self.chunk_names
+            last_folder = last_id = None
+            for path, ext, size, mtime in records:
+                folder, name = os.path.split(path)
+                if folder != last_folder:
+                    last_id = dir_ids.get(folder)
+                    if last_id is None:
+                        last_id = dir_ids[folder] = len(dir_ids)
+                        # select(under=) looks folders up by absolute path
+                        encoded = _encode(os.path.abspath(folder))
+                        self.dir_bytes += len(encoded)
+                        self.chunk_dirs += encoded
+                        chunk["dir_end"].append(self.dir_bytes)
+                    last_folder = folder
+                ext_id = extension_ids.get(ext)
+                if ext_id is None:
+                    ext_id = extension_ids[ext] = len(extension_ids)
+                encoded = _encode(name)
+                self.name_bytes += len(encoded)
+                names += encoded
+                sizes.append(MISSING if size is None else size)
+                mtimes.append(MISSING if mtime is None else mtime)
+                exts.append(ext_id)
+                dirs.append(last_id)
+                name_ends.append(self.name_bytes)
+            self.rows += len(records)
+            if len(sizes) >= COLUMN_CHUNK:
+                self._spill()
+
+    def finish(self, stats, roots):
+        """Writes the snapshot file (header, then the columns), then cleans up."""
+        with self.lock:
+            try:
+                self._spill()
+                for f in self.files.values():
+                    f.close()
+                counts = {"size": self.rows, "mtime": self.rows, "ext": self.rows, "dir": self.rows,
+                          "name_end": self.rows, "names": self.name_bytes, "dir_end": len(self.dir_ids),
+                          "dirs": self.dir_bytes}
+                header = {
+                    "version": FORMAT_VERSION,
+                    "roots": [os.path.abspath(r) for r in roots],
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "files": self.rows,
+                    "folders": stats["folders"],
+                    "bytes": stats["scanned_bytes"],
+                    "extensions": sorted(self.extension_ids, key=self.extension_ids.get),
+                }
+                _write_container(self.path, MAGIC, header,
+                                 [(name, dtype, counts[name], os.path.join(self.tmpdir, name))
+                                  for name, _, dtype in COLUMNS])
+            finally:
+                self._cleanup()
+
+    def close(self):
+        """Drops everything without writing (e.g. after an interrupted scan)."""
+        with self.lock:
+            self._cleanup()
+
+    def _cleanup(self):
+        for f in self.files.values():
+            f.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class ColumnarSnapshot:
+    """
+    A columnar snapshot mapped into memory. size, mtime, ext and dir are
+    numpy arrays over the file; select() combines filters on them into the
+    row numbers of the matching files.
+    """
+
+    def __init__(self, path):
+        if numpy is None:
+            raise RuntimeError("reading columnar snapshots needs numpy (pip install numpy)")
+        self.path = path
+        self.header, self.map, self.columns = _map_container(path, MAGIC, FORMAT_VERSION, "columnar snapshot")
+        self.size = self.columns["size"]
+        self.mtime = self.columns["mtime"]
+        self.ext = self.columns["ext"]
+        self.dir = self.columns["dir"]
+        self.extensions = self.header["extensions"]
+        self.rows = self.header["files"]
+        self._dir_paths = None
+
+    def close(self):
+        self.columns = self.size = self.mtime = self.ext = self.dir = None
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def dir_paths(self):
+        """Path of every folder, by folder id (decoded once, on first use)."""
+        if self._dir_paths is None:
+            blob = self.columns["dirs"]
+            ends = self.columns["dir_end"].tolist()
+            self._dir_paths = [_decode(blob[start:end]) for start, end in zip([0] + ends, ends)]
+        return self._dir_paths
+
+    def dir_path(self, folder):
+        """Path of one folder, without decoding the whole table."""
+        if self._dir_paths is not None:
+            return self._dir_paths[folder]
+        ends = self.columns["dir_end"]
+        start = int(ends[folder - 1]) if folder else 0
+        return _decode(self.columns["dirs"][start:int(ends[folder])])
+
+    def name(self, row):
+        ends = self.columns["name_end"]
+        start = int(ends[row - 1]) if row else 0
+        return _decode(self.columns["names"][start:int(ends[row])])
+
+    def file_path(self, row):
+        return os.path.join(self.dir_path(int(self.dir[row])), self.name(row))
+
+    def extension_ids(self, ext):
+        """Ids of an extension or a list of them (lowercase, with the dot, "" for none)."""
+        wanted = {ext} if isinstance(ext, str) else set(ext)
+        return [i for i, name in enumerate(self.extensions) if name in wanted]
+
+    def select(self, ext=None, min_size=None, max_size=None, modified_after=None, modified_before=None,
+               under=None, index=None):
+        """
+        Row numbers (a sorted numpy array) of the files matching every given
+        filter: ext an extension or a list of them (see extension_ids), sizes
+        in bytes (inclusive), times in epoch seconds (after is inclusive,
+        before exclusive), under a folder path. Filters on a missing size or
+        mtime never match.
+        With an index (a ColumnarIndex of this snapshot) only the candidates
+        of its most selective filter are looked at; index.plan then says
+        which one that was. Without it every filter runs over whole columns.
+        """
+        rows = None
+        if index is not None:
+            rows = index.candidates(self, ext, min_size, max_size, under)
+        pick = (lambda column: column) if rows is None else (lambda column: column[rows])
+
+        mask = numpy.ones(self.rows if rows is None else len(rows), dtype=bool)
+        if ext is not None:
+            mask &= numpy.isin(pick(self.ext), self.extension_ids(ext))
+        if min_size is not None or max_size is not None:
+            sizes = pick(self.size)
+            mask &= sizes != MISSING
+            if min_size is not None:
+                mask &= sizes >= min_size
+            if max_size is not None:
+                mask &= sizes <= max_size
+        if modified_after is not None or modified_before is not None:
+            mtimes = pick(self.mtime)
+            mask &= mtimes != MISSING
+            if modified_after is not None:
+                mask &= mtimes >= modified_after
+            if modified_before is not None:
+                mask &= mtimes < modified_before
+        if under is not None:
+            if index is not None:
+                low, high = index.dir_range(self, under)
+                ranks = index.dir_rank[pick(self.dir)]
+                mask &= (ranks >= low) & (ranks < high)
+            else:
+                under = os.path.abspath(under)
+                prefix = under.rstrip(os.sep) + os.sep
+                inside = numpy.fromiter((path == under or path.startswith(prefix) for path in self.dir_paths()),
+                                        dtype=bool, count=len(self.dir_paths()))
+                mask &= inside[pick(self.dir)]
+        if rows is None:
+            return numpy.flatnonzero(mask)
+        return numpy.sort(rows[mask])
+
+    def total_bytes(self, rows):
+        """Sum of the known sizes of the given rows."""
+        sizes = self.size[rows]
+        return int(sizes[sizes != MISSING].sum())
+
+
+# Indexes over a snapshot (query.py), kept next to it as <snapshot>.idx and
+# rebuilt whenever the snapshot is newer. Each is a permutation of the rows
+# plus where every group starts in it, so a filter's candidates are one or a
+# few contiguous slices instead of a pass over every row:
+#   ext_rows / ext_start     rows grouped by extension id
+#   size_rows / size_start   rows grouped by log2 size bucket (as in the
+#                            extension histograms; unknown sizes last)
+#   dir_rows / dir_start     rows grouped by folder, folders in pre-order
+#                            (see scan_snapshot.sort_key), so everything
+#                            under a folder is one slice
+#   dir_rank / dir_by_rank   folder id -> position in that order, and back
+INDEX_MAGIC = b"SCANIDX1"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+
+# Size buckets: 0 for empty files, b for [2**(b-1), 2**b), the last for unknown
+SIZE_INDEX_BUCKETS = 65
+_BUCKET_BOUNDS = [1 << b for b in range(SIZE_INDEX_BUCKETS - 2)]
+
+
+def _size_bucket(size):
+    return min(max(size, 0).bit_length(), SIZE_INDEX_BUCKETS - 2)
+
+
+def _group(keys, groups):
+    """(rows ordered by key, start of every key 0..groups in them)."""
+    order = numpy.argsort(keys, kind="stable")
+    starts = numpy.searchsorted(keys[order], numpy.arange(groups + 1))
+    return order.astype("<u4"), starts.astype("<u8")
+
+
+class _RankedDirKeys:
+    """Sort keys of the folders in rank order, decoded only where bisect looks."""
+
+    def __init__(self, snapshot, dir_by_rank):
+        self.snapshot = snapshot
+        self.dir_by_rank = dir_by_rank
+
+    def __len__(self):
+        return len(self.dir_by_rank)
+
+    def __getitem__(self, rank):
+        return scan_snapshot.sort_key(self.snapshot.dir_path(int(self.dir_by_rank[rank])))
+
+
+class ColumnarIndex:
+    """The indexes of one snapshot; see open_index()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.header, self.map, self.columns = _map_container(path, INDEX_MAGIC, INDEX_VERSION, "snapshot index")
+        self.dir_rank = self.columns["dir_rank"]
+        self.plan = None
+
+    def close(self):
+        self.columns = self.dir_rank = None
+        self.map.close()
+
+    @staticmethod
+    def build(snapshot, path):
+        """Writes the index file of snapshot to path."""
+        columns = snapshot.columns
+        sizes = columns["size"]
+        buckets = numpy.searchsorted(_BUCKET_BOUNDS, sizes, side="right")
+        buckets[sizes == MISSING] = SIZE_INDEX_BUCKETS - 1
+
+        folders = len(columns["dir_end"])
+        paths = snapshot.dir_paths()
+        dir_by_rank = numpy.array(sorted(range(folders), key=lambda i: scan_snapshot.sort_key(paths[i])),
+                                  dtype="<u4")
+        dir_rank = numpy.empty(folders, dtype="<u4")
+        dir_rank[dir_by_rank] = numpy.arange(folders, dtype="<u4")
+
+        parts = []
+        for name, keys, groups in (("ext", columns["ext"], len(snapshot.extensions)),
+                                   ("size", buckets, SIZE_INDEX_BUCKETS),
+                                   ("dir", dir_rank[columns["dir"]], folders)):
+            rows, starts = _group(keys, groups)
+            parts.append((f"{name}_rows", "<u4", len(rows), rows.tobytes()))
+            parts.append((f"{name}_start", "<u8", len(starts), starts.tobytes()))
+        parts.append(("dir_rank", "<u4", folders, dir_rank.tobytes()))
+        parts.append(("dir_by_rank", "<u4", folders, dir_by_rank.tobytes()))
+        _write_container(path, INDEX_MAGIC, {"version": INDEX_VERSION, "snapshot": _identity(snapshot)}, parts)
+
+    def dir_range(self, snapshot, under):
+        """[low, high) folder ranks of under and everything below it."""
+        key = scan_snapshot.sort_key(os.path.abspath(under))
+        inside = key if key.endswith("\0") else key + "\0"
+        keys = _RankedDirKeys(snapshot, self.columns["dir_by_rank"])
+        return bisect.bisect_left(keys, key), bisect.bisect_left(keys, inside[:-1] + "\x01")
+
+    def candidates(self, snapshot, ext=None, min_size=None, max_size=None, under=None):
+        """
+        Rows that can match: those of the filter whose index leaves the
+        fewest, or None if none of them is given. Sets plan to
+        (filter, candidates).
+        """
+        columns = self.columns
+        choices = []
+        if ext is not None:
+            starts = columns["ext_start"]
+            slices = [(int(starts[i]), int(starts[i + 1])) for i in snapshot.extension_ids(ext)]
+            choices.append(("ext", "ext_rows", slices))
+        if min_size is not None or max_size is not None:
+            starts = columns["size_start"]
+            low = _size_bucket(min_size) if min_size is not None else 0
+            high = _size_bucket(max_size) if max_size is not None else SIZE_INDEX_BUCKETS - 2
+            choices.append(("size", "size_rows", [(int(starts[low]), int(starts[high + 1]))] if low <= high else []))
+        if under is not None:
+            starts = columns["dir_start"]
+            low, high = self.dir_range(snapshot, under)
+            choices.append(("under", "dir_rows", [(int(starts[low]), int(starts[high]))]))
+        if not choices:
+            self.plan = None
+            return None
+
+        name, column, slices = min(choices, key=lambda choice: sum(end - start for start, end in choice[2]))
+        rows = columns[column]
+        picked = [rows[start:end] for start, end in slices]
+        result = numpy.concatenate(picked) if picked else numpy.empty(0, dtype="<u4")
+        self.plan = (name, len(result))
+        return result
+
+
+def _identity(snapshot):
+    """What ties an index to the exact snapshot file it was built from."""
+    st = os.stat(snapshot.path)
+    return {"finished_at": snapshot.header["finished_at"], "files": snapshot.rows,
+            "bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def open_index(snapshot):
+    """
+    The ColumnarIndex of snapshot, built first if missing or stale. If the
+    index cannot be saved next to the snapshot it goes to the temp folder.
+    """
+    beside = snapshot.path + INDEX_SUFFIX
+    fallback = os.path.join(tempfile.gettempdir(), os.path.basename(snapshot.path) + INDEX_SUFFIX)
+    identity = _identity(snapshot)
+    for path in (beside, fallback):
+        try:
+            index = ColumnarIndex(path)
+        except (OSError, ValueError):
+            continue
+        if index.header.get("snapshot") == identity:
+            return index
+        index.close()
+    try:
+        ColumnarIndex.build(snapshot, beside)
+        return ColumnarIndex(beside)
+    except OSError:
+        ColumnarIndex.build(snapshot, fallback)
+        return ColumnarIndex(fallback)
@@ -0,0 +1,139 @@
+import os
+import hashlib
+import threading
+import concurrent.futures
+
+# Duplicate file search for the scanners' --dupes option.
+#
+# The scan hands every file to DuplicateFinder.add_files() (it is a file_sink,
+# see scan_engine.list_directory), which only keeps files that share their
+# size with another one. find() then narrows the candidates down in stages,
+# each much cheaper than the next one's input would be to read in full:
+#   1. same size                  - known from the scan, no I/O
+#   2. not a hard link of another - one stat per candidate
+#   3. same first and last EDGE_BYTES - two small reads per candidate
+#   4. same full content hash     - whole file, only for what is left
+# Stages 3 and 4 run in a pool of reader threads (hashlib releases the GIL
+# while it hashes, so the readers overlap I/O and hashing).
+#
+# Files up to 2 * EDGE_BYTES are read completely in stage 3, so for them the
+# edge hash already is the full hash.
+
+DEFAULT_MIN_SIZE = 4096
+DEFAULT_READERS = 4
+
+EDGE_BYTES = 4096
+READ_CHUNK = 1024 * 1024
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+def edge_hash(path, size):
+    """Hash of the first and last EDGE_BYTES of a file (all of it if small)."""
+    h = _new_hash()
+    with open(path, "rb") as f:
+        if size <= 2 * EDGE_BYTES:
+            h.update(f.read())
+        else:
+            h.update(f.read(EDGE_BYTES))
+            f.seek(-EDGE_BYTES, os.SEEK_END)
+            h.update(f.read(EDGE_BYTES))
+    return h.digest()
+
+
+def full_hash(path):
+    h = _new_hash()
+    buf = bytearray(READ_CHUNK)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.digest()
+
+
+class DuplicateFinder:
+    """Collects files during a scan and finds groups with identical content."""
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, readers=DEFAULT_READERS):
+        self.min_size = max(1, min_size)
+        self.readers = readers
+        self.lock = threading.Lock()
+        self.by_size = {}  # size -> path, or list of paths once there are two
+        # Filled in by find()
+        self.groups = []
+        self.reclaimable = 0
+        self.bytes_read = 0
+
+    def add_files(self, records):
+        """file_sink: records are (path, extension, size, mtime) tuples."""
+        min_size = self.min_size
+        with self.lock:
+            by_size = self.by_size
+            for path, _, size, _ in records:
+                if size is None or size < min_size:
+                    continue
+                seen = by_size.get(size)
+                if seen is None:
+                    by_size[size] = path
+                elif isinstance(seen, list):
+                    seen.append(path)
+                else:
+                    by_size[size] = [seen, path]
+
+    def _regroup(self, groups, key_of, pool):
+        """Splits every group by key_of(path, size); keeps parts with 2+ files."""
+        futures = {}
+        for size, paths in groups:
+            for path in paths:
+                futures[pool.submit(key_of, path, size)] = (size, path)
+
+        parts = {}
+        for future in concurrent.futures.as_completed(futures):
+            size, path = futures[future]
+            try:
+                key = future.result()
+            except OSError:
+                continue  # unreadable or gone since the scan
+            parts.setdefault((size, key), []).append(path)
+        return [(size, paths) for (size, _), paths in parts.items() if len(paths) > 1]
+
+    def find(self):
+        """
+        Runs the hashing stages. Returns groups of identical files as
+        (reclaimable bytes, size, sorted paths), biggest saving first;
+        the same list is kept in self.groups.
+        """
+        with self.lock:
+            candidates = [(size, paths) for size, paths in self.by_size.items() if isinstance(paths, list)]
+            self.by_size = {}
+
+        # Hard links share their data; keep one path per inode
+        unique = []
+        for size, paths in candidates:
+            inodes = {}
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                inodes.setdefault((st.st_dev, st.st_ino), path)
+            if len(inodes) > 1:
+                unique.append((size, list(inodes.values())))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.readers) as pool:
+            survivors = self._regroup(unique, edge_hash, pool)
+            self.bytes_read = sum(min(size, 2 * EDGE_BYTES) * len(paths) for size, paths in unique)
+            small = [(size, paths) for size, paths in survivors if size <= 2 * EDGE_BYTES]
+            large = [(size, paths) for size, paths in survivors if size > 2 * EDGE_BYTES]
+            self.bytes_read += sum(size * len(paths) for size, paths in large)
+            confirmed = small + self._regroup(large, lambda path, size: full_hash(path), pool)
+
+        self.groups = sorted(((size * (len(paths) - 1), size, sorted(paths)) for size, paths in confirmed),
+                             reverse=True)
+        self.reclaimable = sum(group[0] for group in self.groups)
+        return self.groups
@@ -0,0 +1,1296 @@
+import os
+import sys
+import time
+import array
+import heapq
+import bisect
+import random
+import argparse
+import threading
+import collections
+import concurrent.futures
+
+# Shared scanning engine used by enterieos.py and SELfile.py.
+#
+# Every directory found during a scan is its own unit of work. Each worker
+# thread owns a deque: it pushes the subdirectories it discovers onto its own
+# end and pops from the same end (depth-first, so it stays close to what the
+# OS just cached). A worker whose deque runs dry steals from the opposite end
+# of another worker's deque, which hands it the shallowest (usually biggest)
+# pending subtree. One giant folder therefore gets spread over the whole pool
+# instead of keeping a single thread busy until the end of the scan.
+
+
+def default_workers():
+    """Same sizing the scanners have always used for their thread pool."""
+    return min(64, (os.cpu_count() or 4) * 8)
+
+
+class WorkStealingWalker:
+    """
+    Runs visit(worker_id, dir_path) for every directory reachable from roots.
+    visit() must return the list of subdirectories to schedule next.
+    pause() holds every worker between two visits, so frontier() is then the
+    exact set of folders still to do (used for checkpoints).
+    An exception raised by visit() ends the walk; run(), join() and pause()
+    re-raise it in the calling thread.
+    """
+
+    def __init__(self, visit, max_workers=None):
+        self.visit = visit
+        self.max_workers = max_workers or default_workers()
+        self._queues = [collections.deque() for _ in range(self.max_workers)]
+        # Directories queued or currently being visited. Updated once per
+        # directory, never per file.
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._done = threading.Event()
+        self._threads = []
+        # Pausing: workers park on _resumed until it is set again
+        self._pausing = False
+        self._parked = 0
+        self._park_cond = threading.Condition()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        # First exception that escaped visit(), if any
+        self._error = None
+
+    def run(self, roots):
+        self.start(roots)
+        # Wait in short slices so Ctrl+C still reaches the main thread
+        while not self.wait(0.1):
+            pass
+        self.join()
+
+    def start(self, roots):
+        roots = list(roots)
+        if not roots:
+            self._done.set()
+            return
+
+        self._pending = len(roots)
+        for i, root in enumerate(roots):
+            self._queues[i % self.max_workers].append(root)
+
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker, args=(i,))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def wait(self, timeout):
+        """True once every directory has been visited, or the walk was aborted or failed (join() tells)."""
+        return self._done.wait(timeout)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+        if self._error is not None:
+            raise self._error
+
+    def pause(self):
+        """Blocks until no worker is inside visit() and none will start one."""
+        with self._park_cond:
+            self._resumed.clear()
+            self._pausing = True
+            self._park_cond.wait_for(lambda: self._parked == len(self._threads) or self._done.is_set())
+            if self._error is not None:
+                raise self._error
+
+    def resume(self):
+        with self._park_cond:
+            self._pausing = False
+            self._resumed.set()
+
+    def abort(self):
+        """Stops the walk; the workers exit after their current visit."""
+        self._finish()
+        self.resume()
+
+    def _finish(self):
+        # Under _park_cond, so a pause() waiting for the workers to park wakes up
+        with self._park_cond:
+            self._done.set()
+            self._park_cond.notify_all()
+
+    def frontier(self):
+        """Folders queued but not visited yet; only exact while paused."""
+        return [path for queue in self._queues for path in queue]
+
+    def _park(self):
+        with self._park_cond:
+            self._parked += 1
+            self._park_cond.notify_all()
+        self._resumed.wait()
+        with self._park_cond:
+            self._parked -= 1
+
+    def _steal(self, thief):
+        n = self.max_workers
+        start = random.randrange(n)
+        for i in range(n):
+            victim = (start + i) % n
+            if victim == thief:
+                continue
+            try:
+                return self._queues[victim].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _worker(self, idx):
+        try:
+            self._work(idx)
+        except BaseException as e:
+            # A dead worker never parks, so stop the walk rather than let pause() wait for it
+            with self._park_cond:
+                if self._error is None:
+                    self._error = e
+                self._done.set()
+                self._park_cond.notify_all()
+
+    def _work(self, idx):
+        own = self._queues[idx]
+        while not self._done.is_set():
+            if self._pausing:
+                self._park()
+                continue
+            try:
+                path = own.pop()
+            except IndexError:
+                path = self._steal(idx)
+                if path is None:
+                    self._done.wait(0.002)
+                    continue
+
+            children = []
+            try:
+                children = self.visit(idx, path) or []
+            finally:
+                # Count the children before publishing them, otherwise a thief
+                # could finish one and drop the counter to zero too early.
+                with self._pending_lock:
+                    self._pending += len(children) - 1
+                    finished = self._pending == 0
+                if finished:
+                    self._finish()
+                own.extend(children)
+
+
+# Per-extension counters are flat arrays rather than nested dicts:
+# [files, bytes, files in size bucket 0, 1, ..., SIZE_BUCKETS - 1, ages]
+# A file of size n lands in bucket n.bit_length(), i.e. [2**(b-1), 2**b);
+# the last bucket also takes everything bigger.
+EXT_FILES, EXT_BYTES, EXT_HIST = 0, 1, 2
+SIZE_BUCKETS = 48
+
+# Age histograms (scan_paths(ages=True)): how long ago files were modified
+# and accessed, by day, month and year. ages is a block of 4 * AGE_BUCKETS:
+# files and bytes per mtime bucket, then files and bytes per atime bucket.
+# Bucket b holds ages below AGE_LIMITS[b] (and from the one before); the
+# last one everything older, the first also timestamps in the future.
+# Access times are only as good as the mount lets them be (relatime
+# updates them at most once a day, noatime never).
+DAY = 86400
+AGE_LIMITS = (DAY, 7 * DAY, 30 * DAY, 90 * DAY, 182 * DAY, 365 * DAY, 2 * 365 * DAY, 5 * 365 * DAY)
+AGE_LABELS = ("< 1 day", "1-7 days", "1-4 weeks", "1-3 months", "3-6 months", "6-12 months", "1-2 years",
+              "2-5 years", "5+ years")
+AGE_BUCKETS = len(AGE_LIMITS) + 1
+AGE_MTIME_FILES, AGE_MTIME_BYTES, AGE_ATIME_FILES, AGE_ATIME_BYTES = (i * AGE_BUCKETS for i in range(4))
+EXT_AGES = EXT_HIST + SIZE_BUCKETS
+_EMPTY_EXT_COUNTER = array.array("q", [0] * (EXT_AGES + 4 * AGE_BUCKETS))
+_EMPTY_AGES = array.array("q", [0] * (4 * AGE_BUCKETS))
+
+
+def new_ext_counter():
+    return _EMPTY_EXT_COUNTER[:]
+
+
+def new_ages():
+    return _EMPTY_AGES[:]
+
+
+def top_level_dir(path, roots):
+    """The folder directly inside one of roots that path is in (the root itself for the root)."""
+    for root in roots:
+        if path == root:
+            return root
+        prefix = root.rstrip(os.sep) + os.sep
+        if path.startswith(prefix):
+            return prefix + path[len(prefix):].split(os.sep, 1)[0]
+    return path
+
+
+def _add_counter(target, counter):
+    for i, value in enumerate(counter):
+        if value:
+            target[i] += value
+
+
+def merge_ext_counters(dst, src):
+    """Adds every counter in the src dict into the dst dict (ext -> counter)."""
+    if isinstance(dst, ExtensionCounts):
+        dst.merge(src)
+        return
+    for ext, counter in src.items():
+        target = dst.get(ext)
+        if target is None:
+            dst[ext] = counter[:]
+            continue
+        _add_counter(target, counter)
+
+
+# A tree full of generated names (one unique "extension" per file: hashes,
+# timestamps, numbered backups) would otherwise grow the extension dict
+# without bound. Past EXTENSION_CAP distinct keys the rarest half is folded
+# into OTHER_EXTENSION (lossy counting): the totals stay exact, and any
+# extension holding more than 2 / EXTENSION_CAP of the files is never folded.
+# One that comes back after being folded starts counting again from zero, its
+# earlier files stay in OTHER_EXTENSION.
+EXTENSION_CAP = 4096
+# Cannot come out of splitext(), so it never collides with a real extension
+OTHER_EXTENSION = "[Other]"
+
+
+class ExtensionCounts(dict):
+    """ext -> counter dict holding at most cap keys (plus OTHER_EXTENSION)."""
+
+    def __init__(self, cap=EXTENSION_CAP):
+        super().__init__()
+        self.cap = cap
+
+    def __reduce__(self):
+        # Pickled (checkpoints, process workers) with the cap
+        return ExtensionCounts, (self.cap,), None, None, iter(self.items())
+
+    def counter(self, ext):
+        """The counter of ext, created (with an interned key) if needed."""
+        counter = self.get(ext)
+        if counter is None:
+            if self.cap and len(self) >= self.cap:
+                self.fold()
+                # Folding may just have created the bucket asked for
+                counter = self.get(ext)
+                if counter is not None:
+                    return counter
+            counter = self[sys.intern(ext)] = new_ext_counter()
+        return counter
+
+    def fold(self):
+        """Folds all but the cap // 2 most common extensions into OTHER_EXTENSION."""
+        ranked = sorted((ext for ext in self if ext != OTHER_EXTENSION),
+                        key=lambda ext: self[ext][EXT_FILES], reverse=True)
+        rest = ranked[self.cap // 2:]
+        if not rest:
+            return
+        other = self.get(OTHER_EXTENSION)
+        if other is None:
+            other = self[OTHER_EXTENSION] = new_ext_counter()
+        for ext in rest:
+            _add_counter(other, self.pop(ext))
+
+    def merge(self, src):
+        """Adds every counter in the src dict (ext -> counter)."""
+        for ext, counter in src.items():
+            # Added, never assigned: counter() may hand back a bucket that already holds counts
+            _add_counter(self.counter(ext), counter)
+
+
+def size_bucket_bounds(bucket):
+    """(lowest, highest) size in bytes that falls into a histogram bucket."""
+    if bucket == 0:
+        return 0, 0
+    return 1 << (bucket - 1), (1 << bucket) - 1
+
+
+class DirSummary:
+    """Aggregates of the entries directly inside one directory."""
+
+    __slots__ = ("subdirs", "linked_dirs", "files", "bytes", "extensions", "largest",
+                 "allocated", "hardlinks", "entries", "ages")
+
+    def __init__(self, subdirs=None, linked_dirs=0, files=0, bytes=0, extensions=None, largest=None,
+                 allocated=0, hardlinks=None, entries=0, ages=None):
+        self.subdirs = subdirs if subdirs is not None else []  # names, not paths
+        self.linked_dirs = linked_dirs
+        self.files = files
+        self.bytes = bytes
+        self.extensions = extensions if extensions is not None else ExtensionCounts()  # ext -> counter
+        self.largest = largest if largest is not None else []  # (size, name) min-heap
+        self.allocated = allocated  # on-disk bytes of files with one link
+        self.hardlinks = hardlinks if hardlinks is not None else []  # (inode key, allocated)
+        self.entries = entries  # everything the listing returned, excluded entries too
+        self.ages = ages  # age histograms of the files (see AGE_LIMITS), if asked for
+
+
+class Tally:
+    """
+    What one worker (thread or process partition) has aggregated besides the
+    live counters: the per-extension counters and, with top_k, a min-heap of
+    its top_k largest files plus the own (non-recursive) size of every folder.
+    With hotspots, min-heaps of the folders that took longest to list
+    (seconds, entries, path) and of those with the most entries
+    (entries, seconds, path), hotspots of each.
+    With roots, the folders' age histograms added up per top-level folder
+    (see top_level_dir) in dir_ages.
+    """
+
+    __slots__ = ("top_k", "extensions", "largest", "dir_bytes", "hotspots", "slowest", "widest",
+                 "listing_seconds", "listed", "roots", "dir_ages")
+
+    def __init__(self, top_k=0, extension_cap=EXTENSION_CAP, hotspots=0, roots=None):
+        self.top_k = top_k
+        self.extensions = ExtensionCounts(extension_cap)
+        self.largest = []
+        self.dir_bytes = {}
+        self.hotspots = hotspots
+        self.slowest = []
+        self.widest = []
+        self.listing_seconds = 0.0
+        self.listed = 0
+        self.roots = roots
+        self.dir_ages = {}
+
+    def add_dir(self, path, summary):
+        # list_directory may have counted straight into our dict already
+        if summary.extensions is not self.extensions:
+            self.extensions.merge(summary.extensions)
+
+        if self.top_k:
+            self.dir_bytes[path] = summary.bytes
+            for size, name in summary.largest:
+                push_bounded(self.largest, self.top_k, (size, os.path.join(path, name)))
+
+        if self.roots and summary.ages is not None and summary.files:
+            self._add_ages(top_level_dir(path, self.roots), summary.ages)
+
+    def _add_ages(self, top, ages):
+        target = self.dir_ages.get(top)
+        if target is None:
+            self.dir_ages[top] = ages[:]
+        else:
+            _add_counter(target, ages)
+
+    def add_listing(self, path, seconds, entries):
+        """Timing of one list_directory() call."""
+        self.listing_seconds += seconds
+        self.listed += 1
+        if self.hotspots:
+            push_bounded(self.slowest, self.hotspots, (seconds, entries, path))
+            push_bounded(self.widest, self.hotspots, (entries, seconds, path))
+
+    def merge(self, other):
+        self.extensions.merge(other.extensions)
+        for item in other.largest:
+            push_bounded(self.largest, self.top_k, item)
+        self.dir_bytes.update(other.dir_bytes)
+        self.listing_seconds += other.listing_seconds
+        self.listed += other.listed
+        for item in other.slowest:
+            push_bounded(self.slowest, self.hotspots, item)
+        for item in other.widest:
+            push_bounded(self.widest, self.hotspots, item)
+        for top, ages in other.dir_ages.items():
+            self._add_ages(top, ages)
+
+
+def push_bounded(heap, k, item):
+    """Keeps heap as a min-heap of the k largest items seen. O(log k)."""
+    if k <= 0:
+        return
+    if len(heap) < k:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+def rollup_sizes(dir_bytes):
+    """Turns per-folder own sizes into recursive (du-style) sizes."""
+    totals = dict(dir_bytes)
+    # Deepest folders first, so every child is final before it is added to its parent
+    for path in sorted(totals, key=lambda p: p.count(os.sep), reverse=True):
+        parent = os.path.dirname(path)
+        if parent != path and parent in totals:
+            totals[parent] += totals[path]
+    return totals
+
+
+# Scan modes. Counting needs nothing but the directory listing; sizes need a
+# stat per file, which DirEntry.stat() does without rebuilding the path (and
+# for free on Windows, where the listing already carries it).
+MODE_COUNT = "count"
+MODE_SIZE = "size"
+
+# Report columns that can only be filled in with per-file stat data
+SIZE_COLUMNS = {"bytes", "allocated", "top_files", "top_dirs", "extension_bytes"}
+
+
+def mode_for_columns(columns):
+    """Picks the cheapest scan mode that can fill the requested report columns."""
+    if SIZE_COLUMNS.intersection(columns):
+        return MODE_SIZE
+    return MODE_COUNT
+
+
+# Backends. Threads share one interpreter, so past a few workers the Python
+# side of the scan (splitext, lower, dict updates) is serialized by the GIL.
+# The process backend walks separate partitions of the tree in worker
+# processes that only send back compact aggregates.
+BACKEND_THREAD = "thread"
+BACKEND_PROCESS = "process"
+
+# Folders a worker process lists before it hands the rest of its subtree back
+# to the parent, which splits it over the pool again. Keeps one huge subtree
+# from pinning a single process and keeps progress updates flowing.
+PARTITION_BUDGET = 500
+
+# Default worker count of a --throttle scan
+THROTTLED_WORKERS = 4
+
+
+# Per-file records are handed to a file_sink in batches of this size
+FILE_BATCH = 1000
+
+
+# Layout of a worker's progress slot. BYTES is the apparent size (st_size of
+# everything seen); ALLOCATED is the space actually used on disk, counting
+# each hard-linked inode once and symlinks not at all.
+FILES, FOLDERS, BYTES, ALLOCATED = 0, 1, 2, 3
+
+# Hard-linked inodes are remembered exactly up to this many, after that in a
+# Bloom filter of this size. A Bloom false positive only means one more
+# hard-linked file is treated as already counted.
+INODE_EXACT_LIMIT = 1_000_000
+INODE_BLOOM_BYTES = 16 * 1024 * 1024
+
+# A worker inside a huge directory publishes its partial counts this often
+PUBLISH_INTERVAL = 0.05
+PUBLISH_CHECK_EVERY = 64  # entries between clock checks
+
+
+class ScanProgress:
+    """
+    Live counters for the animation thread. Each worker only ever adds to its
+    own slot, so writers never take a lock; readers just sum the slots.
+    """
+
+    def __init__(self):
+        self.slots = []
+        self.started = time.monotonic()
+        # Files counted by an earlier, resumed run; not part of the rate
+        self.restored_files = 0
+
+    def start(self, workers):
+        self.slots = [[0, 0, 0, 0] for _ in range(workers)]
+        self.started = time.monotonic()
+        self.restored_files = 0
+
+    def totals(self):
+        """Returns (files, folders, bytes) seen so far."""
+        files = folders = nbytes = 0
+        for slot in self.slots:
+            files += slot[FILES]
+            folders += slot[FOLDERS]
+            nbytes += slot[BYTES]
+        return files, folders, nbytes
+
+    def allocated_bytes(self):
+        return sum(slot[ALLOCATED] for slot in self.slots)
+
+    def files_per_second(self):
+        elapsed = time.monotonic() - self.started
+        if elapsed <= 0:
+            return 0.0
+        return (self.totals()[0] - self.restored_files) / elapsed
+
+
+class InodeSet:
+    """
+    Thread-safe set of (st_dev, st_ino) keys of hard-linked files already
+    counted. Memory is bounded: past exact_limit keys new ones go into a
+    fixed-size Bloom filter and the result is flagged as approximate.
+    """
+
+    HASHES = 4
+
+    def __init__(self, exact_limit=INODE_EXACT_LIMIT, bloom_bytes=INODE_BLOOM_BYTES):
+        self.exact_limit = exact_limit
+        self.exact = set()
+        self.bloom = None
+        self.bloom_bits = bloom_bytes * 8
+        self.bloom_bytes = bloom_bytes
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @property
+    def approximate(self):
+        return self.bloom is not None
+
+    def _bloom_positions(self, key):
+        h = (key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.HASHES)]
+
+    def add(self, key):
+        """Returns True if key was not seen before."""
+        with self.lock:
+            if key in self.exact:
+                return False
+            if len(self.exact) < self.exact_limit:
+                self.exact.add(key)
+                return True
+
+            if self.bloom is None:
+                self.bloom = bytearray(self.bloom_bytes)
+            new = False
+            for pos in self._bloom_positions(key):
+                byte, bit = pos >> 3, 1 << (pos & 7)
+                if not self.bloom[byte] & bit:
+                    self.bloom[byte] |= bit
+                    new = True
+            return new
+
+
+def inode_key(st):
+    return (st.st_dev << 64) | st.st_ino
+
+
+def list_directory(path, slot=None, mode=MODE_SIZE, file_sink=None, top_k=0, extensions=None, stop_at=None,
+                   exclude=None, ages_at=None):
+    """
+    Lists a single directory (no recursion) and returns its DirSummary.
+    If a progress slot is given, counts are published into it as they come in.
+    In MODE_COUNT no file is ever stat'ed and bytes stays 0.
+    file_sink, if given, receives lists of (path, extension, size, mtime)
+    tuples for the files in the directory, mtime in whole seconds (size and
+    mtime are None in MODE_COUNT or when the stat failed).
+    With top_k (MODE_SIZE only), summary.largest keeps the top_k largest files.
+    summary.allocated is the on-disk size of the files with a single link;
+    hard-linked ones go to summary.hardlinks as (inode key, allocated) so the
+    caller can count each inode once. Where st_blocks is not available
+    (Windows) the allocated size falls back to st_size.
+    Extension counters go into the given extensions dict (e.g. a worker's
+    Tally) instead of a fresh one when the per-folder split is not needed.
+    Subfolders whose full path is in stop_at (e.g. other mount points) are
+    counted like linked folders and not descended into. Entries excluded by
+    exclude (a scan_exclude.ExcludeRules) are skipped as if they were not there.
+    With ages_at (epoch seconds, MODE_SIZE only), the files' mtimes and atimes
+    relative to it go into the extension counters' and summary.ages' age
+    histograms (see AGE_LIMITS).
+    """
+    sizes = mode == MODE_SIZE
+    track_largest = sizes and top_k > 0
+    batch = [] if file_sink is not None else None
+    summary = DirSummary(extensions=extensions)
+    exts = summary.extensions
+    ages = None
+    if sizes and ages_at is not None:
+        ages = summary.ages = new_ages()
+    last_bucket = SIZE_BUCKETS - 1
+    published_files = 0
+    published_bytes = 0
+    published_allocated = 0
+    last_publish = time.monotonic()
+    n = 0
+
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                n += 1
+                if slot is not None and n % PUBLISH_CHECK_EVERY == 0:
+                    now = time.monotonic()
+                    if now - last_publish >= PUBLISH_INTERVAL:
+                        slot[FILES] += summary.files - published_files
+                        slot[BYTES] += summary.bytes - published_bytes
+                        slot[ALLOCATED] += summary.allocated - published_allocated
+                        published_files = summary.files
+                        published_bytes = summary.bytes
+                        published_allocated = summary.allocated
+                        last_publish = now
+
+                if exclude is not None and exclude.excludes(entry.name, entry.path):
+                    continue
+
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if stop_at and entry.path in stop_at:
+                        summary.linked_dirs += 1
+                    else:
+                        summary.subdirs.append(entry.name)
+                    continue
+
+                # Like os.walk: a link to a folder counts as a folder but
+                # is never followed
+                try:
+                    if entry.is_symlink() and entry.is_dir():
+                        summary.linked_dirs += 1
+                        continue
+                except OSError:
+                    pass
+
+                summary.files += 1
+                _, ext = os.path.splitext(entry.name)
+                ext = ext.lower()
+                counter = exts.get(ext)
+                if counter is None:
+                    counter = exts.counter(ext)
+                counter[EXT_FILES] += 1
+
+                size = mtime = None
+                if sizes:
+                    try:
+                        st = entry.stat()
+                    except (OSError, PermissionError):
+                        st = None
+                    if st is not None:
+                        size = st.st_size
+                        mtime = int(st.st_mtime)
+                        summary.bytes += size
+
+                        # A symlink allocates none of its target's space
+                        if not entry.is_symlink():
+                            blocks = getattr(st, "st_blocks", None)
+                            allocated = blocks * 512 if blocks is not None else size
+                            if st.st_nlink > 1:
+                                summary.hardlinks.append((inode_key(st), allocated))
+                            else:
+                                summary.allocated += allocated
+
+                        counter[EXT_BYTES] += size
+                        bucket = size.bit_length()
+                        counter[EXT_HIST + (bucket if bucket < last_bucket else last_bucket)] += 1
+                        if ages is not None:
+                            modified = bisect.bisect_right(AGE_LIMITS, ages_at - st.st_mtime)
+                            accessed = AGE_ATIME_FILES + bisect.bisect_right(AGE_LIMITS, ages_at - st.st_atime)
+                            counter[EXT_AGES + modified] += 1
+                            counter[EXT_AGES + modified + AGE_BUCKETS] += size
+                            counter[EXT_AGES + accessed] += 1
+                            counter[EXT_AGES + accessed + AGE_BUCKETS] += size
+                            ages[modified] += 1
+                            ages[modified + AGE_BUCKETS] += size
+                            ages[accessed] += 1
+                            ages[accessed + AGE_BUCKETS] += size
+                        if track_largest:
+                            push_bounded(summary.largest, top_k, (size, entry.name))
+
+                if batch is not None:
+                    batch.append((entry.path, ext, size, mtime))
+                    if len(batch) >= FILE_BATCH:
+                        file_sink(batch)
+                        batch = []
+    except (OSError, PermissionError):
+        pass
+
+    if batch:
+        file_sink(batch)
+
+    summary.entries = n
+    if slot is not None:
+        slot[FILES] += summary.files - published_files
+        slot[BYTES] += summary.bytes - published_bytes
+        slot[ALLOCATED] += summary.allocated - published_allocated
+        slot[FOLDERS] += len(summary.subdirs) + summary.linked_dirs
+
+    return summary
+
+
+def scan_paths(roots, stats, stats_lock, max_workers=None, index=None, progress=None, mode=MODE_SIZE,
+               backend=BACKEND_THREAD, file_sink=None, top_k=0, schedule=None, stop_at=None, exclude=None,
+               checkpoint=None, throttle=None, dir_sink=None, extension_cap=EXTENSION_CAP, hotspots=0,
+               ages=False):
+    """
+    Scans every directory under roots in parallel and adds the results to the
+    scanner's stats dict (folders, files, extensions, scanned_bytes).
+    With an index (scan_index.ScanIndex), folders whose mtime did not change
+    since the last run are taken from the index instead of being listed.
+    Live counts can be read from progress (a ScanProgress) during the scan.
+    mode is MODE_SIZE or MODE_COUNT (see mode_for_columns).
+    backend is BACKEND_THREAD or BACKEND_PROCESS; max_workers is the number of
+    threads or processes respectively.
+    file_sink receives per-file records as they are found (see list_directory).
+    stats["extension_stats"] maps each extension to its counter array (see
+    EXT_FILES / EXT_BYTES / EXT_HIST); stats["extensions"] keeps plain counts.
+    Both hold at most extension_cap extensions plus OTHER_EXTENSION for the
+    long tail (see ExtensionCounts; 0 = no cap).
+    With top_k (MODE_SIZE only) stats also gets "largest_files" and
+    "largest_dirs": the top_k (size, path) pairs, biggest first, where folder
+    sizes include everything below them.
+    In MODE_SIZE stats["allocated_bytes"] is the unique on-disk size: every
+    hard-linked inode counted once (see InodeSet), symlinks not at all.
+    stats["allocated_approximate"] is set if the inode set overflowed into
+    its Bloom filter.
+    schedule (thread backend) splits the walk into groups that run side by
+    side, each with its own worker budget: [(group_roots, workers), ...]
+    covering the same paths as roots (see scan_mounts.plan_scan). Without it
+    all roots share max_workers. stop_at and exclude are passed on to
+    list_directory; roots that exclude rules out are not scanned, and with
+    exclude.one_file_system (and no stop_at) the walk stays on the roots'
+    own filesystems.
+    checkpoint (a scan_checkpoint.ScanCheckpoint, thread backend) saves the
+    walk's state periodically and on Ctrl+C, which is then re-raised; with
+    checkpoint.resume a matching saved state is picked up instead of
+    starting over. ValueError if the saved state belongs to another scan.
+    throttle (a scan_throttle.Throttle, thread backend) caps the metadata
+    operations per second of all workers together.
+    dir_sink(path, files, bytes), if given, is called once per folder with its
+    own (non-recursive) counts, from any worker thread.
+    Every listing is timed: stats["listing_seconds"] and stats["listed_folders"]
+    add up the time spent in list_directory() (all workers together) and the
+    folders it was spent on. With hotspots, stats["slowest_dirs"] gets the
+    hotspots (seconds, entries, path) folders that took longest and
+    stats["widest_dirs"] the (entries, seconds, path) ones with the most
+    entries, biggest first. Folders taken from the index are not timed.
+    Times are wall-clock, so on the thread backend they include waiting for
+    other workers (the GIL); compare folders within one scan, not across.
+    With ages (MODE_SIZE only) the extension counters get their mtime / atime
+    histograms (EXT_AGES, relative to stats["age_reference"], the scan's
+    start) and stats["dir_ages"] maps every top-level folder (see
+    top_level_dir) to the same histograms of everything below it. Folders
+    taken from the index add no ages.
+    """
+    if exclude is not None:
+        if exclude.one_file_system and stop_at is None:
+            import scan_mounts
+            stop_at = scan_mounts.stop_points()
+        roots = [r for r in roots if not exclude.excludes_root(r)]
+        if schedule is not None:
+            schedule = [([r for r in group if not exclude.excludes_root(r)], workers)
+                        for group, workers in schedule]
+            schedule = [(group, workers) for group, workers in schedule if group]
+        # Empty rules are not worth a check per entry
+        exclude = exclude or None
+    if mode != MODE_SIZE:
+        top_k = 0
+    ages_at = time.time() if ages and mode == MODE_SIZE else None
+    if progress is None:
+        progress = ScanProgress()
+    if backend == BACKEND_PROCESS:
+        if index is not None:
+            raise ValueError("the process backend does not support the scan index")
+        if file_sink is not None:
+            raise ValueError("the process backend does not stream per-file records")
+        if checkpoint is not None:
+            raise ValueError("the process backend does not support checkpoints")
+        if throttle is not None:
+            raise ValueError("the process backend cannot be throttled")
+        return scan_paths_processes(roots, stats, stats_lock, max_workers, progress, mode, top_k, stop_at,
+                                    exclude, dir_sink, extension_cap, hotspots, ages_at)
+
+    if schedule is None:
+        schedule = [(roots, max_workers or default_workers())]
+    # Index keys, mount points, exclusion rules, snapshot rows and top-level folders are absolute paths
+    roots = [os.path.abspath(r) for r in roots]
+    schedule = [([os.path.abspath(r) for r in group], workers) for group, workers in schedule]
+    max_workers = sum(workers for _, workers in schedule)
+    progress.start(max_workers)
+    slots = progress.slots
+    # Everything except the live counters stays per worker until the walk is over
+    age_roots = roots if ages_at is not None else None
+    tallies = [Tally(top_k, extension_cap, hotspots, age_roots) for _ in range(max_workers)]
+    inodes = InodeSet()
+
+    # What identifies "the same scan" for a checkpoint
+    identity = {"roots": roots, "mode": mode, "top_k": top_k, "groups": len(schedule),
+                "rules": exclude.key if exclude else "", "hotspots": hotspots,
+                "extension_cap": extension_cap, "ages": ages_at is not None}
+    state = checkpoint.load() if checkpoint is not None and checkpoint.resume else None
+    if state is not None:
+        if state["identity"] != identity:
+            raise ValueError(f"the checkpoint in {checkpoint.path} was taken for a different scan")
+        schedule = [(frontier, workers) for frontier, (_, workers) in zip(state["frontier"], schedule)]
+        tallies[0].merge(state["tally"])
+        for i, value in enumerate(state["counts"]):
+            slots[0][i] += value
+        progress.restored_files = slots[0][FILES]
+        inodes = state["inodes"]
+        if index is not None:
+            # Keep the rows of the interrupted run safe from prune()
+            index.scan_id = state["scan_id"]
+        checkpoint.resumed_folders = slots[0][FOLDERS]
+
+    def visit(worker, path):
+        slot = slots[worker]
+        summary = None
+        if throttle is not None:
+            # The folder's listing (or its stat for the index)
+            throttle.acquire()
+        if index is not None:
+            try:
+                mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if mtime_ns is not None:
+                summary = index.lookup(path, mtime_ns, need_bytes=mode == MODE_SIZE,
+                                       need_largest=top_k > 0)
+                if summary is not None:
+                    slot[FILES] += summary.files
+                    slot[BYTES] += summary.bytes
+                    slot[ALLOCATED] += summary.allocated
+                    slot[FOLDERS] += len(summary.subdirs) + summary.linked_dirs
+
+        if summary is None:
+            # Without an index nobody needs the per-folder extension split,
+            # so count straight into the worker's tally
+            direct = tallies[worker].extensions if index is None else None
+            started = time.monotonic()
+            summary = list_directory(path, slot, mode, file_sink, top_k, direct, stop_at, exclude, ages_at)
+            elapsed = time.monotonic() - started
+            tallies[worker].add_listing(path, elapsed, summary.entries)
+            if throttle is not None:
+                throttle.charge(summary.files if mode == MODE_SIZE else 0, elapsed)
+            if index is not None and mtime_ns is not None:
+                index.store(path, mtime_ns, summary, has_bytes=mode == MODE_SIZE,
+                            has_largest=top_k > 0)
+
+        for key, allocated in summary.hardlinks:
+            if inodes.add(key):
+                slot[ALLOCATED] += allocated
+        tallies[worker].add_dir(path, summary)
+        if dir_sink is not None:
+            dir_sink(path, summary.files, summary.bytes)
+        return [os.path.join(path, name) for name in summary.subdirs]
+
+    # Each group's walker numbers its workers from 0; shift them onto its
+    # own range of slots and tallies
+    def shifted(offset):
+        return lambda worker, path: visit(offset + worker, path)
+
+    walkers = []
+    base = 0
+    for group, workers in schedule:
+        walker = WorkStealingWalker(shifted(base), workers)
+        walker.start(group)
+        walkers.append(walker)
+        base += workers
+
+    def save_checkpoint():
+        try:
+            for walker in walkers:
+                walker.pause()
+            total = Tally(top_k, extension_cap, hotspots, age_roots)
+            for tally in tallies:
+                total.merge(tally)
+            if index is not None:
+                index.flush()
+            checkpoint.save({
+                "identity": identity,
+                "frontier": [walker.frontier() for walker in walkers],
+                "counts": [sum(slot[i] for slot in slots) for i in (FILES, FOLDERS, BYTES, ALLOCATED)],
+                "tally": total,
+                "inodes": inodes,
+                "scan_id": index.scan_id if index is not None else None,
+            })
+        finally:
+            for walker in walkers:
+                walker.resume()
+
+    try:
+        # Wait in short slices so Ctrl+C still reaches the main thread
+        while not all(walker.wait(0.1) for walker in walkers):
+            if checkpoint is not None and checkpoint.due():
+                save_checkpoint()
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            save_checkpoint()
+        for walker in walkers:
+            walker.abort()
+        raise
+    for walker in walkers:
+        walker.join()
+    if checkpoint is not None:
+        checkpoint.discard()
+    if index is not None:
+        index.prune(roots)
+
+    _publish_results(stats, stats_lock, progress, tallies, roots, top_k, inodes, extension_cap, hotspots, ages_at)
+
+
+def _publish_results(stats, stats_lock, progress, tallies, roots, top_k, inodes, extension_cap=EXTENSION_CAP,
+                     hotspots=0, ages_at=None):
+    """Merges the per-worker results of a finished walk into stats."""
+    total = Tally(top_k, extension_cap, hotspots, roots if ages_at is not None else None)
+    for tally in tallies:
+        total.merge(tally)
+
+    largest_dirs = []
+    if top_k:
+        root_set = set(roots)
+        for path, size in rollup_sizes(total.dir_bytes).items():
+            # The roots themselves are trivially the biggest
+            if path not in root_set:
+                push_bounded(largest_dirs, top_k, (size, path))
+
+    files, folders, nbytes = progress.totals()
+    with stats_lock:
+        stats["folders"] += folders
+        stats["files"] += files
+        stats["scanned_bytes"] += nbytes
+        stats["allocated_bytes"] = stats.get("allocated_bytes", 0) + progress.allocated_bytes()
+        stats["allocated_approximate"] = stats.get("allocated_approximate", False) or inodes.approximate
+        ext_stats = stats.setdefault("extension_stats", ExtensionCounts(extension_cap))
+        merge_ext_counters(ext_stats, total.extensions)
+        # Rebuilt, as earlier scans' extensions may have been folded since
+        stats["extensions"].clear()
+        for ext, counter in ext_stats.items():
+            stats["extensions"][ext] = counter[EXT_FILES]
+        if top_k:
+            stats["largest_files"] = sorted(total.largest, reverse=True)
+            stats["largest_dirs"] = sorted(largest_dirs, reverse=True)
+        stats["listing_seconds"] = stats.get("listing_seconds", 0.0) + total.listing_seconds
+        stats["listed_folders"] = stats.get("listed_folders", 0) + total.listed
+        if hotspots:
+            stats["slowest_dirs"] = sorted(total.slowest, reverse=True)
+            stats["widest_dirs"] = sorted(total.widest, reverse=True)
+        if ages_at is not None:
+            stats.setdefault("age_reference", ages_at)
+            dir_ages = stats.setdefault("dir_ages", {})
+            for top, ages in total.dir_ages.items():
+                if top in dir_ages:
+                    _add_counter(dir_ages[top], ages)
+                else:
+                    dir_ages[top] = ages
+
+
+def _walk_partition(paths, mode, budget, top_k=0, stop_at=None, exclude=None, want_dirs=False,
+                    extension_cap=EXTENSION_CAP, hotspots=0, ages_at=None, roots=None):
+    """
+    Runs inside a worker process: walks depth-first from paths, listing at most
+    budget folders, and returns (files, folders, bytes, allocated, hardlinks,
+    tally, dirs, leftover) where leftover are the folders it did not get to.
+    Hard links are returned undeduplicated; only the parent sees them all.
+    With want_dirs, dirs holds (path, files, bytes) for every folder listed.
+    With ages_at, the tally's age histograms are kept per top-level folder of
+    roots (the whole scan's, not paths).
+    """
+    stack = list(paths)
+    files = folders = nbytes = allocated = 0
+    hardlinks = []
+    dirs = []
+    tally = Tally(top_k, extension_cap, hotspots, roots if ages_at is not None else None)
+    visited = 0
+
+    while stack and visited < budget:
+        path = stack.pop()
+        started = time.monotonic()
+        summary = list_directory(path, None, mode, None, top_k, tally.extensions, stop_at, exclude, ages_at)
+        tally.add_listing(path, time.monotonic() - started, summary.entries)
+        visited += 1
+
+        files += summary.files
+        folders += len(summary.subdirs) + summary.linked_dirs
+        nbytes += summary.bytes
+        allocated += summary.allocated
+        hardlinks.extend(summary.hardlinks)
+        tally.add_dir(path, summary)
+        if want_dirs:
+            dirs.append((path, summary.files, summary.bytes))
+        for name in summary.subdirs:
+            stack.append(os.path.join(path, name))
+
+    return files, folders, nbytes, allocated, hardlinks, tally, dirs, stack
+
+
+def scan_paths_processes(roots, stats, stats_lock, processes=None, progress=None, mode=MODE_SIZE, top_k=0,
+                         stop_at=None, exclude=None, dir_sink=None, extension_cap=EXTENSION_CAP, hotspots=0,
+                         ages_at=None):
+    """Process-pool version of scan_paths (see BACKEND_PROCESS)."""
+    processes = processes or os.cpu_count() or 4
+    want_dirs = dir_sink is not None
+    roots = [os.path.abspath(r) for r in roots]
+    if progress is None:
+        progress = ScanProgress()
+    # Results arrive in this (main) thread only, so one slot is enough
+    progress.start(1)
+    slot = progress.slots[0]
+    total = Tally(top_k, extension_cap, hotspots, roots if ages_at is not None else None)
+    inodes = InodeSet()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = set()
+        for root in roots:
+            pending.add(pool.submit(_walk_partition, [root], mode, PARTITION_BUDGET, top_k, stop_at, exclude,
+                                    want_dirs, extension_cap, hotspots, ages_at, roots))
+
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, folders, nbytes, allocated, hardlinks, tally, dirs, leftover = future.result()
+                slot[FILES] += files
+                slot[FOLDERS] += folders
+                slot[BYTES] += nbytes
+                slot[ALLOCATED] += allocated
+                for key, size in hardlinks:
+                    if inodes.add(key):
+                        slot[ALLOCATED] += size
+                total.merge(tally)
+                for path, dir_files, dir_bytes in dirs:
+                    dir_sink(path, dir_files, dir_bytes)
+
+                # Spread the unfinished part of the subtree over the pool
+                parts = min(processes, len(leftover))
+                for i in range(parts):
+                    pending.add(pool.submit(_walk_partition, leftover[i::parts], mode, PARTITION_BUDGET, top_k,
+                                            stop_at, exclude, want_dirs, extension_cap, hotspots, ages_at,
+                                            roots))
+
+    _publish_results(stats, stats_lock, progress, [total], roots, top_k, inodes, extension_cap, hotspots, ages_at)
+
+
+def add_exclude_arguments(parser):
+    """Options choosing what a walk leaves out (see scan_exclude)."""
+    parser.add_argument("--exclude", action="append", metavar="PATTERN",
+                        help="leave out matching files and folders: a name glob (node_modules, *.vmdk), "
+                             "a path glob (build/cache) or an absolute path; repeatable")
+    parser.add_argument("--exclude-fstype", action="append", metavar="TYPE",
+                        help="leave out mounts of these filesystem types (e.g. nfs,cifs); repeatable")
+    parser.add_argument("-x", "--one-file-system", action="store_true",
+                        help="do not descend into other mounted filesystems (like du -x)")
+    parser.add_argument("--skip-common", action="store_true",
+                        help="exclude VCS folders, node_modules, caches, VM images and network mounts")
+
+
+def add_scan_arguments(parser):
+    """Command line options shared by all scanners."""
+    parser.add_argument("--backend", choices=(BACKEND_THREAD, BACKEND_PROCESS), default=BACKEND_THREAD,
+                        help="walk with a thread pool (default) or a process pool")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of threads / processes (default: automatic)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse the on-disk scan index and only re-list folders that changed")
+    parser.add_argument("--index", metavar="PATH", default=None,
+                        help="location of the scan index file (implies --incremental)")
+    parser.add_argument("--export", metavar="PATH", default=None,
+                        help="also write the results to PATH as json, csv or ndjson")
+    parser.add_argument("--export-format", choices=("json", "csv", "ndjson"), default=None,
+                        help="export format (default: from the file extension, else json)")
+    parser.add_argument("--export-files", action="store_true",
+                        help="include one record per file in the export, streamed during the scan")
+    add_exclude_arguments(parser)
+    parser.add_argument("--checkpoint", action=argparse.BooleanOptionalAction, default=None,
+                        help="save the scan's progress regularly so it can be resumed "
+                             "(default: on for full and drive scans)")
+    parser.add_argument("--checkpoint-file", metavar="PATH", default=None,
+                        help="where to keep the checkpoint (default: ~/.scan_checkpoint)")
+    parser.add_argument("--checkpoint-every", type=float, default=None, metavar="SECONDS",
+                        help="seconds between checkpoints (default: 60, 0 = only on Ctrl+C)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the scan saved in the checkpoint instead of starting over")
+    parser.add_argument("--throttle", type=float, default=None, metavar="OPS",
+                        help="limit the scan to OPS metadata operations (listings + stats) per second, "
+                             f"backing off while the disk is slow (default workers then: {THROTTLED_WORKERS})")
+    parser.add_argument("--throttle-fixed", action="store_true",
+                        help="keep --throttle at its rate, without adaptive backoff")
+    parser.add_argument("--nice", action="store_true",
+                        help="run with the lowest CPU and I/O priority")
+    parser.add_argument("--snapshot", metavar="PATH", default=None,
+                        help="save a per-folder snapshot for snapdiff.py; strftime codes like %%Y-%%m-%%d "
+                             "are filled in (e.g. scans/%%Y-%%m-%%d.snap)")
+    parser.add_argument("--columnar", metavar="PATH", default=None,
+                        help="save every file's size, mtime, extension and folder as a columnar snapshot "
+                             "for fast queries; strftime codes are filled in like for --snapshot")
+    parser.add_argument("--dupes", action="store_true",
+                        help="find duplicate files (same size, then same head/tail hash, then same full hash)")
+    parser.add_argument("--dupes-min-size", type=int, default=None, metavar="BYTES",
+                        help="ignore smaller files when looking for duplicates (default: 4096)")
+    parser.add_argument("--dupes-readers", type=int, default=None, metavar="N",
+                        help="threads reading files for the duplicate hashes (default: 4)")
+    parser.add_argument("--sniff", action="store_true",
+                        help="break files without an extension down by content type (magic bytes)")
+    parser.add_argument("--sniff-verify", action="store_true",
+                        help="like --sniff, and also report files whose content does not fit their extension")
+    parser.add_argument("--sniff-cache", metavar="PATH", default=None,
+                        help="where to cache content types between scans (default: ~/.scan_sniff.db)")
+    parser.add_argument("--hotspots", type=int, default=0, metavar="N",
+                        help="time every folder's listing and report the N slowest and the N with the most "
+                             "entries (huge flat folders, slow shares)")
+    parser.add_argument("--ages", action="store_true",
+                        help="break the data down by when it was last modified and accessed, per extension "
+                             "and per top-level folder")
+    parser.add_argument("--extension-cap", type=int, default=EXTENSION_CAP, metavar="N",
+                        help=f"keep at most N distinct extensions, folding the rarest into {OTHER_EXTENSION} "
+                             f"(default: {EXTENSION_CAP}, 0 = no cap)")
+
+
+def parse_scan_arguments(parser):
+    """Parses the command line and rejects option combinations that cannot work."""
+    options = parser.parse_args()
+    if options.backend == BACKEND_PROCESS and (options.incremental or options.index):
+        parser.error("--incremental / --index only work with the thread backend")
+    if options.export_files and not options.export:
+        parser.error("--export-files needs --export PATH")
+    if options.workers is not None and options.workers < 1:
+        parser.error("--workers must be at least 1")
+    if options.backend == BACKEND_PROCESS and (options.checkpoint or options.resume):
+        parser.error("--checkpoint / --resume only work with the thread backend")
+    if options.resume and options.checkpoint is False:
+        parser.error("--resume cannot be combined with --no-checkpoint")
+    if options.resume and options.snapshot:
+        parser.error("--snapshot cannot be combined with --resume (folders of the first part are gone)")
+    # Options that need to see every file go through the scan's file_sink
+    for flag, wanted in (("--export-files", options.export_files), ("--dupes", options.dupes),
+                         ("--sniff", options.sniff or options.sniff_verify), ("--columnar", options.columnar)):
+        if not wanted:
+            continue
+        if options.backend == BACKEND_PROCESS:
+            parser.error(f"{flag} only works with the thread backend")
+        if options.incremental or options.index:
+            parser.error(f"{flag} cannot be combined with --incremental (unchanged folders are not listed)")
+        if options.resume:
+            parser.error(f"{flag} cannot be combined with --resume (files of the first part are gone)")
+    if options.sniff_cache and not (options.sniff or options.sniff_verify):
+        parser.error("--sniff-cache needs --sniff")
+    if not options.dupes and (options.dupes_min_size is not None or options.dupes_readers is not None):
+        parser.error("--dupes-min-size / --dupes-readers need --dupes")
+    if options.dupes_readers is not None and options.dupes_readers < 1:
+        parser.error("--dupes-readers must be at least 1")
+    if options.ages and (options.incremental or options.index):
+        parser.error("--ages cannot be combined with --incremental (unchanged folders are not stat'ed)")
+    if options.hotspots < 0:
+        parser.error("--hotspots cannot be negative")
+    if options.extension_cap < 0:
+        parser.error("--extension-cap cannot be negative")
+    if options.checkpoint_every is not None and options.checkpoint_every < 0:
+        parser.error("--checkpoint-every cannot be negative")
+    if options.throttle is not None:
+        if options.throttle <= 0:
+            parser.error("--throttle must be positive")
+        if options.backend == BACKEND_PROCESS:
+            parser.error("--throttle only works with the thread backend")
+        if options.workers is None:
+            # A few workers are plenty at a capped rate and keep the queue depth low
+            options.workers = THROTTLED_WORKERS
+    elif options.throttle_fixed:
+        parser.error("--throttle-fixed needs --throttle OPS")
+    return options
+
+
+def open_index(options, exclude=None):
+    """Returns a ScanIndex if the command line asked for one, else None."""
+    if not (options.incremental or options.index):
+        return None
+    import scan_index
+    rules = exclude.key if exclude else ""
+    return scan_index.ScanIndex(options.index or scan_index.DEFAULT_INDEX_PATH, rules)
+
+
+def open_checkpoint(options, default=False):
+    """
+    Returns a ScanCheckpoint if checkpoints are on, else None. default is the
+    scanner's choice when the command line says neither --checkpoint nor
+    --no-checkpoint; --resume always turns them on.
+    """
+    enabled = options.checkpoint if options.checkpoint is not None else default
+    if options.backend == BACKEND_PROCESS or not (enabled or options.resume):
+        return None
+    import scan_checkpoint
+    interval = options.checkpoint_every
+    if interval is None:
+        interval = scan_checkpoint.CHECKPOINT_EVERY
+    return scan_checkpoint.ScanCheckpoint(options.checkpoint_file or scan_checkpoint.DEFAULT_CHECKPOINT_PATH,
+                                          interval, options.resume)
+
+
+def open_snapshot(options):
+    """Returns a SnapshotWriter if the command line asked for --snapshot, else None."""
+    if not options.snapshot:
+        return None
+    import scan_snapshot
+    return scan_snapshot.SnapshotWriter(time.strftime(options.snapshot))
+
+
+def open_columnar(options):
+    """Returns a ColumnarWriter if the command line asked for --columnar, else None."""
+    if not options.columnar:
+        return None
+    import scan_columns
+    return scan_columns.ColumnarWriter(time.strftime(options.columnar))
+
+
+def close_writers(*writers):
+    """
+    Closes what the open_* helpers returned after a failed or interrupted
+    scan, dropping unfinished output. None entries (options not given) are skipped.
+    """
+    for writer in writers:
+        if writer is not None:
+            writer.close()
+
+
+def open_throttle(options):
+    """Returns a Throttle if the command line asked for --throttle, else None."""
+    if options.throttle is None:
+        return None
+    import scan_throttle
+    return scan_throttle.Throttle(options.throttle, adaptive=not options.throttle_fixed)
+
+
+def apply_priority(options):
+    """Lowers the process priority for --nice; returns what was set, or None."""
+    if not options.nice:
+        return None
+    import scan_throttle
+    return scan_throttle.lower_priority()
+
+
+def open_rules(options):
+    """Returns the ExcludeRules from the command line, or None if there are none."""
+    import scan_exclude
+    return scan_exclude.rules_from_options(options) or None
+
+
+def open_exporter(options):
+    """Returns a ScanExporter if the command line asked for --export, else None."""
+    if not options.export:
+        return None
+    import scan_export
+    return scan_export.ScanExporter(options.export, options.export_format, options.export_files)
+
+
+def open_duplicates(options):
+    """Returns a DuplicateFinder if the command line asked for --dupes, else None."""
+    if not options.dupes:
+        return None
+    import scan_dupes
+    min_size = options.dupes_min_size if options.dupes_min_size is not None else scan_dupes.DEFAULT_MIN_SIZE
+    return scan_dupes.DuplicateFinder(min_size, options.dupes_readers or scan_dupes.DEFAULT_READERS)
+
+
+def open_sniffer(options):
+    """Returns a ContentSniffer if the command line asked for --sniff / --sniff-verify, else None."""
+    if not (options.sniff or options.sniff_verify):
+        return None
+    import scan_sniff
+    cache = scan_sniff.SniffCache(options.sniff_cache or scan_sniff.DEFAULT_SNIFF_CACHE_PATH)
+    return scan_sniff.ContentSniffer(cache, verify=options.sniff_verify)
+
+
+def combine_sinks(*sinks):
+    """One file_sink feeding every given sink (None entries are skipped)."""
+    sinks = [sink for sink in sinks if sink is not None]
+    if len(sinks) < 2:
+        return sinks[0] if sinks else None
+
+    def fan_out(records):
+        for sink in sinks:
+            sink(records)
+    return fan_out
+
+
+def export_columns(options):
+    """Report columns the export (or snapshot, duplicate search, --ages) adds on top of what the scanner shows."""
+    if options.export_files or options.snapshot or options.dupes or options.columnar or options.ages:
+        return ("bytes",)
+    return ()
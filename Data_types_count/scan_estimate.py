@@ -0,0 +1,219 @@
+import os
+import math
+import random
+
+import scan_engine
+
+# Quick statistical estimate of what is under a path (estimate.py), for when
+# "about how much" in seconds beats the exact answer of a full walk.
+#
+# Each probe is one random walk from the root down to a folder without
+# subfolders, picking one subfolder uniformly at random at every depth
+# (Knuth's estimator). A folder reached at depth d stands in for all the
+# folders it could have been: its counts are weighted by the product of the
+# numbers of subfolders on the way down. Every probe is thus an unbiased
+# estimate of the whole tree's totals, and the mean over many probes
+# converges to them; the spread of the probes gives the confidence interval.
+#
+# Listings are cached, so the upper levels, which every probe passes, are
+# read once and later probes mostly cost the listings of deep folders.
+# Trees where a few deep subtrees hold almost everything (one huge cache
+# folder among thousands of small ones) converge slowly: early estimates then
+# tend to be low with a deceptively narrow interval. More probes fix that.
+
+# z for a two-sided 95% confidence interval
+Z_95 = 1.96
+
+# Listings kept in memory; beyond this folders are listed again on every visit
+CACHED_LISTINGS = 200_000
+
+# Probes before an interval is worth showing
+MIN_PROBES = 30
+
+
+class RunningTotal:
+    """Sum and sum of squares of a per-probe value."""
+
+    __slots__ = ("total", "squares")
+
+    def __init__(self):
+        self.total = 0.0
+        self.squares = 0.0
+
+    def add(self, value):
+        self.total += value
+        self.squares += value * value
+
+    def mean(self, n):
+        return self.total / n if n else 0.0
+
+    def half_width(self, n):
+        """Half the width of the 95% interval of the mean."""
+        if n < 2:
+            return math.inf
+        variance = max(0.0, (self.squares - self.total * self.total / n) / (n - 1))
+        return Z_95 * math.sqrt(variance / n)
+
+
+def _add_counts(into, weight, files, nbytes, folders, extensions):
+    into[0] += weight * files
+    into[1] += weight * nbytes
+    into[2] += weight * folders
+    exts = into[3]
+    for ext, (ext_files, ext_bytes) in extensions.items():
+        seen = exts.get(ext)
+        if seen is None:
+            exts[ext] = [weight * ext_files, weight * ext_bytes]
+        else:
+            seen[0] += weight * ext_files
+            seen[1] += weight * ext_bytes
+
+
+class TreeEstimator:
+    """Random-probe estimate of files, folders, bytes and extensions under root."""
+
+    def __init__(self, root, exclude=None, stop_at=None, seed=None):
+        self.root = os.path.abspath(root)
+        self.exclude = exclude
+        self.stop_at = stop_at
+        self.random = random.Random(seed)
+        self.listings = {}
+        # Folders whose whole subtree has been listed -> its exact
+        # [files, bytes, folders, {ext: [files, bytes]}]
+        self.complete = {}
+        self.listed = 0  # directories actually read (cache misses)
+        self.probes = 0
+        self.files = RunningTotal()
+        self.folders = RunningTotal()
+        self.bytes = RunningTotal()
+        # ext -> [files, files^2, bytes, bytes^2, bytes * total bytes] over probes
+        self.extensions = {}
+
+    @property
+    def exact(self):
+        """True once every folder has been listed; the totals are then exact."""
+        return self.root in self.complete
+
+    def _listing(self, path):
+        listing = self.listings.get(path)
+        if listing is None:
+            summary = scan_engine.list_directory(path, mode=scan_engine.MODE_SIZE, stop_at=self.stop_at,
+                                                 exclude=self.exclude)
+            self.listed += 1
+            extensions = {ext: (counter[scan_engine.EXT_FILES], counter[scan_engine.EXT_BYTES])
+                          for ext, counter in summary.extensions.items()}
+            listing = (summary.files, summary.bytes, len(summary.subdirs) + summary.linked_dirs, extensions,
+                       [os.path.join(path, name) for name in summary.subdirs])
+            if len(self.listings) < CACHED_LISTINGS:
+                self.listings[path] = listing
+        return listing
+
+    def probe(self):
+        """
+        One random walk from the root; folds its estimate into the totals.
+        Subtrees already listed in full are added exactly and never walked
+        into again, so the probes concentrate on the unknown part and the
+        estimate turns exact once the whole tree has been seen.
+        """
+        complete = self.complete
+        counts = [0, 0, 0, {}]
+        weight = 1
+        path = self.root
+        walked = []
+        while path not in complete:
+            files, nbytes, folders, extensions, subdirs = self._listing(path)
+            walked.append(path)
+            _add_counts(counts, weight, files, nbytes, folders, extensions)
+            pending = []
+            for child in subdirs:
+                done = complete.get(child)
+                if done is None:
+                    pending.append(child)
+                else:
+                    _add_counts(counts, weight, *done)
+            if not pending:
+                break
+            weight *= len(pending)
+            path = self.random.choice(pending)
+        else:
+            _add_counts(counts, weight, *complete[path])
+
+        # Close the walked folders whose subfolders are now all complete;
+        # their children's totals are folded into them and dropped
+        for path in reversed(walked):
+            listing = self.listings.get(path) or self._listing(path)
+            files, nbytes, folders, extensions, subdirs = listing
+            if any(child not in complete for child in subdirs):
+                break
+            total = [0, 0, 0, {}]
+            _add_counts(total, 1, files, nbytes, folders, extensions)
+            for child in subdirs:
+                _add_counts(total, 1, *complete.pop(child))
+            complete[path] = total
+            self.listings.pop(path, None)
+
+        files, nbytes, folders, extensions = counts
+        self.probes += 1
+        self.files.add(files)
+        self.folders.add(folders)
+        self.bytes.add(nbytes)
+        for ext, (ext_files, ext_bytes) in extensions.items():
+            sums = self.extensions.get(ext)
+            if sums is None:
+                sums = self.extensions[ext] = [0.0, 0.0, 0.0, 0.0, 0.0]
+            sums[0] += ext_files
+            sums[1] += ext_files * ext_files
+            sums[2] += ext_bytes
+            sums[3] += ext_bytes * ext_bytes
+            sums[4] += ext_bytes * nbytes
+
+    def totals(self):
+        """{"files" / "folders" / "bytes": (estimate, 95% half width)}."""
+        if self.exact:
+            files, nbytes, folders, _ = self.complete[self.root]
+            return {"files": (files, 0.0), "folders": (folders, 0.0), "bytes": (nbytes, 0.0)}
+        n = self.probes
+        return {name: (total.mean(n), total.half_width(n))
+                for name, total in (("files", self.files), ("folders", self.folders), ("bytes", self.bytes))}
+
+    def precision(self):
+        """Larger relative half width of the files and bytes estimates (inf until known)."""
+        if self.exact:
+            return 0.0
+        n = self.probes
+        if n < MIN_PROBES:
+            return math.inf
+        worst = 0.0
+        for total in (self.files, self.bytes):
+            mean = total.mean(n)
+            if mean > 0:
+                worst = max(worst, total.half_width(n) / mean)
+        return worst
+
+    def extension_shares(self, limit=None):
+        """
+        (ext, files estimate, share of bytes, 95% half width of the share),
+        biggest share first. The share is a ratio of two estimates; its
+        interval comes from the delta method.
+        """
+        if self.exact:
+            _, total_bytes, _, extensions = self.complete[self.root]
+            rows = [(ext, files, nbytes / total_bytes if total_bytes else 0.0, 0.0)
+                    for ext, (files, nbytes) in extensions.items()]
+            rows.sort(key=lambda row: (row[2], row[1]), reverse=True)
+            return rows[:limit] if limit is not None else rows
+
+        n = self.probes
+        total_bytes = self.bytes.mean(n)
+        rows = []
+        for ext, (files, _, ext_bytes, ext_squares, cross) in self.extensions.items():
+            share = ext_bytes / self.bytes.total if self.bytes.total else 0.0
+            half = math.inf
+            if n >= 2 and total_bytes > 0:
+                # Variance of (ext bytes - share * total bytes) over the probes
+                # (its mean is 0 by the choice of share)
+                residual = (ext_squares - 2 * share * cross + share * share * self.bytes.squares) / (n - 1)
+                half = Z_95 * math.sqrt(max(0.0, residual) / n) / total_bytes
+            rows.append((ext, files / n if n else 0.0, share, half))
+        rows.sort(key=lambda row: (row[2], row[1]), reverse=True)
+        return rows[:limit] if limit is not None else rows
@@ -0,0 +1,115 @@
+import os
+import re
+import json
+import fnmatch
+import hashlib
+
+import scan_mounts
+
+# Exclusion rules for the scanners' --exclude / --exclude-fstype / -x options.
+#
+# Rules are checked once per directory entry while a folder is being listed,
+# so an excluded folder is never listed at all (and nothing below it is
+# counted). Patterns come in three kinds:
+#   node_modules, *.vmdk    - no separator: glob on the entry's name
+#   build/cache, */.cache/* - with a separator: glob on the full path
+#                             (relative ones may match at any depth)
+#   /mnt/backup             - absolute without wildcards: that exact path
+# All globs of one kind are compiled into a single regular expression.
+# Filesystem types turn into exact paths too: the mount points of every
+# mount of that type. -x (one file system) is handled by the engine, which
+# then does not descend into any other mount point (see scan_mounts).
+
+# --skip-common: things almost nobody wants in a disk usage report
+COMMON_EXCLUDES = (
+    "node_modules", ".git", ".hg", ".svn", "__pycache__", ".cache", ".venv", ".tox",
+    "*.vmdk", "*.vdi", "*.vhd", "*.vhdx", "*.qcow2",
+)
+NETWORK_FSTYPES = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "afs")
+
+_WILDCARDS = ("*", "?", "[")
+
+
+def _compile(globs, flags):
+    if not globs:
+        return None
+    return re.compile("|".join(fnmatch.translate(g) for g in globs), flags).match
+
+
+class ExcludeRules:
+    """A compiled set of exclusion rules; cheap to check and safe to pickle."""
+
+    __slots__ = ("patterns", "fstypes", "one_file_system", "name_match", "path_match", "paths", "key")
+
+    def __init__(self, patterns=(), fstypes=(), one_file_system=False, mounts=None):
+        self.patterns = sorted(set(patterns))
+        self.fstypes = sorted(set(fstypes))
+        self.one_file_system = one_file_system
+
+        names, globs, paths = [], [], set()
+        for pattern in self.patterns:
+            stripped = pattern.rstrip("/\\") or pattern
+            has_wildcard = any(c in stripped for c in _WILDCARDS)
+            if os.path.isabs(stripped) and not has_wildcard:
+                paths.add(os.path.normpath(stripped))
+            elif "/" in stripped or os.sep in stripped:
+                if not os.path.isabs(stripped) and not stripped.startswith("*"):
+                    stripped = "*" + os.sep + stripped
+                globs.append(stripped)
+            else:
+                names.append(stripped)
+
+        if self.fstypes:
+            if mounts is None:
+                mounts = scan_mounts.read_mounts()
+            paths.update(m.mount_point for m in mounts if m.fstype in self.fstypes)
+
+        flags = re.IGNORECASE if os.name == "nt" else 0
+        self.name_match = _compile(names, flags)
+        self.path_match = _compile(globs, flags)
+        self.paths = frozenset(paths)
+        # Identifies the rule set, so index rows from other rules are not reused
+        text = json.dumps([self.patterns, self.fstypes, one_file_system])
+        self.key = hashlib.sha1(text.encode()).hexdigest()[:16]
+
+    def __bool__(self):
+        return bool(self.patterns or self.fstypes or self.one_file_system)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def excludes(self, name, path):
+        """True if the entry called name at path is to be left out."""
+        if self.name_match is not None and self.name_match(name):
+            return True
+        if path in self.paths:
+            return True
+        return self.path_match is not None and self.path_match(path) is not None
+
+    def excludes_root(self, root):
+        """True if a scan root is itself excluded or lies inside an excluded path."""
+        root = os.path.abspath(root)
+        if self.excludes(os.path.basename(root), root):
+            return True
+        return any(root.startswith(p.rstrip(os.sep) + os.sep) for p in self.paths)
+
+    def describe(self):
+        """Short text for reports, e.g. 'node_modules, .git, fs:nfs, -x'."""
+        parts = list(self.patterns) + [f"fs:{t}" for t in self.fstypes]
+        if self.one_file_system:
+            parts.append("-x")
+        return ", ".join(parts)
+
+
+def rules_from_options(options):
+    """Builds the ExcludeRules the command line asked for (possibly empty)."""
+    patterns = list(options.exclude or ())
+    fstypes = [t for arg in options.exclude_fstype or () for t in arg.split(",") if t]
+    if options.skip_common:
+        patterns.extend(COMMON_EXCLUDES)
+        fstypes.extend(NETWORK_FSTYPES)
+    return ExcludeRules(patterns, fstypes, options.one_file_system)
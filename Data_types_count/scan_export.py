@@ -0,0 +1,133 @@
+import os
+import csv
+import json
+import time
+import threading
+
+import scan_engine
+
+# Machine-readable scan output for the scanners' --export option.
+#
+# Everything is written as it becomes available: per-file records (with
+# --export-files) are appended while the walk is still running, and the
+# per-extension rows and the summary follow once it is done. Nothing but the
+# current batch of records is ever held in memory.
+#
+# Formats:
+#   ndjson - one JSON object per line, each with a "type" of file,
+#            extension or summary
+#   csv    - one row per record with the columns in CSV_FIELDS
+#   json   - a single object {"files": [...], "extensions": [...],
+#            "summary": {...}}, streamed piece by piece
+#
+# Extension records carry "size_histogram" in json/ndjson: element b is the
+# number of files whose size has bit_length() b, i.e. lies in [2**(b-1), 2**b).
+# With --ages they also carry "modified_ages" and "accessed_ages": bytes per
+# scan_engine.AGE_LABELS bucket, counted back from the summary's
+# "age_reference".
+
+FORMATS = ("json", "csv", "ndjson")
+
+CSV_FIELDS = ["type", "path", "extension", "files", "folders", "bytes"]
+
+
+def guess_format(path):
+    """Picks the format from the file extension, defaulting to json."""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in FORMATS:
+        return ext
+    if ext == "jsonl":
+        return "ndjson"
+    return "json"
+
+
+def extension_records(stats, has_bytes):
+    """One dict per extension, most files first."""
+    records = []
+    ext_stats = stats.get("extension_stats", {})
+    for ext, count in sorted(stats["extensions"].items(), key=lambda x: x[1], reverse=True):
+        record = {"extension": ext, "files": count, "bytes": None, "size_histogram": None}
+        counter = ext_stats.get(ext)
+        if has_bytes and counter is not None:
+            hist = counter[scan_engine.EXT_HIST:scan_engine.EXT_AGES].tolist()
+            while hist and hist[-1] == 0:
+                hist.pop()
+            record["bytes"] = counter[scan_engine.EXT_BYTES]
+            record["size_histogram"] = hist
+            if "age_reference" in stats:
+                ages = counter[scan_engine.EXT_AGES:]
+                record["modified_ages"] = ages[scan_engine.AGE_MTIME_BYTES:scan_engine.AGE_ATIME_FILES].tolist()
+                record["accessed_ages"] = ages[scan_engine.AGE_ATIME_BYTES:].tolist()
+        records.append(record)
+    return records
+
+
+class ScanExporter:
+    """Streams one scan to a file. write_files() may be called from any thread."""
+
+    def __init__(self, path, fmt=None, include_files=False):
+        self.path = path
+        self.format = fmt or guess_format(path)
+        self.include_files = include_files
+        self.lock = threading.Lock()
+        self.first_file = True
+
+        self.out = open(path, "w", encoding="utf-8", newline="")
+        if self.format == "csv":
+            self.csv = csv.writer(self.out)
+            self.csv.writerow(CSV_FIELDS)
+        elif self.format == "json":
+            self.out.write('{\n"files": [')
+
+    def write_files(self, records):
+        """records: iterable of (path, extension, size, mtime) tuples; size may be None."""
+        with self.lock:
+            if self.format == "csv":
+                self.csv.writerows(("file", p, ext, 1, "", "" if size is None else size)
+                                   for p, ext, size, _ in records)
+            elif self.format == "ndjson":
+                self.out.write("".join(
+                    json.dumps({"type": "file", "path": p, "extension": ext, "bytes": size}) + "\n"
+                    for p, ext, size, _ in records))
+            else:
+                for p, ext, size, _ in records:
+                    sep = "\n" if self.first_file else ",\n"
+                    self.first_file = False
+                    self.out.write(sep + json.dumps({"path": p, "extension": ext, "bytes": size}))
+
+    def finish(self, stats, roots, duration, has_bytes=True):
+        """Writes the per-extension rows and the summary, then closes the file."""
+        ext_rows = extension_records(stats, has_bytes)
+        summary = {
+            "roots": list(roots),
+            "folders": stats["folders"],
+            "files": stats["files"],
+            "bytes": stats["scanned_bytes"] if has_bytes else None,
+            "allocated_bytes": stats.get("allocated_bytes") if has_bytes else None,
+            "duration_seconds": round(duration, 3),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if "age_reference" in stats:
+            summary["age_reference"] = round(stats["age_reference"])
+
+        with self.lock:
+            if self.format == "csv":
+                for row in ext_rows:
+                    self.csv.writerow(["extension", "", row["extension"], row["files"], "",
+                                       "" if row["bytes"] is None else row["bytes"]])
+                self.csv.writerow(["summary", os.pathsep.join(summary["roots"]), "", summary["files"],
+                                   summary["folders"], "" if summary["bytes"] is None else summary["bytes"]])
+            elif self.format == "ndjson":
+                for row in ext_rows:
+                    self.out.write(json.dumps(dict(type="extension", **row)) + "\n")
+                self.out.write(json.dumps(dict(type="summary", **summary)) + "\n")
+            else:
+                self.out.write("\n],\n")
+                self.out.write('"extensions": ' + json.dumps(ext_rows) + ",\n")
+                self.out.write('"summary": ' + json.dumps(summary) + "\n}\n")
+            self.out.close()
+
+    def close(self):
+        with self.lock:
+            if not self.out.closed:
+                self.out.close()
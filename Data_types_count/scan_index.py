@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import array
+
+from scan_engine import DirSummary, new_ext_counter
+
+# Persistent per-directory scan cache used by the scanners' --incremental mode.
+#
+# One row per directory: its mtime, the names of its subfolders and the
+# aggregates of the files directly inside it (count, bytes, extensions).
+# A folder's mtime only changes when entries are added, removed or renamed in
+# it, so on the next run a folder with an unchanged mtime is not listed again:
+# its cached row is reused and only its subfolders are visited. Size changes of
+# files inside an unchanged folder are therefore not picked up until the
+# folder itself changes (or a full scan is run).
+#
+# Rows written by a count-only scan store bytes = -1, so a later scan that
+# needs sizes lists those folders again instead of trusting a zero. The same
+# goes for the per-folder list of largest files, which is only kept (and only
+# required) when the scan tracks the top-K largest files.
+#
+# allocated is the on-disk size of the folder's singly-linked files and
+# hardlinks the [inode key, allocated] pairs of its hard-linked ones (deduped
+# by the scan, not here). Both are NULL in rows from before they existed or
+# from count-only scans, which are then listed again when sizes are needed.
+#
+# Rows remember the key of the exclusion rules they were listed under
+# (scan_exclude.ExcludeRules.key, "" or NULL for none); under other rules a
+# folder's row is not reused, since its counts would include or lack the
+# wrong entries.
+#
+# Extensions are stored as {ext: [files, bytes, size histogram...]} with
+# trailing zeros cut off. Rows from before per-extension bytes existed hold
+# plain counts and are treated as "no bytes" when sizes are needed.
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".scan_index.db")
+
+# Folders modified this close to the moment they were listed may change again
+# within the same mtime tick, so their rows are stored as "always rescan".
+RACY_WINDOW_NS = 2_000_000_000
+
+# Buffered writes are flushed in one transaction every this many rows
+FLUSH_EVERY = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path        TEXT PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,
+    files       INTEGER NOT NULL,
+    bytes       INTEGER NOT NULL,
+    linked_dirs INTEGER NOT NULL,
+    subdirs     TEXT NOT NULL,
+    extensions  TEXT NOT NULL,
+    scan_id     INTEGER NOT NULL,
+    largest     TEXT,
+    allocated   INTEGER,
+    hardlinks   TEXT,
+    rules       TEXT
+)
+"""
+
+# Columns added after the first version of the schema: name -> definition
+MIGRATIONS = {
+    "largest": "TEXT",
+    "allocated": "INTEGER",
+    "hardlinks": "TEXT",
+    "rules": "TEXT",
+}
+
+
+def encode_extensions(extensions):
+    encoded = {}
+    for ext, counter in extensions.items():
+        values = counter.tolist()
+        while values and values[-1] == 0:
+            values.pop()
+        encoded[ext] = values
+    return json.dumps(encoded)
+
+
+def decode_extensions(text, need_bytes):
+    """Returns {ext: counter}, or None if the row is too old to have bytes."""
+    extensions = {}
+    for ext, values in json.loads(text).items():
+        counter = new_ext_counter()
+        if isinstance(values, int):
+            if need_bytes:
+                return None
+            values = [values]
+        counter[0:len(values)] = array.array("q", values)
+        extensions[ext] = counter
+    return extensions
+
+
+class ScanIndex:
+    """Thread-safe wrapper around the SQLite index file."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, rules=""):
+        self.path = path
+        self.rules = rules
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(dirs)")}
+        for column, definition in MIGRATIONS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE dirs ADD COLUMN {column} {definition}")
+        self.lock = threading.Lock()
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+
+        row = self.conn.execute("SELECT MAX(scan_id) FROM dirs").fetchone()
+        self.scan_id = (row[0] or 0) + 1
+
+    def lookup(self, path, mtime_ns, need_bytes=True, need_largest=False):
+        """Returns the cached DirSummary if the folder is unchanged, else None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT mtime_ns, files, bytes, linked_dirs, subdirs, extensions, largest, allocated, hardlinks, rules "
+                "FROM dirs WHERE path = ?", (path,)).fetchone()
+
+        extensions = None
+        if row is not None and row[0] == mtime_ns and (row[9] or "") == self.rules:
+            extensions = decode_extensions(row[5], need_bytes)
+        if (extensions is None or (need_bytes and (row[2] < 0 or row[7] is None))
+                or (need_largest and row[6] is None)):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+            # Mark the row as seen so prune() keeps it
+            self.pending.append((path, row[0], row[1], row[2], row[3], row[4], row[5], self.scan_id, row[6],
+                                 row[7], row[8], self.rules))
+            if len(self.pending) >= FLUSH_EVERY:
+                self._flush()
+
+        largest = [tuple(item) for item in json.loads(row[6])] if row[6] is not None else []
+        hardlinks = [tuple(item) for item in json.loads(row[8])] if row[8] is not None else []
+        return DirSummary(json.loads(row[4]), row[3], row[1], max(row[2], 0), extensions, largest,
+                          row[7] or 0, hardlinks)
+
+    def store(self, path, mtime_ns, summary, has_bytes=True, has_largest=False):
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = -1
+        nbytes = summary.bytes if has_bytes else -1
+        largest = json.dumps(summary.largest) if has_largest else None
+        allocated = summary.allocated if has_bytes else None
+        hardlinks = json.dumps(summary.hardlinks) if has_bytes else None
+        row = (path, mtime_ns, summary.files, nbytes, summary.linked_dirs,
+               json.dumps(summary.subdirs), encode_extensions(summary.extensions), self.scan_id, largest,
+               allocated, hardlinks, self.rules)
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def flush(self):
+        """Writes out the buffered rows now (e.g. before a checkpoint)."""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns, files, bytes, linked_dirs, subdirs, "
+                "extensions, scan_id, largest, allocated, hardlinks, rules) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def prune(self, roots):
+        """Drops rows of folders under roots that were not seen in this scan."""
+        with self.lock:
+            self._flush()
+            with self.conn:
+                for root in roots:
+                    prefix = root if root.endswith(os.sep) else root + os.sep
+                    self.conn.execute(
+                        "DELETE FROM dirs WHERE scan_id < ? AND (path = ? OR substr(path, 1, ?) = ?)",
+                        (self.scan_id, root, len(prefix), prefix))
+
+    def close(self):
+        with self.lock:
+            self._flush()
+        self.conn.close()
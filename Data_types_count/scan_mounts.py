@@ -0,0 +1,215 @@
+import os
+import string
+
+import scan_engine
+
+# Mount discovery for the full-system and drive scanners.
+#
+# On Windows a "drive" is a letter A: to Z:. On Linux it is a mounted
+# filesystem, read from /proc/self/mountinfo. Pseudo filesystems (proc, sysfs,
+# cgroup, tmpfs, ...) are not drives and are never walked, and overlay mounts
+# (container layers, which repeat files of another mount) are skipped unless
+# asked for (--include-overlay). Bind mounts of a filesystem that is already
+# listed are skipped too, so every file is scanned once: of all the mounts
+# of one filesystem, the one showing all of it (root "/") is kept. When no
+# scanned mount is /, as in a container whose / is an overlay, / is scanned
+# anyway so nothing outside the other mounts goes missing.
+#
+# Mounts are then grouped by the physical disk behind them (partitions of one
+# disk share a group) and each group gets its own worker budget: a spinning
+# disk only gets a few workers, since more seeks in parallel make it slower,
+# while SSDs and unknown devices get the usual default. Groups are walked at
+# the same time, so every disk is busy without any one of them thrashing.
+
+MOUNTINFO = "/proc/self/mountinfo"
+
+PSEUDO_FSTYPES = {
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs",
+    "devpts", "devtmpfs", "efivarfs", "fusectl", "hugetlbfs", "mqueue", "nsfs",
+    "proc", "pstore", "ramfs", "rpc_pipefs", "securityfs", "selinuxfs", "squashfs",
+    "sysfs", "tmpfs", "tracefs",
+}
+
+OVERLAY_FSTYPES = {"overlay", "overlayfs", "aufs"}
+
+# Workers per spinning disk
+ROTATIONAL_WORKERS = 4
+
+
+class Mount:
+    """One line of /proc/self/mountinfo."""
+
+    __slots__ = ("mount_id", "parent_id", "device", "root", "mount_point", "fstype", "source", "options")
+
+    def __init__(self, mount_id, parent_id, device, root, mount_point, fstype, source, options):
+        self.mount_id = mount_id
+        self.parent_id = parent_id
+        self.device = device  # "major:minor" of st_dev
+        self.root = root  # folder of the filesystem mounted here ("/" unless a bind mount)
+        self.mount_point = mount_point
+        self.fstype = fstype
+        self.source = source
+        self.options = options
+
+    def __repr__(self):
+        return f"Mount({self.mount_point!r}, {self.fstype!r}, {self.source!r})"
+
+
+def _unescape(field):
+    # Spaces, tabs, newlines and backslashes are written as \ooo octal escapes
+    if "\\" not in field:
+        return field
+    out = []
+    i = 0
+    while i < len(field):
+        if field[i] == "\\" and field[i + 1:i + 4].isdigit():
+            out.append(chr(int(field[i + 1:i + 4], 8)))
+            i += 4
+        else:
+            out.append(field[i])
+            i += 1
+    return "".join(out)
+
+
+def parse_mountinfo(text):
+    """Parses mountinfo text into Mount objects, skipping malformed lines."""
+    mounts = []
+    for line in text.splitlines():
+        # Optional fields vary in number and end at a lone "-"
+        head, sep, tail = line.partition(" - ")
+        fields = head.split()
+        rest = tail.split()
+        if not sep or len(fields) < 6 or len(rest) < 2:
+            continue
+        mounts.append(Mount(int(fields[0]), int(fields[1]), fields[2], _unescape(fields[3]),
+                            _unescape(fields[4]), rest[0], _unescape(rest[1]),
+                            rest[2] if len(rest) > 2 else ""))
+    return mounts
+
+
+def read_mounts(path=MOUNTINFO):
+    """Every mount of this process, or [] where there is no mountinfo."""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return parse_mountinfo(f.read())
+    except OSError:
+        return []
+
+
+def is_pseudo(mount, include_overlay=False):
+    if mount.fstype in PSEUDO_FSTYPES or mount.fstype.startswith("fuse.gvfs"):
+        return True
+    return mount.fstype in OVERLAY_FSTYPES and not include_overlay
+
+
+def physical_mounts(mounts, include_overlay=False):
+    """
+    The mounts worth scanning, one per filesystem: the one mounting all of it
+    if there is one, else the shortest mount point. Ordered by mount point.
+    """
+    chosen = []
+    for mount in sorted(mounts, key=lambda m: (m.mount_point.count("/"), m.mount_point)):
+        if is_pseudo(mount, include_overlay):
+            continue
+        # Later mounts over the same folder hide earlier ones; keep the visible one
+        chosen = [m for m in chosen if m.mount_point != mount.mount_point]
+        chosen.append(mount)
+
+    # A bind mount shows files that the mount of its whole filesystem already has
+    best = {}
+    for mount in chosen:
+        kept = best.get(mount.device)
+        if kept is None or (kept.root != "/" and mount.root == "/"):
+            best[mount.device] = mount
+    keep = set(map(id, best.values()))
+    return [m for m in chosen if id(m) in keep]
+
+
+def mount_points(include_overlay=False, notes=None):
+    """
+    Scan roots: drive letters on Windows, filesystem mount points elsewhere.
+    notes, if given, gets a line about every root added that is not a drive.
+    """
+    if os.name == "nt":
+        return [f"{x}:\\" for x in string.ascii_uppercase if os.path.exists(f"{x}:\\")]
+    mounts = read_mounts()
+    points = [m.mount_point for m in physical_mounts(mounts, include_overlay)]
+    if "/" not in points:
+        # Otherwise everything outside the other mounts would be left out without a word
+        if mounts and notes is not None:
+            fstype = next((m.fstype for m in reversed(mounts) if m.mount_point == "/"), "unknown")
+            notes.append(f"/ is on {fstype}, not a drive; scanning it anyway")
+        points.insert(0, "/")
+    return points
+
+
+def stop_points(mounts=None):
+    """
+    Every mount point. Walks pass this as stop_at, so they stay on their own
+    filesystem and pseudo filesystems are never entered. stop_at only stops
+    subfolders, so a root that is a mount point is still walked, and a mount
+    that is also a root (/home next to /) is walked once, as its own root.
+    """
+    if mounts is None:
+        mounts = read_mounts()
+    return frozenset(m.mount_point for m in mounts)
+
+
+def _sys_block(device):
+    """Resolves a "major:minor" to its /sys/block folder (the whole disk), or None."""
+    link = f"/sys/dev/block/{device}"
+    if not os.path.exists(link):
+        return None
+    path = os.path.realpath(link)
+    # Partitions live inside the folder of their disk
+    if os.path.exists(os.path.join(path, "partition")):
+        path = os.path.dirname(path)
+    return path
+
+
+def disk_of(mount):
+    """
+    (disk key, rotational) for a mount. rotational is None when unknown, e.g.
+    for network filesystems or btrfs subvolumes whose st_dev is anonymous.
+    """
+    device = mount.device
+    if device.startswith("0:") and mount.source.startswith("/dev/"):
+        try:
+            rdev = os.stat(mount.source).st_rdev
+            device = f"{os.major(rdev)}:{os.minor(rdev)}"
+        except OSError:
+            pass
+
+    sys_path = _sys_block(device)
+    if sys_path is None:
+        return device, None
+    try:
+        with open(os.path.join(sys_path, "queue", "rotational")) as f:
+            rotational = f.read().strip() == "1"
+    except OSError:
+        rotational = None
+    return os.path.basename(sys_path), rotational
+
+
+def plan_scan(roots, mounts=None, workers=None):
+    """
+    Groups roots by the disk they are on and gives each group a worker budget,
+    as scan_engine.scan_paths(schedule=...) expects: [(roots, workers), ...].
+    workers, if given, is used for every disk instead of the default.
+    """
+    if mounts is None:
+        mounts = read_mounts()
+    by_point = {m.mount_point: m for m in mounts}
+
+    groups = {}
+    for root in roots:
+        mount = by_point.get(os.path.abspath(root))
+        key, rotational = disk_of(mount) if mount is not None else (root, None)
+        group = groups.setdefault(key, [[], rotational])
+        group[0].append(root)
+
+    schedule = []
+    for group_roots, rotational in groups.values():
+        budget = workers or (ROTATIONAL_WORKERS if rotational else scan_engine.default_workers())
+        schedule.append((group_roots, budget))
+    return schedule
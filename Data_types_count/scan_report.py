@@ -0,0 +1,257 @@
+# Box-drawing helpers for the extra report sections that enterieos.py and
+# SELfile.py share. Same look as the scanners' own final report.
+
+import scan_engine
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+
+def format_bytes(n):
+    """Human readable size, e.g. 1.50 GB."""
+    val = float(n)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if val < 1024 or unit == "TB":
+            break
+        val /= 1024
+    if unit == "B":
+        return f"{int(val)} B"
+    return f"{val:.2f} {unit}"
+
+
+def shorten_path(path, limit):
+    """Keeps the end of a path (the interesting part) within limit characters."""
+    if len(path) <= limit:
+        return path
+    return "..." + path[-(limit - 3):]
+
+
+def shorten_text(text, limit):
+    """Keeps the start of text within limit characters."""
+    if len(text) <= limit:
+        return text
+    return text[:limit - 3] + "..."
+
+
+def print_section_title(margin, width, title, color=YELLOW):
+    """╠═╣ / centered title / ╠═╣, like the 'File Formats Breakdown' header."""
+    pad = width - 2 - len(title)
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{color}{title}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+
+
+def print_row(margin, width, label, value, color=WHITE, label_width=20):
+    left_part = f"   {label:<{label_width}} : "
+    right_part = f"{value}"
+    padding = max(0, width - 2 - len(left_part) - len(right_part))
+    print(f"{margin}{CYAN}║{RESET}{left_part}{color}{right_part}{RESET}{' ' * padding}{CYAN}║{RESET}")
+
+
+def print_empty(margin, width, text="(No files found)"):
+    pad = width - 2 - len(text)
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{RED}{text}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+
+
+def print_largest(margin, width, title, entries):
+    """Section listing (size, path) pairs, biggest first."""
+    print_section_title(margin, width, title)
+    if not entries:
+        print_empty(margin, width)
+        return
+    label_width = 10
+    path_room = width - 2 - (3 + label_width + 3)
+    for size, path in entries:
+        print_row(margin, width, format_bytes(size), shorten_path(path, path_room), BLUE, label_width)
+
+
+def print_hotspots(margin, width, stats):
+    """Sections with the folders that took longest to list and those with the most entries (--hotspots)."""
+    slowest = stats.get("slowest_dirs", [])
+    total = stats.get("listing_seconds", 0.0)
+    print_section_title(margin, width, "Slowest Folders to List")
+    print_row(margin, width, "Listing Time", f"{total:.2f} s over {stats.get('listed_folders', 0):,} folders "
+              "(all workers)", GREEN)
+    if slowest:
+        share = format_share(sum(seconds for seconds, _, _ in slowest), total)
+        print_row(margin, width, f"Top {len(slowest)} Share", f"{share} of the listing time", GREEN)
+    label_width = 10
+    path_room = width - 2 - (3 + label_width + 3)
+    for seconds, entries, path in slowest:
+        print_row(margin, width, f"{seconds * 1000:,.0f} ms", shorten_path(f"{path} ({entries:,})", path_room),
+                  RED, label_width)
+
+    print_section_title(margin, width, "Folders with the Most Entries")
+    widest = stats.get("widest_dirs", [])
+    if not widest:
+        print_empty(margin, width)
+    for entries, seconds, path in widest:
+        print_row(margin, width, f"{entries:,}", shorten_path(f"{path} ({seconds * 1000:,.0f} ms)", path_room),
+                  YELLOW, label_width)
+
+
+def print_duplicates(margin, width, finder, limit=10, paths_per_group=3):
+    """Section with the duplicate groups that free the most space, from a DuplicateFinder."""
+    print_section_title(margin, width, "Duplicate Files")
+    if not finder.groups:
+        print_empty(margin, width, "(No duplicates found)")
+        return
+    copies = sum(len(paths) - 1 for _, _, paths in finder.groups)
+    print_row(margin, width, "Reclaimable", f"{format_bytes(finder.reclaimable)} ({copies:,} copies)", GREEN)
+    label_width = 10
+    path_room = width - 2 - (3 + label_width + 3)
+    for reclaimable, size, paths in finder.groups[:limit]:
+        print_row(margin, width, format_bytes(reclaimable), f"{len(paths)} x {format_bytes(size)}", BLUE, label_width)
+        for path in paths[:paths_per_group]:
+            print_row(margin, width, "", shorten_path(path, path_room), WHITE, label_width)
+        if len(paths) > paths_per_group:
+            print_row(margin, width, "", f"... {len(paths) - paths_per_group} more", WHITE, label_width)
+    if len(finder.groups) > limit:
+        print_empty(margin, width, f"... {len(finder.groups) - limit:,} more groups")
+
+
+def print_content_types(margin, width, sniffer, limit=10):
+    """Sections with what files without an extension contain (and misfits), from a ContentSniffer."""
+    print_section_title(margin, width, "No Extension by Content")
+    types = sniffer.sorted_types()
+    if not types:
+        print_empty(margin, width)
+    for kind, files, nbytes in types:
+        print_row(margin, width, kind, f"{files:,} | {format_bytes(nbytes)}", BLUE)
+    if not sniffer.verify:
+        return
+    print_section_title(margin, width, "Content Not Matching Extension")
+    mismatches = sniffer.sorted_mismatches()
+    if not mismatches:
+        print_empty(margin, width, "(None)")
+    for ext, kind, files, nbytes in mismatches[:limit]:
+        print_row(margin, width, f"{ext} is {kind}", f"{files:,} | {format_bytes(nbytes)}", RED)
+    if len(mismatches) > limit:
+        print_empty(margin, width, f"... {len(mismatches) - limit:,} more")
+
+
+def sorted_extensions(stats, sort_by="count"):
+    """(ext, files, bytes) for every extension, biggest first by 'count' or 'bytes'."""
+    ext_stats = stats.get("extension_stats", {})
+    rows = []
+    for ext, count in stats["extensions"].items():
+        counter = ext_stats.get(ext)
+        nbytes = counter[scan_engine.EXT_BYTES] if counter is not None else 0
+        rows.append((ext, count, nbytes))
+    key = 2 if sort_by == "bytes" else 1
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows
+
+
+def format_share(part, whole):
+    if whole <= 0:
+        return "0.0%"
+    return f"{part * 100 / whole:.1f}%"
+
+
+SPARK_CHARS = " ▁▂▃▄▅▆▇█"
+
+
+def sparkline(values, limit):
+    """Renders counts as block characters, merging neighbours to fit limit."""
+    while len(values) > limit:
+        values = [sum(values[i:i + 2]) for i in range(0, len(values), 2)]
+    peak = max(values) or 1
+    return "".join(SPARK_CHARS[0 if v == 0 else max(1, round(v * 8 / peak))] for v in values)
+
+
+def print_size_histograms(margin, width, stats, extensions):
+    """One log2 size distribution line per extension in extensions."""
+    print_section_title(margin, width, "Size Distribution (log2)")
+    ext_stats = stats.get("extension_stats", {})
+    label_width = 8
+    room = width - 2 - (3 + label_width + 3)
+    shown = 0
+    for ext in extensions:
+        counter = ext_stats.get(ext)
+        if counter is None:
+            continue
+        hist = counter[scan_engine.EXT_HIST:scan_engine.EXT_AGES].tolist()
+        used = [b for b, n in enumerate(hist) if n]
+        if not used:
+            continue
+        first, last = used[0], used[-1]
+        low = format_bytes(scan_engine.size_bucket_bounds(first)[0])
+        high = format_bytes(scan_engine.size_bucket_bounds(last)[1] + 1)
+        spark = sparkline(hist[first:last + 1], room - len(low) - len(high) - 2)
+        print_row(margin, width, shorten_path(ext or "[none]", label_width), f"{low} {spark} {high}",
+                  BLUE, label_width)
+        shown += 1
+    if not shown:
+        print_empty(margin, width, "(No sizes recorded)")
+
+
+def print_age_histograms(margin, width, stats, extensions, limit=10):
+    """Sections with how long ago the data was modified and accessed (--ages), overall and per top-level folder."""
+    ext_stats = stats.get("extension_stats", {})
+    ages = scan_engine.new_ages()
+    for counter in ext_stats.values():
+        for i, value in enumerate(counter[scan_engine.EXT_AGES:]):
+            ages[i] += value
+    bucket = scan_engine.AGE_BUCKETS
+    year = scan_engine.AGE_LABELS.index("1-2 years")
+    total = sum(ages[scan_engine.AGE_MTIME_BYTES:scan_engine.AGE_MTIME_BYTES + bucket])
+
+    print_section_title(margin, width, "Data by Age (Modified | Accessed)")
+    if not sum(ages[scan_engine.AGE_MTIME_FILES:scan_engine.AGE_MTIME_FILES + bucket]):
+        print_empty(margin, width, "(No ages recorded)")
+        return
+    for b, label in enumerate(scan_engine.AGE_LABELS):
+        modified = ages[scan_engine.AGE_MTIME_BYTES + b]
+        accessed = ages[scan_engine.AGE_ATIME_BYTES + b]
+        print_row(margin, width, label, f"{format_bytes(modified):>11} ({format_share(modified, total):>6}) | "
+                  f"{format_bytes(accessed):>11} ({format_share(accessed, total):>6})", BLUE)
+    stale = sum(ages[scan_engine.AGE_MTIME_BYTES + year:scan_engine.AGE_MTIME_BYTES + bucket])
+    cold = sum(ages[scan_engine.AGE_ATIME_BYTES + year:scan_engine.AGE_ATIME_BYTES + bucket])
+    print_row(margin, width, "Unmodified 1+ Year", f"{format_bytes(stale)} ({format_share(stale, total)})", YELLOW)
+    print_row(margin, width, "Unaccessed 1+ Year", f"{format_bytes(cold)} ({format_share(cold, total)})", YELLOW)
+
+    # One character per AGE_LABELS bucket, newest on the left
+    print_section_title(margin, width, "Modified Age by Extension (new -> old)")
+    label_width = 8
+    shown = 0
+    for ext in extensions:
+        counter = ext_stats.get(ext)
+        if counter is None:
+            continue
+        start = scan_engine.EXT_AGES + scan_engine.AGE_MTIME_BYTES
+        hist = counter[start:start + bucket].tolist()
+        if not sum(hist):
+            continue
+        share = format_share(sum(hist[year:]), sum(hist))
+        print_row(margin, width, shorten_path(ext or "[none]", label_width),
+                  f"{sparkline(hist, bucket)}  {format_bytes(sum(hist)):>11}, {share:>6} unmodified 1+ year",
+                  BLUE, label_width)
+        shown += 1
+    if not shown:
+        print_empty(margin, width, "(No ages recorded)")
+
+    print_section_title(margin, width, "Unmodified | Unaccessed 1+ Year by Folder")
+    dir_ages = stats.get("dir_ages", {})
+    rows = []
+    for path, counts in dir_ages.items():
+        nbytes = sum(counts[scan_engine.AGE_MTIME_BYTES:scan_engine.AGE_MTIME_BYTES + bucket])
+        stale = sum(counts[scan_engine.AGE_MTIME_BYTES + year:scan_engine.AGE_MTIME_BYTES + bucket])
+        cold = sum(counts[scan_engine.AGE_ATIME_BYTES + year:scan_engine.AGE_ATIME_BYTES + bucket])
+        rows.append((stale, cold, nbytes, path))
+    rows.sort(reverse=True)
+    if not rows:
+        print_empty(margin, width)
+    label_width = 26
+    for stale, cold, nbytes, path in rows[:limit]:
+        print_row(margin, width, shorten_path(path, label_width),
+                  f"{format_bytes(stale)} | {format_bytes(cold)} of {format_bytes(nbytes)}", WHITE, label_width)
+    if len(rows) > limit:
+        print_empty(margin, width, f"... {len(rows) - limit:,} more folders")
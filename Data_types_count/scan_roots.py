@@ -0,0 +1,78 @@
+import os
+import threading
+
+import scan_snapshot
+
+# Many roots scanned as one batch (batch.py). Roots inside other roots are
+# not walked again: the walk of the outer root already lists them, and
+# their own totals are picked out of it folder by folder (dir_sink), so a
+# nested root costs nothing but a few dictionary lookups per folder.
+
+
+def plan_roots(paths):
+    """
+    Splits the given paths into (top, nested, missing): top the resolved
+    paths to walk, in walk order; nested maps every other resolved path to
+    the top root it is inside of; missing the given paths that are not
+    folders. Symlinks are resolved first, so two spellings of the same
+    folder are one root.
+    """
+    resolved = []
+    missing = []
+    for path in paths:
+        real = os.path.realpath(path)
+        if os.path.isdir(real):
+            resolved.append(real)
+        else:
+            missing.append(path)
+
+    top = []
+    nested = {}
+    # Pre-order: every root comes right after the roots it is inside of
+    for real in sorted(set(resolved), key=scan_snapshot.sort_key):
+        if top:
+            outer = top[-1]
+            if real.startswith(outer.rstrip(os.sep) + os.sep):
+                nested[real] = outer
+                continue
+        top.append(real)
+    return top, nested, missing
+
+
+class RootTotals:
+    """
+    dir_sink adding every folder's own counts to each root it is in. roots
+    are all the resolved roots, top the ones being walked (see plan_roots).
+    """
+
+    def __init__(self, roots, top):
+        self.lock = threading.Lock()
+        # root -> [folders, files, bytes]
+        self.totals = {root: [0, 0, 0] for root in roots}
+        self.top = set(top)
+
+    def add(self, path, files, nbytes):
+        totals = self.totals
+        owners = []
+        current = path
+        while True:
+            counts = totals.get(current)
+            if counts is not None:
+                owners.append(counts)
+                if current in self.top:
+                    break
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+        with self.lock:
+            for counts in owners:
+                counts[0] += 1
+                counts[1] += files
+                counts[2] += nbytes
+
+    def get(self, root):
+        """(folders below root, files, bytes)."""
+        folders, files, nbytes = self.totals[root]
+        # The root itself is not one of its folders
+        return max(folders - 1, 0), files, nbytes
@@ -0,0 +1,256 @@
+import os
+import gzip
+import json
+import time
+import heapq
+import shutil
+import tempfile
+import threading
+
+import scan_engine
+
+# Scan snapshots (--snapshot) and the diff between two of them (snapdiff.py).
+#
+# A snapshot is a gzip'ed text file:
+#   #scan-snapshot 1 {json summary: roots, totals, per-extension files/bytes}
+#   path <TAB> files <TAB> bytes        one line per folder, sorted
+# files and bytes are the folder's own (non-recursive) counts. Tabs, newlines
+# and backslashes in paths are escaped.
+#
+# Folders are sorted with the path separator ranking below every other
+# character, so each folder comes directly before everything inside it
+# (a pre-order walk). Two snapshots can then be diffed in one pass, like a
+# merge join, and recursive folder sizes fall out of a stack as deep as the
+# tree; nothing grows with the number of folders.
+#
+# Writing is memory-bounded as well: folders arrive in walk order, are
+# sorted in chunks of SORT_CHUNK, spilled to temporary runs and merged.
+
+FORMAT_VERSION = 1
+MAGIC = "#scan-snapshot"
+
+# Folders sorted in memory at once while writing
+SORT_CHUNK = 100_000
+
+# A folder is listed as grown only if no single subfolder holds this share
+# of its growth; otherwise that subfolder is the more useful one to show
+DOMINANT_SHARE = 0.9
+
+
+def sort_key(path):
+    return path.replace(os.sep, "\0")
+
+
+def _escape(path):
+    return path.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    out = []
+    chars = iter(text)
+    for c in chars:
+        if c == "\\":
+            c = next(chars, "\\")
+            out.append({"t": "\t", "n": "\n", "r": "\r"}.get(c, c))
+        else:
+            out.append(c)
+    return "".join(out)
+
+
+def _open_text(path, mode):
+    # surrogateescape keeps undecodable file names intact
+    return gzip.open(path, mode, encoding="utf-8", errors="surrogateescape", newline="\n")
+
+
+def _rows(lines):
+    for line in lines:
+        name, files, nbytes = line.rstrip("\n").split("\t")
+        raw = _unescape(name)
+        yield sort_key(raw), raw, int(files), int(nbytes)
+
+
+def _read_run(path):
+    with open(path, encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+        yield from _rows(f)
+
+
+class SnapshotWriter:
+    """Collects folders during a scan (add() from any thread) and writes the snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.chunk = []
+        self.runs = []
+        self.folders = 0
+        # e.g. scans/%Y-%m-%d.snap on its first use
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.tmpdir = tempfile.mkdtemp(prefix="snapshot-", dir=folder)
+
+    def add(self, path, files, nbytes):
+        with self.lock:
+            self.chunk.append((sort_key(path), path, files, nbytes))
+            self.folders += 1
+            if len(self.chunk) >= SORT_CHUNK:
+                self._spill()
+
+    def _spill(self):
+        self.chunk.sort()
+        run = os.path.join(self.tmpdir, f"run{len(self.runs)}")
+        with open(run, "w", encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+            f.writelines(f"{_escape(p)}\t{files}\t{nbytes}\n" for _, p, files, nbytes in self.chunk)
+        self.runs.append(run)
+        self.chunk = []
+
+    def finish(self, stats, roots):
+        """Merges the sorted runs into the snapshot file, then cleans up."""
+        with self.lock:
+            self.chunk.sort()
+            summary = {
+                # Absolute like the folder paths, so the diff recognizes them
+                "roots": [os.path.abspath(r) for r in roots],
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "folders": stats["folders"],
+                "files": stats["files"],
+                "bytes": stats["scanned_bytes"],
+                "extensions": {ext: [counter[scan_engine.EXT_FILES], counter[scan_engine.EXT_BYTES]]
+                               for ext, counter in stats.get("extension_stats", {}).items()},
+            }
+            tmp = self.path + ".tmp"
+            try:
+                with _open_text(tmp, "wt") as out:
+                    out.write(f"{MAGIC} {FORMAT_VERSION} {json.dumps(summary)}\n")
+                    merged = heapq.merge(iter(self.chunk), *(_read_run(run) for run in self.runs))
+                    out.writelines(f"{_escape(p)}\t{files}\t{nbytes}\n" for _, p, files, nbytes in merged)
+                os.replace(tmp, self.path)
+            finally:
+                self.chunk = []
+                self._cleanup()
+
+    def close(self):
+        """Drops everything without writing (e.g. after an interrupted scan)."""
+        with self.lock:
+            self.chunk = []
+            self._cleanup()
+
+    def _cleanup(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def read_summary(path):
+    """The json summary line of a snapshot."""
+    with _open_text(path, "rt") as f:
+        head = f.readline().rstrip("\n")
+    magic, version, summary = (head.split(" ", 2) + ["", ""])[:3]
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a scan snapshot")
+    if int(version) != FORMAT_VERSION:
+        raise ValueError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+    return json.loads(summary)
+
+
+def read_folders(path):
+    """Yields (sort key, path, files, bytes) in snapshot order."""
+    with _open_text(path, "rt") as f:
+        f.readline()
+        yield from _rows(f)
+
+
+def _merge_join(old, new):
+    """Yields (path, old row or None, new row or None) over two sorted folder streams."""
+    a = next(old, None)
+    b = next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[1], a, None
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield b[1], None, b
+            b = next(new, None)
+        else:
+            yield a[1], a, b
+            a = next(old, None)
+            b = next(new, None)
+
+
+class _Node:
+    __slots__ = ("path", "prefix", "state", "old", "new", "child_delta")
+
+    def __init__(self, path, state, old, new):
+        self.path = path
+        self.prefix = path if path.endswith(os.sep) else path + os.sep
+        self.state = state  # "same", "added" or "removed"
+        self.old = old  # recursive bytes, filled in as children finish
+        self.new = new
+        self.child_delta = 0  # biggest change (either way) of a single child
+
+
+def diff_snapshots(old_path, new_path, top=20):
+    """
+    Compares two snapshots in one streaming pass. Returns a dict with both
+    summaries, the extension deltas, counts of added / removed folders and
+    the top biggest "grown", "shrunk", "added" and "removed" folders as
+    (bytes, path) lists (for added / removed only the topmost folder of each
+    new or vanished subtree, with its whole size).
+    """
+    old_summary = read_summary(old_path)
+    new_summary = read_summary(new_path)
+    grown, shrunk, added, removed = [], [], [], []
+    counts = {"added": 0, "removed": 0, "same": 0}
+    roots = set(old_summary["roots"]) | set(new_summary["roots"])
+    stack = []
+
+    def finish(node):
+        parent = stack[-1] if stack else None
+        delta = node.new - node.old
+        if node.state == "same":
+            # The roots trivially change most, and a folder whose change
+            # sits mostly in one subfolder is better shown by that subfolder
+            if node.path not in roots and node.child_delta < abs(delta) * DOMINANT_SHARE:
+                if delta > 0:
+                    scan_engine.push_bounded(grown, top, (delta, node.path))
+                elif delta < 0:
+                    scan_engine.push_bounded(shrunk, top, (-delta, node.path))
+        elif parent is None or parent.state != node.state:
+            if node.state == "added":
+                scan_engine.push_bounded(added, top, (node.new, node.path))
+            else:
+                scan_engine.push_bounded(removed, top, (node.old, node.path))
+        if parent is not None:
+            parent.old += node.old
+            parent.new += node.new
+            parent.child_delta = max(parent.child_delta, abs(delta))
+
+    for path, a, b in _merge_join(read_folders(old_path), read_folders(new_path)):
+        while stack and not path.startswith(stack[-1].prefix):
+            finish(stack.pop())
+        state = "same" if a is not None and b is not None else ("added" if a is None else "removed")
+        counts[state] += 1
+        stack.append(_Node(path, state, a[3] if a else 0, b[3] if b else 0))
+    while stack:
+        finish(stack.pop())
+
+    extensions = []
+    old_ext = old_summary.get("extensions", {})
+    new_ext = new_summary.get("extensions", {})
+    for ext in set(old_ext) | set(new_ext):
+        of, ob = old_ext.get(ext, (0, 0))
+        nf, nb = new_ext.get(ext, (0, 0))
+        if of != nf or ob != nb:
+            extensions.append((ext, nf - of, nb - ob))
+    extensions.sort(key=lambda row: abs(row[2]), reverse=True)
+
+    return {
+        "old": old_summary,
+        "new": new_summary,
+        "extensions": extensions[:top],
+        "added_folders": counts["added"],
+        "removed_folders": counts["removed"],
+        "grown": sorted(grown, reverse=True),
+        "shrunk": sorted(shrunk, reverse=True),
+        "added": sorted(added, reverse=True),
+        "removed": sorted(removed, reverse=True),
+    }
@@ -0,0 +1,323 @@
+import os
+import stat
+import sqlite3
+import threading
+import concurrent.futures
+
+# Content sniffing for the scanners' --sniff / --sniff-verify options.
+#
+# A report that lumps millions of files under [No Extension] says little, so
+# files without an extension are classified by their first SNIFF_BYTES bytes
+# against the signature table below (ELF, PE, PDF, archives, images, ...;
+# files that look like UTF-8 are "text", anything else "data").
+# --sniff-verify also reads files whose extension promises a signature
+# (.jpg, .zip, .exe, ...) and reports the ones that do not carry it.
+#
+# The scan hands its files to ContentSniffer.add_files() (a file_sink, see
+# scan_engine.list_directory), which passes the interesting ones on in
+# batches to a pool of reader threads, so sniffing overlaps the walk. Only a
+# bounded number of batches may wait for a reader; beyond that the walker
+# blocks until one is done, which keeps memory flat on huge trees.
+#
+# Results are cached in a small SQLite file keyed by (device, inode) and
+# trusted only while mtime and size still match, so repeated scans read only
+# new or changed files. Like the scan index it is a private cache of this
+# user.
+
+DEFAULT_SNIFF_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".scan_sniff.db")
+
+DEFAULT_READERS = 4
+
+# Bytes read from each file; the ustar magic of tar sits at offset 257
+SNIFF_BYTES = 512
+
+# Files handed to a reader at once, and batches allowed to wait per reader
+SNIFF_BATCH = 256
+QUEUED_BATCHES = 4
+
+# Buffered cache writes are flushed in one transaction every this many rows
+FLUSH_EVERY = 2000
+
+# (offset, magic bytes, type), first match wins
+SIGNATURES = [
+    (0, b"\x7fELF", "elf"),
+    (0, b"MZ", "pe"),
+    (0, b"\xcf\xfa\xed\xfe", "mach-o"),
+    (0, b"\xce\xfa\xed\xfe", "mach-o"),
+    (0, b"\xca\xfe\xba\xbe", "mach-o/class"),
+    (0, b"#!", "script"),
+    (0, b"%PDF-", "pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"PK\x03\x04", "zip"),
+    (0, b"PK\x05\x06", "zip"),
+    (0, b"\x1f\x8b", "gzip"),
+    (0, b"BZh", "bzip2"),
+    (0, b"\xfd7zXZ\x00", "xz"),
+    (0, b"\x28\xb5\x2f\xfd", "zstd"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"Rar!\x1a\x07", "rar"),
+    (257, b"ustar", "tar"),
+    (0, b"SQLite format 3\x00", "sqlite"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ms-office"),
+    (4, b"ftyp", "mp4"),
+    (0, b"ID3", "mp3"),
+    (0, b"OggS", "ogg"),
+    (0, b"fLaC", "flac"),
+    (0, b"\x1aE\xdf\xa3", "matroska"),
+    (0, b"\x00asm", "wasm"),
+    (0, b"\xd4\xc3\xb2\xa1", "pcap"),
+    (0, b"\x0a\x0d\x0d\x0a", "pcap"),
+    (0, b"PACK", "git-pack"),
+    (0, b"<?xml", "xml"),
+]
+
+# RIFF is a container; bytes 8..12 name what is inside
+RIFF_TYPES = {b"WAVE": "wav", b"AVI ": "avi", b"WEBP": "webp"}
+
+# Extensions whose files should carry one of these types (--sniff-verify)
+EXPECTED_TYPES = {
+    ".exe": {"pe"}, ".dll": {"pe"}, ".sys": {"pe"},
+    ".so": {"elf"},
+    ".pdf": {"pdf"},
+    ".png": {"png"},
+    ".jpg": {"jpeg"}, ".jpeg": {"jpeg"},
+    ".gif": {"gif"},
+    ".tif": {"tiff"}, ".tiff": {"tiff"},
+    ".zip": {"zip"}, ".jar": {"zip"}, ".apk": {"zip"}, ".docx": {"zip"}, ".xlsx": {"zip"}, ".pptx": {"zip"},
+    ".odt": {"zip"}, ".ods": {"zip"},
+    ".gz": {"gzip"}, ".tgz": {"gzip"},
+    ".bz2": {"bzip2"}, ".xz": {"xz"}, ".zst": {"zstd"},
+    ".7z": {"7z"}, ".rar": {"rar"},
+    ".tar": {"tar"},
+    ".sqlite": {"sqlite"}, ".sqlite3": {"sqlite"},
+    ".doc": {"ms-office"}, ".xls": {"ms-office"}, ".ppt": {"ms-office"}, ".msi": {"ms-office"},
+    ".mp4": {"mp4"}, ".m4a": {"mp4"}, ".m4v": {"mp4"}, ".mov": {"mp4"},
+    ".ogg": {"ogg"}, ".flac": {"flac"}, ".mkv": {"matroska"}, ".webm": {"matroska"},
+    ".wav": {"wav"}, ".avi": {"avi"}, ".webp": {"webp"},
+    ".wasm": {"wasm"}, ".class": {"mach-o/class"},
+}
+
+# Types that say nothing about whether an extension fits
+EMPTY = "empty"
+SPECIAL = "special"  # fifos, sockets, devices: never opened
+UNREADABLE = "unreadable"
+
+_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+# Reading a file must not bump its atime; only allowed on own files
+_NOATIME = getattr(os, "O_NOATIME", 0)
+
+
+def classify(head):
+    """Type of a file from its first bytes."""
+    if not head:
+        return EMPTY
+    for offset, magic, kind in SIGNATURES:
+        if head.startswith(magic, offset):
+            return kind
+    if head.startswith(b"RIFF"):
+        return RIFF_TYPES.get(head[8:12], "riff")
+    if b"\x00" in head:
+        return "data"
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A character cut in half at the end of the sample is still text
+        if e.start < len(head) - 3:
+            return "data"
+    return "text"
+
+
+def read_head(path):
+    """The first SNIFF_BYTES bytes of a regular file."""
+    try:
+        fd = os.open(path, _OPEN_FLAGS | _NOATIME)
+    except PermissionError:
+        if not _NOATIME:
+            raise
+        fd = os.open(path, _OPEN_FLAGS)
+    try:
+        return os.read(fd, SNIFF_BYTES)
+    finally:
+        os.close(fd)
+
+
+def _signed(n):
+    # SQLite integers are signed 64-bit; device / inode numbers may not be
+    return n - (1 << 64) if n >= 1 << 63 else n
+
+
+class SniffCache:
+    """Thread-safe (device, inode) -> type cache in an SQLite file."""
+
+    def __init__(self, path=DEFAULT_SNIFF_CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sniff (
+                dev      INTEGER NOT NULL,
+                ino      INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size     INTEGER NOT NULL,
+                kind     TEXT NOT NULL,
+                PRIMARY KEY (ino, dev)
+            ) WITHOUT ROWID""")
+        self.lock = threading.Lock()
+        self.pending = []
+
+    @staticmethod
+    def key(st):
+        return _signed(st.st_dev), _signed(st.st_ino), st.st_mtime_ns, st.st_size
+
+    def lookup(self, stats):
+        """{key: type} for the given stat results that are cached and unchanged."""
+        inodes = list({_signed(st.st_ino) for st in stats})
+        if not inodes:
+            return {}
+        marks = ",".join("?" * len(inodes))
+        with self.lock:
+            rows = self.conn.execute(f"SELECT dev, ino, mtime_ns, size, kind FROM sniff WHERE ino IN ({marks})",
+                                     inodes).fetchall()
+        return {row[:4]: row[4] for row in rows}
+
+    def store(self, rows):
+        """rows are key + (type,) tuples."""
+        with self.lock:
+            self.pending.extend(rows)
+            if len(self.pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO sniff (dev, ino, mtime_ns, size, kind) "
+                                  "VALUES (?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def close(self):
+        with self.lock:
+            self._flush()
+        self.conn.close()
+
+
+class ContentSniffer:
+    """Collects files during a scan and classifies them by content in reader threads."""
+
+    def __init__(self, cache=None, readers=DEFAULT_READERS, verify=False):
+        self.cache = cache
+        self.verify = verify
+        self.lock = threading.Lock()
+        self.batch = []
+        self.slots = threading.BoundedSemaphore(readers * QUEUED_BATCHES)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=readers)
+        # Kept so finish() can re-raise what failed in a reader (I/O, cache errors)
+        self.futures = []
+        # type -> [files, bytes] for files without an extension
+        self.types = {}
+        # (extension, type) -> [files, bytes] for --sniff-verify misfits
+        self.mismatches = {}
+        self.sniffed = 0
+        self.cached = 0
+
+    def add_files(self, records):
+        """file_sink: records are (path, extension, size, mtime) tuples."""
+        verify = self.verify
+        wanted = [(path, ext) for path, ext, _, _ in records if not ext or (verify and ext in EXPECTED_TYPES)]
+        if not wanted:
+            return
+        ready = []
+        with self.lock:
+            self.batch.extend(wanted)
+            while len(self.batch) >= SNIFF_BATCH:
+                ready.append(self.batch[:SNIFF_BATCH])
+                del self.batch[:SNIFF_BATCH]
+        for batch in ready:
+            self._submit(batch)
+
+    def _submit(self, batch):
+        self.slots.acquire()  # blocks the walker while the readers are behind
+        future = self.pool.submit(self._sniff_batch, batch)
+        future.add_done_callback(lambda _: self.slots.release())
+        with self.lock:
+            self.futures.append(future)
+
+    def _sniff_batch(self, batch):
+        entries = []
+        for path, ext in batch:
+            try:
+                entries.append((path, ext, os.stat(path)))
+            except OSError:
+                pass
+        cache = self.cache
+        known = cache.lookup([st for _, _, st in entries]) if cache is not None else {}
+
+        results = []
+        fresh = []
+        cached = 0
+        for path, ext, st in entries:
+            key = SniffCache.key(st)
+            kind = known.get(key)
+            if kind is not None:
+                cached += 1
+            elif not stat.S_ISREG(st.st_mode):
+                kind = SPECIAL
+            else:
+                try:
+                    kind = classify(read_head(path))
+                    fresh.append(key + (kind,))
+                except OSError:
+                    kind = UNREADABLE
+            results.append((ext, kind, st.st_size))
+        if cache is not None and fresh:
+            cache.store(fresh)
+
+        with self.lock:
+            self.sniffed += len(results)
+            self.cached += cached
+            for ext, kind, size in results:
+                if not ext:
+                    counter = self.types.setdefault(kind, [0, 0])
+                elif kind in EXPECTED_TYPES[ext] or kind in (EMPTY, SPECIAL, UNREADABLE):
+                    continue
+                else:
+                    counter = self.mismatches.setdefault((ext, kind), [0, 0])
+                counter[0] += 1
+                counter[1] += size
+
+    def finish(self):
+        """Sniffs what is still queued and waits for the readers; re-raises the first error of one."""
+        with self.lock:
+            batch, self.batch = self.batch, []
+        if batch:
+            self._submit(batch)
+        self.pool.shutdown(wait=True)
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.futures = []
+            if self.cache is not None:
+                self.cache.close()
+
+    def close(self):
+        """Stops without sniffing the rest (e.g. after a failed scan)."""
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+    def sorted_types(self):
+        """(type, files, bytes) for files without an extension, most files first."""
+        return sorted(((kind, files, nbytes) for kind, (files, nbytes) in self.types.items()),
+                      key=lambda row: row[1], reverse=True)
+
+    def sorted_mismatches(self):
+        """(extension, type, files, bytes) of files whose content does not fit the extension."""
+        return sorted(((ext, kind, files, nbytes) for (ext, kind), (files, nbytes) in self.mismatches.items()),
+                      key=lambda row: row[2], reverse=True)
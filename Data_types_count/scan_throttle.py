@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import ctypes
+import platform
+import threading
+
+# Throttled scans (--throttle / --nice) for running on busy servers.
+#
+# A metadata operation is one directory listing or one file stat. All walker
+# threads draw from a single token bucket refilled at the target rate: a
+# worker takes one token before it lists a folder and pays for the stats it
+# did afterwards, so the bucket can go into debt and the next listing waits
+# until it is paid off. Over any stretch of time the scan therefore stays at
+# the target rate no matter how many workers there are.
+#
+# With adaptive backoff the bucket also watches how long a listing takes per
+# operation (a moving average). When that rises well above the quietest
+# level seen, the disk is busy with someone else's work and the rate is
+# halved; once latency is back to normal it climbs back towards the target
+# in small steps (additive increase, multiplicative decrease).
+#
+# --nice lowers the CPU priority and puts the process in the idle I/O class
+# (Linux ioprio, inherited by the walker threads) or in background mode
+# (Windows), so the kernel itself serves everybody else first.
+
+# Bucket size in seconds of the target rate (how big a burst may be)
+BURST_SECONDS = 0.5
+
+# Backoff never goes below this share of the target rate
+MIN_RATE_SHARE = 0.05
+
+LATENCY_ALPHA = 0.1  # weight of a new sample in the latency average
+WARMUP_SAMPLES = 50  # listings before the quiet level is trusted
+ADJUST_EVERY = 1.0  # seconds between rate changes
+BACKOFF_RATIO = 3.0  # latency this many times the quiet level: back off
+RECOVER_RATIO = 1.25  # latency below this many times the quiet level: speed up
+RECOVER_STEP = 0.1  # share of the target rate added per step
+BASELINE_DRIFT = 0.01  # the quiet level may rise this much per step
+
+
+class Throttle:
+    """Token bucket of metadata operations shared by every walker thread."""
+
+    def __init__(self, rate, adaptive=True):
+        self.target = float(rate)
+        self.rate = self.target
+        self.min_rate = max(1.0, self.target * MIN_RATE_SHARE)
+        self.capacity = max(1.0, self.target * BURST_SECONDS)
+        self.adaptive = adaptive
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.latency = None  # seconds per operation, moving average
+        self.baseline = None  # quietest latency seen
+        self.samples = 0
+        self.last_adjust = self.updated
+        self.backoffs = 0
+        self.waited = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, ops=1):
+        """Takes ops tokens, sleeping for as long as the bucket is in debt."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= ops
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def charge(self, ops, elapsed):
+        """
+        Pays for ops more operations done without waiting (e.g. the stats of
+        a listing) and records that the listing took elapsed seconds in all.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= ops
+            if self.adaptive:
+                self._observe(elapsed / (ops + 1), now)
+
+    def _observe(self, per_op, now):
+        if self.latency is None:
+            self.latency = per_op
+        else:
+            self.latency += LATENCY_ALPHA * (per_op - self.latency)
+        self.samples += 1
+        if self.samples < WARMUP_SAMPLES:
+            return
+        if self.baseline is None or self.latency < self.baseline:
+            self.baseline = self.latency
+        if now - self.last_adjust < ADJUST_EVERY:
+            return
+
+        self.last_adjust = now
+        if self.latency > self.baseline * BACKOFF_RATIO:
+            if self.rate > self.min_rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.backoffs += 1
+        elif self.latency < self.baseline * RECOVER_RATIO and self.rate < self.target:
+            self.rate = min(self.target, self.rate + self.target * RECOVER_STEP)
+        # A quiet level from a cache-hot start must not hold the rate down forever
+        self.baseline *= 1 + BASELINE_DRIFT
+
+
+# ioprio_set(2) syscall numbers; Python has no wrapper for it
+_IOPRIO_SET = {"x86_64": 251, "amd64": 251, "aarch64": 30, "arm64": 30, "i386": 289, "i686": 289,
+               "armv7l": 314, "ppc64le": 273, "s390x": 282, "riscv64": 30}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+_PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+
+
+def lower_priority():
+    """
+    Lowest CPU and I/O priority for this process (call before the scan
+    starts, threads inherit it). Returns a short description of what was set.
+    """
+    done = []
+    if sys.platform == "win32":
+        kernel32 = ctypes.windll.kernel32
+        if kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), _PROCESS_MODE_BACKGROUND_BEGIN):
+            done.append("background mode")
+        return ", ".join(done) or "unchanged"
+
+    try:
+        os.nice(19)
+        done.append("nice 19")
+    except OSError:
+        pass
+
+    number = _IOPRIO_SET.get(platform.machine().lower())
+    if sys.platform.startswith("linux") and number is not None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT) == 0:
+            done.append("idle I/O")
+    return ", ".join(done) or "unchanged"
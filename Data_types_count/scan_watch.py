@@ -0,0 +1,413 @@
+import os
+import sys
+import time
+import stat
+import json
+import errno
+import ctypes
+import select
+import socket
+import struct
+import threading
+
+# Live statistics of a watched folder (watchd.py), for drop folders that are
+# looked at all the time and would otherwise be walked again and again.
+#
+# One initial walk records every file's size and extension and puts an
+# inotify watch on every folder; from then on counts, bytes and the extension
+# table are kept up to date from the events alone. File events only mark a
+# name dirty: after each batch of events the dirty names are stat'ed once,
+# and whatever the stat says (new size, gone, ...) is applied. A burst of
+# writes to one file thus costs one stat, and the order of events within a
+# batch never matters. New folders are walked (and watched) when they
+# appear, removed or moved-away folders are dropped with their subtree.
+#
+# When the kernel's event queue overflows, events are lost without saying
+# where. The folders that can have missed something are the ones whose mtime
+# changed since they were last listed (entries added / removed / renamed) and
+# the ones with events in the last ACTIVE_WINDOW seconds (files still being
+# written); only those are listed again and reconciled, not the whole tree.
+#
+# Linux only (inotify). The numbers are served as one json line to anyone
+# connecting to a Unix socket.
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".scan_watch.sock")
+
+# Folders with events this recently are re-listed after a queue overflow
+ACTIVE_WINDOW = 60
+
+# Bytes read from the inotify descriptor at once
+READ_SIZE = 1024 * 1024
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+GONE_MASK = IN_DELETE | IN_MOVED_FROM
+APPEARED_MASK = IN_CREATE | IN_MOVED_TO
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then the name
+
+
+class Inotify:
+    """Minimal inotify(7) binding through ctypes."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "live statistics need inotify (Linux)")
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "out of inotify watches, raise fs.inotify.max_user_watches", path)
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout):
+        """(wd, mask, name) events that arrive within timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirState:
+    """What is known about one watched folder."""
+
+    __slots__ = ("wd", "files", "subdirs", "links", "mtime_ns", "last_event")
+
+    def __init__(self, wd, mtime_ns):
+        self.wd = wd
+        self.files = {}  # name -> (extension, size)
+        self.subdirs = set()
+        self.links = set()  # links to folders: counted, never followed
+        self.mtime_ns = mtime_ns
+        self.last_event = 0.0
+
+
+class LiveTree:
+    """Counts under root, kept current from inotify events."""
+
+    def __init__(self, root, exclude=None, stop_at=None):
+        self.root = os.path.abspath(root)
+        self.exclude = exclude
+        self.stop_at = stop_at or frozenset()  # other mounts: counted, never entered
+        self.inotify = Inotify()
+        self.lock = threading.Lock()
+        self.dirs = {}  # path -> DirState
+        self.paths = {}  # wd -> path
+        self.files = 0
+        self.folders = 0
+        self.bytes = 0
+        self.extensions = {}  # ext -> [files, bytes]
+        self.started = time.time()
+        self.events = 0
+        self.overflows = 0
+        self.relisted = 0
+        self.stopped = False
+
+    # Bookkeeping of single entries
+
+    def _add_file(self, state, name, ext, size):
+        old = state.files.get(name)
+        if old is not None:
+            self._remove_file(state, name)
+        state.files[name] = (ext, size)
+        self.files += 1
+        self.bytes += size
+        counter = self.extensions.get(ext)
+        if counter is None:
+            counter = self.extensions[ext] = [0, 0]
+        counter[0] += 1
+        counter[1] += size
+
+    def _remove_file(self, state, name):
+        ext, size = state.files.pop(name)
+        self.files -= 1
+        self.bytes -= size
+        counter = self.extensions[ext]
+        counter[0] -= 1
+        counter[1] -= size
+        if not counter[0]:
+            del self.extensions[ext]
+
+    def _forget(self, state, parent, name):
+        """Removes whatever name was in the folder (file, link or subtree)."""
+        if name in state.files:
+            self._remove_file(state, name)
+        elif name in state.links:
+            state.links.discard(name)
+            self.folders -= 1
+        elif name in state.subdirs:
+            state.subdirs.discard(name)
+            self.folders -= 1
+            self._drop_tree(os.path.join(parent, name))
+
+    def _drop_tree(self, path):
+        state = self.dirs.pop(path, None)
+        if state is None:
+            return
+        self.paths.pop(state.wd, None)
+        self.inotify.rm_watch(state.wd)
+        for name in list(state.files):
+            self._remove_file(state, name)
+        self.folders -= len(state.links)
+        for name in state.subdirs:
+            self.folders -= 1
+            self._drop_tree(os.path.join(path, name))
+
+    def _excluded(self, name, path):
+        return self.exclude is not None and self.exclude.excludes(name, path)
+
+    # Listing
+
+    def _walk(self, top):
+        """Watches and lists top and everything below it (top itself is not counted)."""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            try:
+                # Watch before listing, so nothing created meanwhile is missed
+                wd = self.inotify.add_watch(path)
+                mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError as e:
+                # Gone, no longer a folder, unreadable: skip it like a failed listing.
+                # Running out of watches is not about this folder, so it still stops the daemon
+                if e.errno == errno.ENOSPC:
+                    raise
+                continue
+            if path in self.dirs:
+                continue
+            state = self.dirs[path] = DirState(wd, mtime_ns)
+            self.paths[wd] = path
+            stack.extend(self._list(path, state))
+
+    def _list(self, path, state):
+        """Fills a fresh DirState; returns the subfolders to walk."""
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if not self._excluded(entry.name, entry.path):
+                        self._apply(state, path, entry.name)
+        except OSError:
+            pass
+        return [os.path.join(path, name) for name in state.subdirs]
+
+    def _apply(self, state, parent, name):
+        """Brings one entry of a folder in line with the disk."""
+        path = os.path.join(parent, name)
+        try:
+            st = os.lstat(path)
+        except OSError:
+            self._forget(state, parent, name)
+            return
+        if stat.S_ISDIR(st.st_mode) and path not in self.stop_at:
+            if name not in state.subdirs:
+                self._forget(state, parent, name)
+                state.subdirs.add(name)
+                self.folders += 1
+            return
+        if stat.S_ISLNK(st.st_mode) or stat.S_ISDIR(st.st_mode):
+            try:
+                target = os.stat(path)
+            except OSError:
+                target = None  # dangling: a file without size, like in a scan
+            if target is not None and stat.S_ISDIR(target.st_mode):
+                if name not in state.links:
+                    self._forget(state, parent, name)
+                    state.links.add(name)
+                    self.folders += 1
+                return
+            st = target
+        if name in state.subdirs or name in state.links:
+            self._forget(state, parent, name)
+        _, ext = os.path.splitext(name)
+        self._add_file(state, name, ext.lower(), st.st_size if st is not None else 0)
+
+    def _relist(self, path):
+        """Reconciles one folder with a fresh listing (after a queue overflow)."""
+        state = self.dirs.get(path)
+        if state is None:
+            return
+        self.relisted += 1
+        try:
+            state.mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            with os.scandir(path) as it:
+                names = {entry.name for entry in it if not self._excluded(entry.name, entry.path)}
+        except OSError:
+            return
+        for name in (set(state.files) | state.subdirs | state.links) - names:
+            self._forget(state, path, name)
+        for name in names:
+            self._apply(state, path, name)
+            if name in state.subdirs and os.path.join(path, name) not in self.dirs:
+                self._walk(os.path.join(path, name))
+
+    # Events
+
+    def scan(self):
+        """The initial walk."""
+        with self.lock:
+            self._walk(self.root)
+            if self.root not in self.dirs:
+                raise OSError(errno.ENOENT, "cannot watch", self.root)
+
+    def process(self, timeout=1.0):
+        """Waits up to timeout seconds for events and applies them."""
+        events = self.inotify.read(timeout)
+        if not events:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            dirty = {}
+            overflow = False
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                path = self.paths.get(wd)
+                if path is None or mask & IN_IGNORED:
+                    continue
+                state = self.dirs[path]
+                state.last_event = now
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    if path == self.root:
+                        self.stopped = True
+                    continue
+                if not name or self._excluded(name, os.path.join(path, name)):
+                    continue
+                if mask & IN_ISDIR:
+                    child = os.path.join(path, name)
+                    if mask & GONE_MASK:
+                        self._forget(state, path, name)
+                    elif mask & APPEARED_MASK:
+                        # A folder moved over an old one replaces all of it
+                        self._forget(state, path, name)
+                        self._apply(state, path, name)
+                        if name in state.subdirs:
+                            self._walk(child)
+                    continue
+                dirty.setdefault(path, set()).add(name)
+
+            for path, names in dirty.items():
+                state = self.dirs.get(path)
+                if state is not None:
+                    for name in names:
+                        self._apply(state, path, name)
+            if overflow:
+                self.overflows += 1
+                self._recover(now)
+            self.events += len(events)
+        return len(events)
+
+    def _recover(self, now):
+        for path in list(self.dirs):
+            state = self.dirs.get(path)
+            if state is None:
+                continue  # dropped with a parent meanwhile
+            try:
+                mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                continue  # gone; its parent's listing drops it
+            if mtime_ns != state.mtime_ns or now - state.last_event < ACTIVE_WINDOW:
+                self._relist(path)
+
+    def snapshot(self):
+        """The current numbers as a json-ready dict."""
+        with self.lock:
+            return {
+                "root": self.root,
+                "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "folders": self.folders,
+                "files": self.files,
+                "bytes": self.bytes,
+                "extensions": {ext: list(counter) for ext, counter in self.extensions.items()},
+                "events": self.events,
+                "overflows": self.overflows,
+                "relisted": self.relisted,
+                "watches": len(self.dirs),
+            }
+
+    def close(self):
+        self.inotify.close()
+
+
+def serve(tree, socket_path):
+    """Answers every connection to socket_path with tree.snapshot() (background thread)."""
+    try:
+        os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(8)
+
+    def loop():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return  # closed
+            with conn:
+                try:
+                    conn.sendall(json.dumps(tree.snapshot()).encode() + b"\n")
+                except OSError:
+                    pass
+
+    threading.Thread(target=loop, daemon=True).start()
+    return server
+
+
+def query(socket_path, timeout=5.0):
+    """The numbers of the daemon listening on socket_path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(socket_path)
+        chunks = []
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
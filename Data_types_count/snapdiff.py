@@ -0,0 +1,108 @@
+import os
+import sys
+import shutil
+import argparse
+
+import scan_report
+import scan_snapshot
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# What changed between two scans saved with --snapshot, e.g.
+#   python snapdiff.py scans/2024-05-01.snap scans/2024-05-02.snap
+
+
+def signed_bytes(n):
+    sign = "+" if n > 0 else "-" if n < 0 else ""
+    return sign + scan_report.format_bytes(abs(n))
+
+
+def signed_count(n):
+    return f"{n:+,}"
+
+
+def print_entries(margin, width, title, entries, sign):
+    """(bytes, path) rows with the size shown as a signed change."""
+    scan_report.print_section_title(margin, width, title)
+    if not entries:
+        scan_report.print_empty(margin, width, "(None)")
+        return
+    label_width = 11
+    path_room = width - 2 - (3 + label_width + 3)
+    color = GREEN if sign > 0 else RED
+    for size, path in entries:
+        scan_report.print_row(margin, width, signed_bytes(sign * size), scan_report.shorten_path(path, path_room),
+                              color, label_width)
+
+
+def print_diff(diff, top):
+    width = 72
+    try:
+        term_width = shutil.get_terminal_size().columns
+    except Exception:
+        term_width = 80
+    margin = " " * max(0, (term_width - width) // 2)
+    old, new = diff["old"], diff["new"]
+
+    title = "SNAPSHOT DIFF"
+    pad = width - 2 - len(title)
+    print("")
+    print(f"{margin}{CYAN}╔{'═' * (width - 2)}╗{RESET}")
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{GREEN}{title}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+
+    row = scan_report.print_row
+    row(margin, width, "Old Scan", old["finished_at"].replace("T", " "), YELLOW)
+    row(margin, width, "New Scan", new["finished_at"].replace("T", " "), YELLOW)
+    row(margin, width, "Files", f"{new['files']:,} ({signed_count(new['files'] - old['files'])})", PURPLE)
+    row(margin, width, "Folders", f"{new['folders']:,} ({signed_count(new['folders'] - old['folders'])})", PURPLE)
+    row(margin, width, "Data", f"{scan_report.format_bytes(new['bytes'])} ({signed_bytes(new['bytes'] - old['bytes'])})",
+        BLUE)
+    row(margin, width, "Folders Added", f"{diff['added_folders']:,}", GREEN)
+    row(margin, width, "Folders Removed", f"{diff['removed_folders']:,}", RED)
+
+    scan_report.print_section_title(margin, width, "Extension Changes")
+    if not diff["extensions"]:
+        scan_report.print_empty(margin, width, "(None)")
+    for ext, files, nbytes in diff["extensions"]:
+        color = GREEN if nbytes > 0 else RED if nbytes < 0 else WHITE
+        row(margin, width, ext or "[No Extension]", f"{signed_bytes(nbytes)} ({signed_count(files)} files)", color)
+
+    print_entries(margin, width, f"Top {top} Grown Folders", diff["grown"], 1)
+    print_entries(margin, width, f"Top {top} Shrunk Folders", diff["shrunk"], -1)
+    print_entries(margin, width, f"Top {top} New Folders", diff["added"], 1)
+    print_entries(margin, width, f"Top {top} Removed Folders", diff["removed"], -1)
+    print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two scan snapshots (see --snapshot)")
+    parser.add_argument("old", help="the earlier snapshot")
+    parser.add_argument("new", help="the later snapshot")
+    parser.add_argument("--top", type=int, default=15, metavar="N",
+                        help="rows per section (default: 15)")
+    options = parser.parse_args()
+
+    os.system("")  # Enable ANSI
+    for path in (options.old, options.new):
+        if not os.path.isfile(path):
+            print(f"{RED}Error: '{path}' does not exist.{RESET}")
+            sys.exit(1)
+    try:
+        diff = scan_snapshot.diff_snapshots(options.old, options.new, options.top)
+    except (ValueError, OSError) as e:
+        print(f"{RED}Error: {e}{RESET}")
+        sys.exit(1)
+    print_diff(diff, options.top)
+
+
+if __name__ == "__main__":
+    main()
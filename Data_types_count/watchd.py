@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import shutil
+import signal
+import argparse
+
+import scan_engine
+import scan_exclude
+import scan_mounts
+import scan_report
+import scan_watch
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+PURPLE = "\033[95m"
+WHITE = "\033[97m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Live statistics of a folder that is watched all the time, e.g.
+#   python watchd.py /srv/ingest &        keeps the numbers current
+#   python watchd.py --query              shows them instantly
+
+# Seconds between updates of the daemon's status line
+REFRESH = 1.0
+
+
+def print_numbers(numbers, top):
+    width = 60
+    try:
+        term_width = shutil.get_terminal_size().columns
+    except Exception:
+        term_width = 80
+    margin = " " * max(0, (term_width - width) // 2)
+
+    title = "LIVE FOLDER STATISTICS"
+    pad = width - 2 - len(title)
+    print("")
+    print(f"{margin}{CYAN}╔{'═' * (width - 2)}╗{RESET}")
+    print(f"{margin}{CYAN}║{RESET}{' ' * (pad // 2)}{GREEN}{title}{RESET}{' ' * (pad - pad // 2)}{CYAN}║{RESET}")
+    print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
+
+    row = scan_report.print_row
+    row(margin, width, "Path", scan_report.shorten_path(numbers["root"], width - 28), WHITE)
+    row(margin, width, "Watching Since", numbers["since"].replace("T", " "), YELLOW)
+    row(margin, width, "Total Folders", f"{numbers['folders']:,}", PURPLE)
+    row(margin, width, "Total Files", f"{numbers['files']:,}", PURPLE)
+    row(margin, width, "Total Data", scan_report.format_bytes(numbers["bytes"]), BLUE)
+    row(margin, width, "Events", f"{numbers['events']:,}", GREEN)
+    row(margin, width, "Queue Overflows", f"{numbers['overflows']:,} ({numbers['relisted']:,} folders re-listed)",
+        GREEN if not numbers["overflows"] else RED)
+
+    scan_report.print_section_title(margin, width, "File Formats Breakdown")
+    extensions = sorted(numbers["extensions"].items(), key=lambda item: item[1][0], reverse=True)
+    if not extensions:
+        scan_report.print_empty(margin, width)
+    for ext, (files, nbytes) in extensions[:top]:
+        share = scan_report.format_share(nbytes, numbers["bytes"])
+        row(margin, width, ext or "[No Extension]", f"{files:,} | {scan_report.format_bytes(nbytes)} ({share})", BLUE)
+    if len(extensions) > top:
+        scan_report.print_empty(margin, width, f"... {len(extensions) - top:,} more")
+    print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}\n")
+
+
+def run_daemon(options):
+    exclude = scan_exclude.rules_from_options(options) or None
+    stop_at = scan_mounts.stop_points() if options.one_file_system else None
+    tree = scan_watch.LiveTree(options.path, exclude, stop_at)
+    print(f"{CYAN}Scanning {tree.root}...{RESET}", flush=True)
+    start = time.monotonic()
+    tree.scan()
+    print(f"{GREEN}Watching {len(tree.dirs):,} folders ({tree.files:,} files) after "
+          f"{time.monotonic() - start:.2f} seconds; numbers on {options.socket}{RESET}", flush=True)
+
+    server = scan_watch.serve(tree, options.socket)
+    # Stopped like a service: clean up the socket on the way out
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    interactive = sys.stdout.isatty()
+    last_refresh = 0.0
+    try:
+        while not tree.stopped:
+            tree.process(REFRESH)
+            now = time.monotonic()
+            if interactive and now - last_refresh >= REFRESH:
+                last_refresh = now
+                print(f"\r{CYAN}{tree.files:,} files | {scan_report.format_bytes(tree.bytes)} | "
+                      f"{tree.events:,} events | {tree.overflows} overflows{RESET}\033[K", end="", flush=True)
+        print(f"\n{RED}{tree.root} was removed or moved away.{RESET}")
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.close()
+        try:
+            os.remove(options.socket)
+        except FileNotFoundError:
+            pass
+        tree.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep live statistics of a folder from inotify events")
+    parser.add_argument("path", nargs="?", help="folder to watch (omit with --query)")
+    parser.add_argument("--query", action="store_true", help="show the numbers of the running daemon and exit")
+    parser.add_argument("--socket", metavar="PATH", default=scan_watch.DEFAULT_SOCKET_PATH,
+                        help="Unix socket the daemon answers on (default: ~/.scan_watch.sock)")
+    parser.add_argument("--top", type=int, default=20, metavar="N",
+                        help="extension rows shown by --query (default: 20)")
+    scan_engine.add_exclude_arguments(parser)
+    options = parser.parse_args()
+    if options.query == bool(options.path):
+        parser.error("give either a folder to watch or --query")
+
+    os.system("")  # Enable ANSI
+    if options.query:
+        try:
+            numbers = scan_watch.query(options.socket)
+        except OSError as e:
+            print(f"{RED}Error: no daemon answering on {options.socket} ({e}).{RESET}")
+            sys.exit(1)
+        print_numbers(numbers, options.top)
+        return
+
+    if not os.path.isdir(options.path):
+        print(f"{RED}Error: '{options.path}' is not a directory.{RESET}")
+        sys.exit(1)
+    try:
+        run_daemon(options)
+    except OSError as e:
+        print(f"{RED}Error: {e}{RESET}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
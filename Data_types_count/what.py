@@ -1,6 +1,12 @@
 import os
 import sys
+import time
 import shutil
+import argparse
+import threading
+
+import scan_engine
+import scan_report
 
 # ANSI Colors
 CYAN = "\033[96m"
@@ -12,6 +18,9 @@ WHITE = "\033[97m"
 BLUE = "\033[94m"
 RESET = "\033[0m"
 
+# The report only shows counts, so the scan never needs to stat a file
+REPORT_COLUMNS = ("folders", "files", "extensions")
+
 def get_terminal_width():
     try:
         columns, _ = shutil.get_terminal_size()
@@ -31,7 +40,7 @@ def print_border_top(width, color=CYAN):
 def print_border_bottom(width, color=CYAN):
     print(f"{color}╚{'═' * (width - 2)}╝{RESET}")
 
-def analyze_directory(path):
+def analyze_directory(path, options, index=None, exclude=None, checkpoint=None, throttle=None, priority=None):
     """
     Counts files and folders in the given directory and breaks down by file extension.
     """
@@ -53,10 +62,6 @@ def analyze_directory(path):
         print(f"\n{margin}{RED}Error: The path '{path}' is not a directory.{RESET}")
         return
 
-    folder_count = 0
-    file_count = 0
-    extensions = {}
-
     # Clear screen and show scanning message
     os.system('cls' if os.name == 'nt' else 'clear')
     
@@ -68,23 +73,54 @@ def analyze_directory(path):
     print(f"{margin}{CYAN}║{RESET}{' ' * ((width - 2 - 12)//2)}{YELLOW}Scanning...{RESET}{' ' * ((width - 2 - 12 + 1)//2)}{CYAN}║{RESET}")
     print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}")
 
+    stats = {"folders": 0, "files": 0, "extensions": {}, "scanned_bytes": 0}
+    exporter = scan_engine.open_exporter(options)
+    snapshot = scan_engine.open_snapshot(options)
+    dupes = scan_engine.open_duplicates(options)
+    sniffer = scan_engine.open_sniffer(options)
+    columnar = scan_engine.open_columnar(options)
+    mode = scan_engine.mode_for_columns(REPORT_COLUMNS + scan_engine.export_columns(options))
+    start_time = time.time()
     try:
-        # os.walk allows recursive counting. 
-        for root, dirs, files in os.walk(path):
-            folder_count += len(dirs)
-            file_count += len(files)
-            for file in files:
-                _, ext = os.path.splitext(file)
-                ext = ext.lower()
-                if ext in extensions:
-                    extensions[ext] += 1
-                else:
-                    extensions[ext] = 1
+        scan_engine.scan_paths([path], stats, threading.Lock(), index=index, mode=mode,
+                               backend=options.backend, max_workers=options.workers,
+                               file_sink=scan_engine.combine_sinks(
+                                   exporter.write_files if exporter is not None else None,
+                                   dupes.add_files if dupes is not None else None,
+                                   sniffer.add_files if sniffer is not None else None,
+                                   columnar.add_files if columnar is not None else None),
+                               exclude=exclude, checkpoint=checkpoint, throttle=throttle,
+                               dir_sink=snapshot.add if snapshot is not None else None,
+                               extension_cap=options.extension_cap, hotspots=options.hotspots,
+                               ages=options.ages)
+    except KeyboardInterrupt:
+        # Ctrl+C ends the session, so the index goes too
+        scan_engine.close_writers(exporter, snapshot, sniffer, columnar, index)
+        if checkpoint is not None and checkpoint.saves:
+            print(f"\n\n{margin}{YELLOW}Scan interrupted. Progress saved - run again with --resume to continue.{RESET}")
+        raise
     except Exception as e:
+        # The index stays open for the next folder of this session
+        scan_engine.close_writers(exporter, snapshot, sniffer, columnar)
         os.system('cls' if os.name == 'nt' else 'clear')
         print(f"{margin}{RED}An error occurred: {e}{RESET}")
         return
 
+    if exporter is not None:
+        exporter.finish(stats, [path], time.time() - start_time, has_bytes=mode == scan_engine.MODE_SIZE)
+    if snapshot is not None:
+        snapshot.finish(stats, [path])
+    if columnar is not None:
+        columnar.finish(stats, [path])
+    if sniffer is not None:
+        sniffer.finish()
+    if dupes is not None:
+        dupes.find()
+
+    folder_count = stats["folders"]
+    file_count = stats["files"]
+    extensions = stats["extensions"]
+
     # Clear screen before showing results
     os.system('cls' if os.name == 'nt' else 'clear')
     
@@ -110,6 +146,23 @@ def analyze_directory(path):
 
     print_row("Total Folders Found", folder_count, PURPLE)
     print_row("Total Files Found", file_count, PURPLE)
+    if index is not None:
+        print_row("Index Reused", f"{index.hits} of {index.hits + index.misses} folders", GREEN)
+    if throttle is not None:
+        print_row("Throttle", f"{throttle.target:.0f} ops/s, {throttle.backoffs} backoffs", GREEN)
+    if priority is not None:
+        print_row("Priority", priority, GREEN)
+    if exclude is not None:
+        print_row("Excluded", scan_report.shorten_text(exclude.describe(), width - 33), GREEN)
+    if exporter is not None:
+        print_row("Exported To", os.path.basename(options.export), GREEN)
+    if snapshot is not None:
+        print_row("Snapshot", scan_report.shorten_path(os.path.basename(snapshot.path), width - 33), GREEN)
+    if columnar is not None:
+        print_row("Columnar Snapshot", scan_report.shorten_path(os.path.basename(columnar.path), width - 33),
+                  GREEN)
+    if sniffer is not None:
+        print_row("Content Sniffed", f"{sniffer.sniffed} files, {sniffer.cached} cached", GREEN)
     
     print(f"{margin}{CYAN}╠{'═' * (width - 2)}╣{RESET}")
     print(f"{margin}{CYAN}║{RESET}{' ' * ((width - 2 - 23)//2)}{YELLOW}File Formats Breakdown{RESET}{' ' * ((width - 2 - 23 + 1)//2)}{CYAN}║{RESET}")
@@ -123,10 +176,24 @@ def analyze_directory(path):
         for ext, count in sorted_exts:
             display_ext = ext if ext else "[No Extension]"
             print_row(display_ext, count, BLUE)
+    if sniffer is not None:
+        scan_report.print_content_types(margin, width, sniffer)
+    if dupes is not None:
+        scan_report.print_duplicates(margin, width, dupes)
+    if options.hotspots:
+        scan_report.print_hotspots(margin, width, stats)
+    if options.ages:
+        by_bytes = scan_report.sorted_extensions(stats, "bytes")
+        scan_report.print_age_histograms(margin, width, stats, [row[0] for row in by_bytes[:10]], 10)
             
     print(f"{margin}{CYAN}╚{'═' * (width - 2)}╝{RESET}\n")
 
-def main():
+def main(options):
+    exclude = scan_engine.open_rules(options)
+    index = scan_engine.open_index(options, exclude)
+    checkpoint = scan_engine.open_checkpoint(options)
+    throttle = scan_engine.open_throttle(options)
+    priority = scan_engine.apply_priority(options)
     os.system('cls' if os.name == 'nt' else 'clear')
     os.system("") # Enable ANSI
     
@@ -182,7 +249,12 @@ def main():
             continue
             
         if target_path:
-            analyze_directory(target_path)
+            if index is not None:
+                index.hits = index.misses = 0
+            analyze_directory(target_path, options, index, exclude, checkpoint, throttle, priority)
+            if checkpoint is not None:
+                # Only the first analysis picks up a saved scan
+                checkpoint.resume = False
         
         # Loop prompt
         while True:
@@ -190,6 +262,8 @@ def main():
             cmd = input().strip().lower()
             if cmd == 'x':
                 # Return to ALL.py
+                if index is not None:
+                    index.close()
                 return
             elif cmd == 'r':
                 os.system('cls' if os.name == 'nt' else 'clear')
@@ -198,4 +272,10 @@ def main():
                 pass
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Local / custom path scan")
+    scan_engine.add_scan_arguments(parser)
+    options = scan_engine.parse_scan_arguments(parser)
+    try:
+        main(options)
+    except KeyboardInterrupt:
+        print()